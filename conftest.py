@@ -0,0 +1,19 @@
+"""Fixtures shared by the tests: synthetic VAMAS files written by vamasGenerator.py
+"""
+import pytest
+from vamasGenerator import writeVamasFile
+
+
+@pytest.fixture
+def vamasFile(tmp_path):
+    """Return a function writing a synthetic VAMAS file into the temporary folder of the test
+
+    The function takes the arguments of writeVamasFile() after the file name, with 50 points per spectrum
+    by default, and the name of the file relative to the folder, folders are created. It returns the path of the file.
+    """
+    def write(*args, name="source.vms", numPoints=50, **kwargs):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        writeVamasFile(str(path), *args, numPoints=numPoints, **kwargs)
+        return str(path)
+    return write
@@ -0,0 +1,96 @@
+"""Aggregator: resampled and aggregated spectra match np.interp of each spectrum
+
+Run with: python -m pytest test_vamasAggregate.py
+"""
+import numpy as np
+import pytest
+from vamasLoader import readVamasBlocks
+from vamasAggregate import SpectrumAggregator, commonGrid, gridValues
+
+
+def makeSpectra(numSpectra=12, numPoints=101, seed=0, shared=4):
+    """Spectra with shifted equally spaced axes, groups of shared spectra have the same axis, some descending
+    """
+    rng = np.random.default_rng(seed)
+    spectra = list()
+    for i in range(numSpectra):
+        start = 280.0 + 0.013*(i // shared)
+        x = start + 0.1*np.arange(numPoints)
+        if i % 3 == 2:
+            x = x[::-1]
+        spectra.append((x, rng.normal(100, 10, numPoints)))
+    return spectra
+
+
+def interpolated(spectra, energies, outside=np.nan):
+    """Reference: every spectrum interpolated by np.interp
+    """
+    return np.array([np.interp(energies, x[::-1] if x[0] > x[-1] else x, y[::-1] if x[0] > x[-1] else y, left=outside, right=outside)
+                     for x, y in spectra])
+
+
+@pytest.mark.parametrize("shared", [1, 4, 12])
+def test_resample(shared):
+    spectra = makeSpectra(shared=shared)
+    grid = commonGrid([x for x, y in spectra])
+    energies = gridValues(grid)
+    assert energies[0] >= 280.0 + 0.013*(11 // shared) - 1e-9
+    resampled = SpectrumAggregator().resample(spectra, grid)
+    assert np.allclose(resampled, interpolated(spectra, energies))
+
+
+@pytest.mark.parametrize("shared", [1, 4, 12])
+def test_aggregate(shared):
+    spectra = makeSpectra(shared=shared)
+    weights = np.linspace(1, 2, len(spectra))
+    aggregator = SpectrumAggregator()
+    reference = interpolated(spectra, gridValues(commonGrid([x for x, y in spectra])))
+    total = aggregator.aggregate(spectra, method='sum')
+    assert np.allclose(total.y, reference.sum(axis=0))
+    assert np.all(total.counts == len(spectra))
+    mean = aggregator.aggregate(spectra, weights, method='mean')
+    assert np.allclose(mean.y, weights @ reference/weights.sum())
+    median = aggregator.aggregate(spectra, method='median')
+    #Lower middle value of an even number of values
+    assert np.allclose(median.y, np.sort(reference, axis=0)[len(spectra)//2 - 1])
+
+
+def test_gridBeyondSpectra():
+    spectra = makeSpectra()
+    grid = (279.0, 0.05, 300)
+    energies = gridValues(grid)
+    reference = interpolated(spectra, energies)
+    aggregated = SpectrumAggregator().aggregate(spectra, method='mean', grid=grid)
+    covered = ~np.isnan(reference)
+    assert np.array_equal(aggregated.counts, covered.sum(axis=0))
+    counts = covered.sum(axis=0)
+    mean = np.divide(np.where(covered, reference, 0.0).sum(axis=0), counts, out=np.full(len(energies), np.nan), where=counts > 0)
+    assert np.allclose(aggregated.y, mean, equal_nan=True)
+    assert np.isnan(aggregated.y[0])
+
+
+def test_cachedWeights():
+    spectra = makeSpectra(shared=4)
+    aggregator = SpectrumAggregator()
+    aggregator.aggregate(spectra, method='sum')
+    computed = aggregator.computed
+    #A subset with another common grid on the same lattice reuses the weights
+    aggregator.aggregate(spectra[:8], method='sum')
+    assert aggregator.computed == computed
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        SpectrumAggregator().aggregate(makeSpectra(), method='max')
+    with pytest.raises(ValueError):
+        commonGrid([np.arange(10.0), np.arange(20.0, 30.0)])
+
+
+def test_aggregateBlocks(vamasFile):
+    fileName = vamasFile(numBlocks=3, numPoints=100)
+    blocks = readVamasBlocks(fileName)
+    blocks[1].numSweeps *= 3
+    weights = np.array([block.dwellTime*block.numSweeps for block in blocks])
+    mean = SpectrumAggregator().aggregateBlocks(blocks)
+    reference = interpolated([(block.xAxisValuesList, block.yAxisValuesList[0]) for block in blocks], mean.x)
+    assert np.allclose(mean.y, weights @ reference/weights.sum())
@@ -0,0 +1,93 @@
+"""Persistent parse cache: hits give the parsed blocks, changed files are parsed again
+
+Run with: python -m pytest test_vamasCache.py
+"""
+import os
+import numpy as np
+import pytest
+from vamasLoader import readVamasBlocks
+from vamasCache import VamasCache, CachedOrdinateLoader
+from vamasWriter import compareBlocks
+from vamasFiles import fileState
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return VamasCache(str(tmp_path / "cache"))
+
+
+def setMtime(fileName, offset):
+    """Move the modification time of a file by offset seconds
+    """
+    stat = os.stat(fileName)
+    os.utime(fileName, ns=(stat.st_atime_ns, stat.st_mtime_ns + int(offset*1e9)))
+
+
+def test_hit(vamasFile, cache):
+    fileName = vamasFile("SDP", numBlocks=3, numVars=2)
+    assert cache.get(fileName) is None
+    blocks = readVamasBlocks(fileName, cache=cache)
+    assert len(cache.entries()) == 1
+    cached = cache.get(fileName)
+    assert len(cached) == len(blocks)
+    for block, copy in zip(blocks, cached):
+        assert compareBlocks(block, copy) == []
+    for block, copy in zip(blocks, readVamasBlocks(fileName, headerOnly=True, cache=cache)):
+        assert isinstance(copy.ordinateLoader, CachedOrdinateLoader)
+        assert np.array_equal(copy.yAxisValuesList, block.yAxisValuesList)
+
+
+def test_invalidateOnMtime(vamasFile, cache):
+    fileName = vamasFile(numBlocks=2)
+    readVamasBlocks(fileName, cache=cache)
+    oldEntries = cache.entries()
+    #Same size, only the modification time changed
+    setMtime(fileName, 10)
+    assert cache.get(fileName) is None
+    readVamasBlocks(fileName, cache=cache)
+    newEntries = cache.entries()
+    assert len(newEntries) == 1 and newEntries != oldEntries
+
+
+def test_changedContent(vamasFile, cache):
+    fileName = vamasFile(numBlocks=2, seed=0)
+    readVamasBlocks(fileName, cache=cache)
+    vamasFile(numBlocks=2, seed=1)
+    setMtime(fileName, 10)
+    for block, copy in zip(readVamasBlocks(fileName), readVamasBlocks(fileName, cache=cache)):
+        assert compareBlocks(block, copy) == []
+
+
+def test_trimLeastRecentlyUsed(vamasFile, cache):
+    fileNames = [vamasFile(name="source{0}.vms".format(i), numPoints=200, seed=i) for i in range(3)]
+    for fileName in fileNames:
+        readVamasBlocks(fileName, cache=cache)
+    #The first file was used last
+    for used, fileName in zip((3000, 1000, 2000), fileNames):
+        os.utime(cache.entryPath(fileName) + '.json', (used, used))
+    stem = cache.entryPath(fileNames[0])
+    cache.maxBytes = os.path.getsize(stem + '.json') + os.path.getsize(stem + '.npy')
+    cache.trim()
+    assert cache.entries() == {stem}
+
+
+def test_changedWhileParsing(vamasFile, cache):
+    fileName = vamasFile(numBlocks=2)
+    state = fileState(fileName)
+    blocks = readVamasBlocks(fileName)
+    #Changed after the state was taken, before the blocks are stored
+    setMtime(fileName, 10)
+    assert cache.put(fileName, blocks, state)
+    assert cache.get(fileName) is None
+
+
+def test_entryDeletedAfterChange(vamasFile, cache):
+    fileName = vamasFile(numBlocks=2)
+    blocks = readVamasBlocks(fileName, headerOnly=True, cache=cache)
+    for stem in cache.entries():
+        os.remove(stem + '.npy')
+    #Read from the file while it is unchanged
+    assert np.array_equal(blocks[0].yAxisValuesList, readVamasBlocks(fileName)[0].yAxisValuesList)
+    setMtime(fileName, 10)
+    with pytest.raises(OSError):
+        blocks[1].yAxisValuesList
@@ -0,0 +1,87 @@
+"""Columnar collection: rows behave like the dataclasses they were created from
+
+Run with: python -m pytest test_vamasCollection.py
+"""
+from dataclasses import fields
+from datetime import datetime
+import numpy as np
+import pytest
+from vamasLoader import readVamasBlocks
+from vamasCollection import VamasCollection
+from vamasSimple import VAMAS_File
+from vamasWriter import compareBlocks
+
+
+@pytest.fixture
+def blocks(vamasFile):
+    fileName = vamasFile("MAPDP", numBlocks=4, numVars=2)
+    return readVamasBlocks(fileName)
+
+
+def test_rowsMatchBlocks(blocks):
+    collection = VamasCollection(blocks)
+    assert len(collection) == len(blocks)
+    for block, row in zip(blocks, collection):
+        for f in fields(VAMAS_File):
+            value = getattr(row, f.name)
+            if isinstance(value, np.ndarray):
+                assert np.array_equal(value, getattr(block, f.name))
+            else:
+                assert value == getattr(block, f.name)
+        assert compareBlocks(block, row.toBlock()) == []
+        assert row.fingerprint == block.fingerprint
+
+
+def test_headerOnly(blocks):
+    collection = VamasCollection(readVamasBlocks(blocks[0].fileName, headerOnly=True))
+    assert all(loader is not None for loader in collection.ordinateLoaders)
+    assert np.array_equal(collection[1].yAxisValuesList, blocks[1].yAxisValuesList)
+    assert collection.ordinateLoaders[1] is None and collection.ordinateLoaders[0] is not None
+    #Computing the fingerprint does not keep the values
+    assert collection[2].fingerprint == blocks[2].fingerprint
+    assert collection.ordinateLoaders[2] is not None
+
+
+def test_setValue(blocks):
+    collection = VamasCollection(blocks)
+    row = collection[0]
+    row.blockName = "Edited"
+    collection.setValue(1, 'date', "2020-02-03T04:05:06")
+    collection.setValue(1, 'analyzerPEorRR', "20.5")
+    assert collection.getValue(0, 'blockName') == "Edited"
+    assert collection[1].date == datetime(2020, 2, 3, 4, 5, 6)
+    assert collection[1].analyzerPEorRR == 20.5
+    assert blocks[0].blockName != "Edited"
+    with pytest.raises(ValueError):
+        collection.setValue(0, 'analyzerPEorRR', "fast")
+    with pytest.raises(ValueError):
+        collection.setValue(0, 'yAxisVarsLabelList', "label")
+    with pytest.raises(AttributeError):
+        row.noSuchField = 1
+
+
+def test_insertReplace(blocks):
+    collection = VamasCollection(blocks[:2])
+    collection.insert(0, blocks[3])
+    collection.append(collection[1])
+    assert [row.blockNumber for row in collection] == [blocks[3].blockNumber, blocks[0].blockNumber,
+                                                       blocks[1].blockNumber, blocks[0].blockNumber]
+    collection.replace(1, blocks[2])
+    assert compareBlocks(blocks[2], collection[1]) == []
+    assert compareBlocks(blocks[0], collection[3]) == []
+
+
+def test_columns(blocks):
+    collection = VamasCollection(blocks)
+    assert list(collection.column('xCoord')) == [block.xCoord for block in blocks]
+    assert isinstance(collection.column('numYAxisValues'), np.ndarray)
+    #Equal strings of different blocks are stored once
+    assert collection.columns['expMode'][0] is collection.columns['expMode'][1]
+    copy = VamasCollection.fromColumns(collection.jsonColumns(), collection.yAxisValues, [None]*len(collection))
+    for block, row in zip(blocks, copy):
+        assert compareBlocks(block, row) == []
+
+
+def test_fromParameters(blocks):
+    collection = VamasCollection.fromParameters(block.getParameters() for block in blocks)
+    assert [row.getParameters() for row in collection] == [block.getParameters() for block in blocks]
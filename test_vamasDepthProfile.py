@@ -0,0 +1,37 @@
+"""Stacking of depth profile blocks into one profile per region and map position
+
+Run with: python -m pytest test_vamasDepthProfile.py
+"""
+import numpy as np
+from vamasLoader import readVamasBlocks
+from vamasDepthProfile import stackDepthProfiles
+
+
+def test_stackCycles(vamasFile):
+    fileName = vamasFile("SDP", numBlocks=6, name="profile.vms")
+    blocks = readVamasBlocks(fileName)
+    profiles = stackDepthProfiles(blocks[::-1])
+    assert len(profiles) == 1
+    profile = profiles[0]
+    assert np.array_equal(profile.depths, np.sort(profile.depths))
+    assert profile.blocks == list(range(5, -1, -1))
+    for row, index in enumerate(profile.blocks):
+        assert np.array_equal(profile.matrix[row], blocks[::-1][index].yAxisValuesList[0])
+    x = profile.xAxisValues
+    areas = profile.integrate(x[10], x[40])
+    y = profile.matrix[:, 10:41]
+    assert np.allclose(areas, ((y[:, 1:] + y[:, :-1])*np.abs(np.diff(x[10:41]))).sum(axis=1)/2)
+    assert np.allclose(profile.integrate(x[40], x[10]), areas)
+
+
+def test_mapPositionsSeparate(vamasFile):
+    fileName = vamasFile("SDP", numBlocks=6, name="map.vms")
+    blocks = readVamasBlocks(fileName)
+    #Three etch cycles at each of two map positions, interleaved
+    for index, block in enumerate(blocks):
+        block.expMode = "MAPDP"
+        block.xCoord, block.yCoord = index % 2 + 1, 1
+    profiles = stackDepthProfiles(blocks)
+    assert [profile.regionName.endswith("({0}, 1)".format(x)) for profile, x in zip(profiles, (1, 2))] == [True, True]
+    assert [profile.blocks for profile in profiles] == [[0, 2, 4], [1, 3, 5]]
+    assert all(np.all(np.diff(profile.depths) > 0) for profile in profiles)
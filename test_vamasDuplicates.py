@@ -0,0 +1,49 @@
+"""Duplicate detection: copies of files are found by the fingerprints of their blocks
+
+Run with: python -m pytest test_vamasDuplicates.py
+"""
+import os
+import shutil
+from vamasLoader import readVamasBlocks
+from vamasCollection import VamasCollection
+from vamasDuplicates import DuplicateIndex
+
+
+def test_copiesInOtherFolders(tmp_path, vamasFile):
+    original = vamasFile("SDP", numBlocks=3, name="a/source.vms")
+    other = vamasFile("SDP", numBlocks=3, seed=1, name="b/other.vms")
+    os.makedirs(str(tmp_path / "b" / "c"))
+    copies = [str(tmp_path / "b" / "copy.vms"), str(tmp_path / "b" / "c" / "source.vms")]
+    for copy in copies:
+        shutil.copy(original, copy)
+
+    index = DuplicateIndex()
+    assert index.addAll(readVamasBlocks(original, headerOnly=True)) == [None]*3
+    assert index.addAll(readVamasBlocks(other, headerOnly=True)) == [None]*3
+    for copy in copies:
+        duplicates = index.addAll(readVamasBlocks(copy, headerOnly=True))
+        assert [(d.fileName, d.blockNumber, d.originalFileName, d.originalBlockNumber) for d in duplicates] == \
+            [(copy, number, original, number) for number in (1, 2, 3)]
+    assert len(index) == 6
+
+
+def test_headerOnlyNotLoaded(vamasFile):
+    names = [vamasFile(numBlocks=2, seed=seed, name="{0}.vms".format(seed)) for seed in range(2)]
+    collection = VamasCollection(block for fileName in names for block in readVamasBlocks(fileName, headerOnly=True))
+    index = DuplicateIndex(collection)
+    #Different values but equal fields: the fingerprints are computed, the spectra stay unloaded
+    assert len(index) == 4
+    assert all(loader is not None for loader in collection.ordinateLoaders)
+
+
+def test_editedBlockAndRemove(vamasFile):
+    fileName = vamasFile(numBlocks=2)
+    blocks = readVamasBlocks(fileName)
+    index = DuplicateIndex(blocks)
+    copy = readVamasBlocks(fileName)[0]
+    assert index.find(copy) is not None
+    copy.yAxisValuesList = copy.yAxisValuesList + 1
+    copy.fingerprint = ""
+    assert index.find(copy) is None
+    index.remove(blocks[0])
+    assert index.find(blocks[0]) is None and len(index) == 1
@@ -0,0 +1,75 @@
+"""Spectrum pipeline: stage results are cached and only changed stages are computed again
+
+Run with: python -m pytest test_vamasProcessing.py
+"""
+import numpy as np
+import pytest
+from vamasLoader import readVamasBlocks
+from vamasProcessing import SpectrumPipeline, linearBackground, shirleyBackground, stages
+
+
+@pytest.fixture
+def blocks(vamasFile):
+    fileName = vamasFile("SDP", numBlocks=4, numPoints=200)
+    return readVamasBlocks(fileName)
+
+
+def test_defaultsKeepSpectra(blocks):
+    for block, spectrum in zip(blocks, SpectrumPipeline().process(blocks)):
+        assert np.array_equal(spectrum.x, block.xAxisValuesList)
+        assert np.array_equal(spectrum.y, block.yAxisValuesList[0])
+        assert not spectrum.background.any()
+
+
+def test_recomputeChangedStage(blocks):
+    pipeline = SpectrumPipeline(background={'method': 'linear'}, normalisation={'method': 'max'})
+    first = pipeline.process(blocks)
+    assert pipeline.computed == {stage: len(blocks) for stage in stages}
+    #Everything cached
+    assert all(a is b for a, b in zip(pipeline.process(blocks), first))
+    assert pipeline.computed == {stage: len(blocks) for stage in stages}
+    #Only normalisation changed
+    pipeline.setParameters('normalisation', method='area')
+    pipeline.process(blocks)
+    assert pipeline.computed == {'energy': 4, 'calibration': 4, 'background': 4, 'normalisation': 8}
+    #Changing the background recomputes the following stages
+    pipeline.setParameters('background', method='shirley')
+    pipeline.process(blocks)
+    assert pipeline.computed == {'energy': 4, 'calibration': 4, 'background': 8, 'normalisation': 12}
+    #Back to the first parameters, still cached
+    pipeline.setParameters('background', method='linear')
+    pipeline.setParameters('normalisation', method='max')
+    assert all(a is b for a, b in zip(pipeline.process(blocks), first))
+    pipeline.invalidate(blocks[0].fileName)
+    pipeline.process(blocks)
+    assert pipeline.computed['energy'] == 8
+
+
+def test_stages(blocks):
+    pipeline = SpectrumPipeline(calibration={'shift': 1.5}, background={'method': 'linear'}, normalisation={'method': 'max'})
+    for block, spectrum in zip(blocks, pipeline.process(blocks)):
+        x = np.asarray(block.xAxisValuesList) + 1.5
+        y = block.yAxisValuesList[0]
+        background = y[0] + (y[-1] - y[0])*(x - x[0])/(x[-1] - x[0])
+        assert np.allclose(spectrum.x, x)
+        assert np.allclose(spectrum.background, background)
+        assert np.allclose(spectrum.y, (y - background)/np.max(y - background))
+        assert spectrum.shift == 1.5
+
+
+def test_backgroundRange():
+    x = np.linspace(0, 10, 11)[None, :]
+    y = (x**2)
+    background = linearBackground(x, y, 2, 6)
+    assert np.isnan(background[0, :2]).all() and np.isnan(background[0, 7:]).all()
+    assert np.allclose(background[0, 2:7], 4 + 8*(x[0, 2:7] - 2))
+    #A constant spectrum has itself as Shirley background
+    shirley = shirleyBackground(x, np.full(x.shape, 3.0))
+    assert np.allclose(shirley, 3.0)
+
+
+def test_unknownParameters():
+    with pytest.raises(ValueError):
+        SpectrumPipeline(smoothing={'points': 5})
+    with pytest.raises(ValueError):
+        SpectrumPipeline().setParameters('background', order=2)
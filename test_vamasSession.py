@@ -0,0 +1,85 @@
+"""Session files: saving and loading give the same blocks, also when saving over the mapped file
+
+Run with: python -m pytest test_vamasSession.py
+"""
+import os
+import numpy as np
+import pytest
+from vamasLoader import readVamasBlocks
+from vamasCollection import VamasCollection
+from vamasSession import saveSession, loadSession, mappedFile
+from vamasWriter import compareBlocks
+
+
+@pytest.fixture
+def blocks(vamasFile):
+    fileName = vamasFile("SDP", "IRREGULAR", numBlocks=3, numVars=2)
+    return readVamasBlocks(fileName)
+
+
+@pytest.mark.parametrize("useMmap", [True, False])
+def test_saveLoad(tmp_path, blocks, useMmap):
+    sessionName = str(tmp_path / "session.vmss")
+    collection = VamasCollection(blocks)
+    collection.setValue(0, 'blockName', "Edited")
+    saveSession(sessionName, collection, state={'selectedRows': [1, 3]})
+    loaded, state = loadSession(sessionName, useMmap=useMmap)
+    assert state == {'selectedRows': [1, 3]}
+    assert len(loaded) == len(blocks)
+    for index in range(len(blocks)):
+        assert loaded.getParameters(index) == collection.getParameters(index)
+        assert np.array_equal(loaded[index].yAxisValuesList, blocks[index].yAxisValuesList)
+        assert np.array_equal(loaded[index].xAxisValuesList, blocks[index].xAxisValuesList)
+    assert (mappedFile(loaded.yAxisValues[0]) is not None) == useMmap
+
+
+def test_headerOnly(tmp_path, blocks):
+    sessionName = str(tmp_path / "session.vmss")
+    saveSession(sessionName, VamasCollection(readVamasBlocks(blocks[0].fileName, headerOnly=True)))
+    loaded, state = loadSession(sessionName)
+    assert state == {}
+    for block, row in zip(blocks, loaded):
+        assert compareBlocks(block, row) == []
+
+
+def test_saveOverMapped(tmp_path, blocks):
+    sessionName = str(tmp_path / "session.vmss")
+    saveSession(sessionName, VamasCollection(blocks))
+    loaded, state = loadSession(sessionName)
+    assert mappedFile(loaded.yAxisValues[1]) is not None
+    #Changing a mapped spectrum does not change the file, saving writes the change
+    loaded.yAxisValues[1][0, 0] += 1
+    loaded.append(blocks[0])
+    saveSession(sessionName, loaded)
+    assert all(mappedFile(values) is None for values in loaded.yAxisValues)
+    reloaded, state = loadSession(sessionName)
+    assert len(reloaded) == len(blocks) + 1
+    assert reloaded[1].yAxisValuesList[0, 0] == blocks[1].yAxisValuesList[0, 0] + 1
+    assert np.array_equal(reloaded[3].yAxisValuesList, blocks[0].yAxisValuesList)
+
+
+def test_noSession(vamasFile):
+    fileName = vamasFile(numPoints=10)
+    with pytest.raises(ValueError):
+        loadSession(fileName)
+
+
+def test_empty(tmp_path):
+    sessionName = str(tmp_path / "session.vmss")
+    saveSession(sessionName, VamasCollection())
+    loaded, state = loadSession(sessionName)
+    assert len(loaded) == 0
+
+
+def test_failedSaveRemovesTemporary(tmp_path, blocks, monkeypatch):
+    sessionName = str(tmp_path / "session.vmss")
+    saveSession(sessionName, VamasCollection(blocks[:1]))
+    before = open(sessionName, 'rb').read()
+
+    def failingReplace(source, target):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(os, 'replace', failingReplace)
+    with pytest.raises(OSError):
+        saveSession(sessionName, VamasCollection(blocks))
+    assert sorted(os.listdir(str(tmp_path))) == ["session.vmss", "source.vms"]
+    assert open(sessionName, 'rb').read() == before
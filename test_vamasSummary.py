@@ -0,0 +1,71 @@
+"""Sort keys and filter indexes of the summary view after blocks were added and edited
+
+Run with: python -m pytest test_vamasSummary.py
+"""
+from datetime import datetime
+import numpy as np
+from vamasLoader import readVamasBlocks
+from vamasCollection import VamasCollection
+from vamasSummary import SummaryIndex
+
+
+def makeCollection(vamasFile, numBlocks=4):
+    fileName = vamasFile(numBlocks=numBlocks, numPoints=20)
+    collection = VamasCollection(readVamasBlocks(fileName))
+    for index in range(numBlocks):
+        collection.setValue(index, 'blockName', "Region{0}".format(index + 1))
+        collection.setValue(index, 'sampleName', "Sample {0}".format("AB"[index % 2]))
+    return collection
+
+
+def test_sortAfterLongerEdit(vamasFile):
+    collection = makeCollection(vamasFile)
+    summary = SummaryIndex(collection)
+    assert list(summary.sortOrder('blockName')) == [0, 1, 2, 3]
+    collection.setValue(0, 'blockName', "ZZZ_long_region_name")
+    collection.setValue(2, 'blockName', "Region10b")
+    summary.updateBlocks([0, 2], ['blockName'])
+    assert summary.getKeys('blockName')[0] == "zzz_long_region_name"
+    #"region10b" sorts between "region1" (now block 0 is last) and "region2"
+    assert list(summary.sortOrder('blockName')) == [2, 1, 3, 0]
+    assert list(summary.sortOrder('blockName', descending=True)) == [0, 3, 1, 2]
+
+
+def test_sortAppendedBlocks(vamasFile):
+    collection = makeCollection(vamasFile, numBlocks=3)
+    summary = SummaryIndex(collection)
+    summary.getKeys('blockName')
+    block = collection.getBlock(0)
+    block.blockName = "A much longer name than the others"
+    collection.append(block)
+    summary.update()
+    assert list(summary.sortOrder('blockName')) == [3, 0, 1, 2]
+
+
+def test_filterAfterEdit(vamasFile):
+    collection = makeCollection(vamasFile)
+    summary = SummaryIndex(collection)
+    assert list(np.flatnonzero(summary.filterMask(sampleText="sample a"))) == [0, 2]
+    #Narrowing the text reuses the previous matches
+    assert list(np.flatnonzero(summary.filterMask(sampleText="sample b"))) == [1, 3]
+    collection.setValue(3, 'sampleName', "Sample A2")
+    summary.updateBlocks([3], ['sampleName'])
+    assert list(np.flatnonzero(summary.filterMask(sampleText="sample a"))) == [0, 2, 3]
+    assert list(np.flatnonzero(summary.filterMask(sampleText="sample a2"))) == [3]
+    technique = collection.getValue(0, 'technique')
+    assert list(np.flatnonzero(summary.filterMask(sampleText="sample a", technique=technique))) == [0, 2, 3]
+    assert not summary.filterMask(technique="no such technique").any()
+
+
+def test_rangeFilterAfterEdit(vamasFile):
+    collection = makeCollection(vamasFile)
+    for index, passEnergy in enumerate((20.0, 40.0, 80.0, 160.0)):
+        collection.setValue(index, 'analyzerPEorRR', passEnergy)
+        collection.setValue(index, 'date', datetime(2020, 1, index + 1))
+    summary = SummaryIndex(collection)
+    assert list(np.flatnonzero(summary.filterMask(passEnergyRange=(30, 100)))) == [1, 2]
+    collection.setValue(0, 'analyzerPEorRR', 50.0)
+    summary.updateBlocks([0], ['analyzerPEorRR'])
+    assert list(np.flatnonzero(summary.filterMask(passEnergyRange=(30, 100)))) == [0, 1, 2]
+    assert list(np.flatnonzero(summary.filterMask(dateRange=(datetime(2020, 1, 2), None)))) == [1, 2, 3]
+    assert list(np.flatnonzero(summary.filterMask(dateRange=(None, datetime(2020, 1, 2)), passEnergyRange=(35, None)))) == [0, 1]
@@ -0,0 +1,35 @@
+"""Folder watcher: files are reported once fully written and a cancelled scan reports nothing
+
+Run with: python -m pytest test_vamasWatcher.py
+"""
+import os
+from vamasWatcher import FolderWatcher
+
+
+def settle(fileName):
+    """Set the modification time of a file before the settle time
+    """
+    stat = os.stat(fileName)
+    os.utime(fileName, ns=(stat.st_atime_ns, stat.st_mtime_ns - int(10*FolderWatcher.settleTime*1e9)))
+    return fileName
+
+
+def test_reportNewAndChanged(tmp_path, vamasFile):
+    known = settle(vamasFile(numPoints=20, name="known.vms"))
+    new = settle(vamasFile(numPoints=20, name="sub/new.vms"))
+    watcher = FolderWatcher(str(tmp_path), knownFiles=[known])
+    #Reported when the state did not change between two scans
+    assert watcher.scan() == ([], [])
+    assert watcher.scan() == ([new], [])
+    assert watcher.scan() == ([], [])
+    settle(vamasFile(numPoints=20, seed=1, name="known.vms"))
+    watcher.scan()
+    assert watcher.scan() == ([], [known])
+
+
+def test_cancel(tmp_path, vamasFile):
+    settle(vamasFile(numPoints=20))
+    watcher = FolderWatcher(str(tmp_path))
+    watcher.scan()
+    watcher.cancel()
+    assert watcher.scan() == ([], [])
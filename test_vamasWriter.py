@@ -0,0 +1,57 @@
+"""Round trip of the VAMAS writer: files read, written and read again give the same blocks
+
+Run with: python -m pytest test_vamasWriter.py
+"""
+import numpy as np
+import pytest
+from vamasGenerator import experimentModes, scanModes
+from vamasLoader import readVamasBlocks
+from vamasWriter import writeVamasBlocks, compareBlocks, wholeNumbers
+
+
+def roundTrip(folder, blocks):
+    """Write blocks and read them back
+    """
+    copyName = str(folder / "copy.vms")
+    writeVamasBlocks(copyName, blocks)
+    return readVamasBlocks(copyName)
+
+
+@pytest.mark.parametrize("scanMode", scanModes)
+@pytest.mark.parametrize("expMode", experimentModes)
+def test_roundTrip(tmp_path, vamasFile, expMode, scanMode):
+    fileName = vamasFile(expMode, scanMode, numBlocks=4, numPoints=100, numVars=2)
+    blocks = readVamasBlocks(fileName)
+    copies = roundTrip(tmp_path, blocks)
+    assert len(copies) == len(blocks)
+    for block, copy in zip(blocks, copies):
+        assert compareBlocks(block, copy) == []
+        assert copy.fingerprint == block.fingerprint
+
+
+def test_roundTripHeaderOnly(tmp_path, vamasFile):
+    fileName = vamasFile("SDP", numBlocks=3)
+    copies = roundTrip(tmp_path, readVamasBlocks(fileName, headerOnly=True))
+    for block, copy in zip(readVamasBlocks(fileName), copies):
+        assert compareBlocks(block, copy) == []
+
+
+def test_roundTripFloatValues(tmp_path, vamasFile):
+    fileName = vamasFile(numBlocks=2, numPoints=200, numVars=2)
+    blocks = readVamasBlocks(fileName)
+    random = np.random.default_rng(0)
+    #Fractions, whole numbers, -0.0 and numbers too large for integers in one chunk each
+    blocks[0].yAxisValuesList = random.normal(0, 1e3, (2, 200))
+    blocks[1].yAxisValuesList = np.vstack([np.round(random.normal(0, 1e3, 200)), np.full(200, -0.0)])
+    blocks[1].yAxisValuesList[0, 0] = 2.0**60
+    for block, copy in zip(blocks, roundTrip(tmp_path, blocks)):
+        assert compareBlocks(block, copy) == []
+        assert np.array_equal(np.signbit(copy.yAxisValuesList), np.signbit(block.yAxisValuesList))
+
+
+def test_wholeNumbers():
+    assert wholeNumbers(np.array([0.0, 1.0, -25.0, 1e15]))
+    assert not wholeNumbers(np.array([0.0, 0.5]))
+    assert not wholeNumbers(np.array([1.0, -0.0]))
+    assert not wholeNumbers(np.array([2.0**60]))
+    assert not wholeNumbers(np.array([1.0, np.nan]))
@@ -0,0 +1,373 @@
+"""Sum, mean and median of many spectra on a common energy grid
+
+Repeated scans or spectra of several sample positions have slightly different energy axes. They are resampled
+onto a common grid by linear interpolation and then aggregated point by point, weighted by the acquisition time
+dwellTime x numSweeps of each spectrum. The energy axes are equally spaced, as those of VAMAS blocks created from
+xAxisStart and xAxisIncrement, and identified by their first and last energy and number of points. The
+interpolation weights depend only on the energy axis of a spectrum and the grid, they are cached per pair of axes.
+Common grids are multiples of their increment, so the grids of different selections share the cached weights and
+aggregating again after adding or removing a spectrum only gathers the values of the spectra. Spectra with an energy
+axis of their own share no weights and are interpolated by np.interp.
+
+    aggregator = SpectrumAggregator()
+    total = aggregator.aggregateBlocks(blocks, method='sum')
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+import numpy as np
+
+methods = ('sum', 'mean', 'median')
+#Spectra of one energy axis summed one by one, more are stacked and summed by a matrix product
+smallGroup = 8
+
+
+@dataclass
+class AggregatedSpectrum:
+    """Aggregate of spectra on a common grid
+    """
+    x: np.ndarray
+    y: np.ndarray
+    method: str
+    #Number of spectra and summed weights of the spectra covering each point
+    counts: np.ndarray
+    weights: np.ndarray
+
+
+def gridValues(grid):
+    """Return the energies of a grid (start, increment, numPoints)
+    """
+    start, increment, numPoints = grid
+    return start + increment*np.arange(numPoints)
+
+
+def axisKey(x):
+    """Return the key identifying an equally spaced energy axis: first and last energy and number of points
+    """
+    return (float(x[0]), float(x[-1]), len(x)) if len(x) else (0.0, 0.0, 0)
+
+
+def gridLattice(grid):
+    """Return the lattice of equally spaced energies a grid is part of
+       Grids with the same increment and offset share the interpolation weights of a spectrum, e.g. the common
+       grids of different selections of spectra.
+
+    Returns:
+        {tuple} -- step and offset of the lattice, the energies are (index + offset)*step, and index of the first point of the grid
+    """
+    start, increment, numPoints = grid
+    step = abs(increment)
+    position = start/step
+    first = int(round(position))
+    return step, round(position - first, 6), first
+
+
+def commonGrid(axes):
+    """Return the grid covered by all energy axes with the smallest increment of them
+       The grid points are multiples of the increment and the grid runs in the direction of the first axis,
+       e.g. decreasing for binding energies.
+
+    Arguments:
+        axes {list} -- equally spaced energy axes, ascending or descending
+
+    Raises:
+        ValueError: if there are no axes or they do not overlap
+
+    Returns:
+        {tuple} -- start, increment and number of points of the grid
+    """
+    return keyGrid(set(axisKey(x) for x in axes), axisKey(next((x for x in axes if len(x) > 1), [])))
+
+
+def keyGrid(keys, firstKey):
+    """Return the common grid of energy axes given by their axisKey(), see commonGrid()
+
+    Arguments:
+        keys {iterable} -- axisKey() of the axes
+        firstKey {tuple} -- axisKey() of the axis giving the direction of the grid
+
+    Returns:
+        {tuple} -- start, increment and number of points of the grid
+    """
+    keys = [key for key in keys if key[2] > 1]
+    if not keys:
+        raise ValueError("No spectra with more than one point")
+    increment = min(abs(last - first)/(numPoints - 1) for first, last, numPoints in keys)
+    if increment == 0:
+        raise ValueError("The spectra have no energy range")
+    #Rounded to avoid losing the points at the limits by floating point errors
+    lowest = int(np.ceil(max(min(first, last) for first, last, numPoints in keys)/increment - 1e-6))
+    highest = int(np.floor(min(max(first, last) for first, last, numPoints in keys)/increment + 1e-6))
+    if lowest > highest:
+        raise ValueError("The energy ranges of the spectra do not overlap")
+    if firstKey[0] > firstKey[1]:
+        return (highest*increment, -increment, highest - lowest + 1)
+    return (lowest*increment, increment, highest - lowest + 1)
+
+
+def interpolationWeights(x, step, offset):
+    """Return the neighbours and weights of linear interpolation from an energy axis to the points of a lattice within the axis
+
+    Arguments:
+        x {np.ndarray} -- energy axis of the spectrum, ascending or descending
+        step {float} -- step of the lattice
+        offset {float} -- offset of the lattice, the energies are (index + offset)*step
+
+    Returns:
+        {tuple} -- lattice index of the first point within x, index of the lower and upper neighbour in x and
+                   weight of the upper one for each lattice point within x
+    """
+    x = np.asarray(x, dtype=float)
+    if len(x) < 2:
+        #A single point covers no range
+        return 0, np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), np.zeros(0)
+    descending = x[0] > x[-1]
+    ascending = x[::-1] if descending else x
+    first = int(np.ceil(ascending[0]/step - offset - 1e-6))
+    last = int(np.floor(ascending[-1]/step - offset + 1e-6))
+    target = (np.arange(first, last + 1) + offset)*step
+    lower = np.clip(np.searchsorted(ascending, target, 'right') - 1, 0, len(ascending) - 2)
+    upper = lower + 1
+    distance = ascending[upper] - ascending[lower]
+    fraction = np.clip(np.divide(target - ascending[lower], distance, out=np.zeros(len(target)), where=distance != 0), 0.0, 1.0)
+    if descending:
+        lower, upper = len(x) - 1 - lower, len(x) - 1 - upper
+    return first, lower, upper, fraction
+
+
+def interpolate(energies, x, y, outside=np.nan):
+    """Return the values of a spectrum at energies by linear interpolation
+
+    Arguments:
+        energies {np.ndarray} -- energies to interpolate at
+        x {np.ndarray} -- energy axis of the spectrum, ascending or descending
+        y {np.ndarray} -- values of the spectrum
+
+    Keyword Arguments:
+        outside {float} -- value outside of the energy range, the first or last value of the spectrum if None (default: {np.nan})
+    """
+    if x[0] > x[-1]:
+        x, y = x[::-1], y[::-1]
+    return np.interp(energies, x, y, left=outside, right=outside)
+
+
+def acquisitionWeights(blocks):
+    """Return the acquisition time dwellTime x numSweeps of each block as weights
+
+    Returns:
+        {np.ndarray} -- weight of each block, None for equal weights if a block has no acquisition time
+    """
+    weights = np.array([block.dwellTime*block.numSweeps for block in blocks], dtype=float)
+    if not np.all(weights > 0):
+        return None
+    return weights
+
+
+def trimCache(cache, maxEntries):
+    """Remove the least recently used entries of an OrderedDict beyond maxEntries
+    """
+    while len(cache) > maxEntries:
+        cache.popitem(last=False)
+
+
+def groupByAxis(spectra):
+    """Return the spectra grouped by their energy axis
+
+    Arguments:
+        spectra {list} -- (x, y) arrays of each spectrum
+
+    Returns:
+        {list} -- key and array of the energy axis and indexes of its spectra for each group
+    """
+    groups = dict()
+    for row, (x, y) in enumerate(spectra):
+        key = axisKey(x)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = (key, x, [])
+        group[2].append(row)
+    return list(groups.values())
+
+
+class SpectrumAggregator:
+    """Resamples spectra onto a common grid and aggregates them, keeping the interpolation weights of each
+       pair of energy axis and grid lattice and of each pair of energy axis and grid
+    """
+    #Cached interpolation weights at most, the least recently used are removed
+    maxEntries = 10000
+
+    def __init__(self):
+        #(axis key, lattice step, lattice offset): interpolation weights to the lattice
+        self.cache = OrderedDict()
+        #(axis key, grid): interpolation weights to the grid, taken from the lattice
+        self.gridCache = OrderedDict()
+        #Interpolation weights computed, to check the cache
+        self.computed = 0
+
+    def weights(self, key, x, grid):
+        """Return the interpolation weights from an energy axis to a grid, from the cached weights of its lattice
+
+        Arguments:
+            key {tuple} -- axisKey() of the energy axis
+            x {np.ndarray} -- energy axis
+            grid {tuple} -- start, increment and number of points of the grid
+
+        Returns:
+            {tuple} -- index of the lower and upper neighbour in x, weight of the lower and of the upper one for each grid point,
+                       bool array which is False for grid points outside of x or None if all are inside
+        """
+        weights = self.gridCache.get((key, grid))
+        if weights is not None:
+            self.gridCache.move_to_end((key, grid))
+            return weights
+        step, offset, start = gridLattice(grid)
+        latticeKey = (key, step, offset)
+        latticeWeights = self.cache.get(latticeKey)
+        if latticeWeights is None:
+            latticeWeights = self.cache[latticeKey] = interpolationWeights(x, step, offset)
+            self.computed += 1
+            trimCache(self.cache, self.maxEntries)
+        else:
+            self.cache.move_to_end(latticeKey)
+        first, lower, upper, fraction = latticeWeights
+        positions = start - first + np.arange(grid[2])*(1 if grid[1] >= 0 else -1)
+        inside = (positions >= 0) & (positions < len(fraction))
+        if len(fraction) == 0:
+            weights = positions, positions, np.zeros(grid[2]), np.zeros(grid[2]), inside
+        elif inside.all():
+            weights = lower[positions], upper[positions], 1 - fraction[positions], fraction[positions], None
+        else:
+            positions = np.where(inside, positions, 0)
+            weights = lower[positions], upper[positions], 1 - fraction[positions], fraction[positions], inside
+        self.gridCache[(key, grid)] = weights
+        trimCache(self.gridCache, self.maxEntries)
+        return weights
+
+    def resample(self, spectra, grid):
+        """Resample spectra onto a grid, spectra with the same energy axis at once
+
+        Arguments:
+            spectra {list} -- (x, y) arrays of each spectrum
+            grid {tuple} -- start, increment and number of points of the grid
+
+        Returns:
+            {np.ndarray} -- values of shape (spectrum, point), NaN outside of the energy range of a spectrum
+        """
+        resampled = np.full((len(spectra), grid[2]), np.nan)
+        for key, x, rows in groupByAxis(spectra):
+            lower, upper, lowerWeight, upperWeight, inside = self.weights(key, x, grid)
+            y = np.stack([np.asarray(spectra[row][1], dtype=float) for row in rows])
+            values = y[:, lower]*lowerWeight + y[:, upper]*upperWeight
+            resampled[rows] = values if inside is None else np.where(inside, values, np.nan)
+        return resampled
+
+    def aggregate(self, spectra, weights=None, method='mean', grid=None):
+        """Resample spectra onto a common grid and aggregate them point by point
+           Points outside of the energy range of a spectrum are left out of the aggregate of the point.
+           Interpolation is linear, so the sum and mean are computed per energy axis first and only these are
+           resampled, the median needs the resampled values of all spectra.
+
+        Arguments:
+            spectra {list} -- (x, y) arrays of each spectrum, the energy axes equally spaced
+
+        Keyword Arguments:
+            weights {np.ndarray} -- weight of each spectrum, equal weights if None (default: {None})
+            method {str} -- 'sum' of the spectra, weighted 'mean' or weighted 'median', the lower one of two middle values (default: {'mean'})
+            grid {tuple} -- start, increment and number of points, commonGrid() of the spectra if None (default: {None})
+
+        Raises:
+            ValueError: if the method is unknown or the spectra do not overlap
+
+        Returns:
+            {AggregatedSpectrum} -- the aggregate, NaN at points without any spectrum
+        """
+        if method not in methods:
+            raise ValueError("Unknown aggregation {0}".format(method))
+        groups = groupByAxis(spectra)
+        #The common grid is within all spectra, its limits only up to rounding
+        covering = grid is None
+        if grid is None:
+            grid = keyGrid([key for key, x, rows in groups], next((key for key, x, rows in groups if key[2] > 1), (0.0, 0.0, 0)))
+        weights = np.ones(len(spectra)) if weights is None else np.asarray(weights, dtype=float)
+        numPoints = grid[2]
+        if method != 'median':
+            counts = np.zeros(numPoints, dtype=int)
+            totals = np.zeros(numPoints)
+            summed = np.zeros(numPoints)
+            #Spectra covering the whole grid, the common grid by default, are counted once
+            coveringCount = 0
+            coveringWeight = 0.0
+            energies = gridValues(grid)
+            outside = None if covering else np.nan
+            #Spectra with an energy axis of their own are interpolated without cached weights, which would not be shared
+            singles = [rows[0] for key, x, rows in groups if key[2] > 1 and len(rows) == 1]
+            if singles:
+                values = np.array([interpolate(energies, *spectra[row], outside=outside) for row in singles])
+                singleWeights = weights[singles]
+                if covering:
+                    summed += (singleWeights if method == 'mean' else np.ones(len(singles))) @ values
+                    coveringCount += len(singles)
+                    coveringWeight += singleWeights.sum()
+                else:
+                    inside = ~np.isnan(values)
+                    summed += (singleWeights if method == 'mean' else np.ones(len(singles))) @ np.where(inside, values, 0.0)
+                    counts += inside.sum(axis=0)
+                    totals += singleWeights @ inside
+                groups = [group for group in groups if not (group[0][2] > 1 and len(group[2]) == 1)]
+            for key, x, rows in groups:
+                lower, upper, lowerWeight, upperWeight, inside = self.weights(key, x, grid)
+                groupWeights = weights[rows] if method == 'mean' else np.ones(len(rows))
+                if len(rows) <= smallGroup:
+                    y = groupWeights[0]*np.asarray(spectra[rows[0]][1], dtype=float)
+                    for weight, row in zip(groupWeights[1:], rows[1:]):
+                        y += weight*np.asarray(spectra[row][1], dtype=float)
+                else:
+                    y = groupWeights @ np.stack([np.asarray(spectra[row][1], dtype=float) for row in rows])
+                values = y[lower]*lowerWeight + y[upper]*upperWeight
+                if inside is None:
+                    summed += values
+                    coveringCount += len(rows)
+                    coveringWeight += weights[rows].sum()
+                else:
+                    summed += np.where(inside, values, 0.0)
+                    counts += inside*len(rows)
+                    totals += inside*weights[rows].sum()
+            counts += coveringCount
+            totals += coveringWeight
+            if method == 'sum':
+                y = np.where(counts > 0, summed, np.nan)
+            else:
+                y = np.divide(summed, totals, out=np.full(numPoints, np.nan), where=totals > 0)
+            return AggregatedSpectrum(energies, y, method, counts, totals)
+        values = self.resample(spectra, grid)
+        covered = ~np.isnan(values)
+        pointWeights = np.where(covered, weights[:, None], 0.0)
+        counts = covered.sum(axis=0)
+        totals = pointWeights.sum(axis=0)
+        if len(values) == 0:
+            y = np.full(numPoints, np.nan)
+        else:
+            #Sorted values of each point, NaN last, the median is where the summed weights reach half of the total
+            order = np.argsort(np.where(covered, values, np.inf), axis=0)
+            sortedValues = np.take_along_axis(values, order, axis=0)
+            cumulative = np.cumsum(np.take_along_axis(pointWeights, order, axis=0), axis=0)
+            middle = np.argmax(cumulative >= totals/2, axis=0)
+            y = np.where(totals > 0, sortedValues[middle, np.arange(numPoints)], np.nan)
+        return AggregatedSpectrum(gridValues(grid), y, method, counts, totals)
+
+    def aggregateBlocks(self, blocks, method='mean', grid=None, variable=0):
+        """Aggregate the spectra of blocks weighted by their acquisition time dwellTime x numSweeps
+           Equal weights are used if a block has no acquisition time.
+
+        Arguments:
+            blocks {list} -- VAMAS_File or VamasRow of the blocks
+
+        Keyword Arguments:
+            method {str} -- 'sum', 'mean' or 'median', see aggregate() (default: {'mean'})
+            grid {tuple} -- start, increment and number of points, commonGrid() of the spectra if None (default: {None})
+            variable {int} -- corresponding variable of the spectra (default: {0})
+
+        Returns:
+            {AggregatedSpectrum} -- the aggregate
+        """
+        blocks = [block for block in blocks if block.numYAxisValues > 0 and block.numYAxisVars > variable]
+        return self.aggregate([(block.xAxisValuesList, block.yAxisValuesList[variable]) for block in blocks], acquisitionWeights(blocks), method, grid)
@@ -0,0 +1,895 @@
+"""Benchmarks for the VAMAS parser
+
+Usage:
+    python vamasBenchmark.py comment [--repeat N] [--notes N]
+    python vamasBenchmark.py memory FILE [FILE ...] [--files N]
+    python vamasBenchmark.py model FILE [FILE ...] [--files N] [--repaints N]
+    python vamasBenchmark.py plot [--lines N] [--points N] [--steps N]
+    python vamasBenchmark.py parse [--mode NORM SDP ...] [--scan REGULAR IRREGULAR] [--repeat N] [--keep FOLDER]
+    python vamasBenchmark.py session [--files N] [--blocks N] [--points N]
+    python vamasBenchmark.py summary [--blocks N]
+    python vamasBenchmark.py map [--size N] [--points N]
+    python vamasBenchmark.py depth [--cycles N] [--points N]
+    python vamasBenchmark.py write [--blocks N] [--points N]
+    python vamasBenchmark.py insert [--files N] [--batch N]
+    python vamasBenchmark.py process [--files N] [--blocks N] [--points N]
+    python vamasBenchmark.py aggregate [--spectra N] [--points N]
+    python vamasBenchmark.py duplicates [--files N] [--copies N]
+"""
+import argparse
+import configparser
+import gc
+import os
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+import numpy as np
+from dataclasses import fields
+from vamasCollection import VamasCollection
+from vamasDecimation import DecimatedPlot, DecimationPyramid
+from vamasGenerator import writeVamasFile, experimentModes, scanModes
+from vamasLoader import readVamasBlocks
+from vamasMap import readMapCubes
+from vamasDepthProfile import stackDepthProfiles
+from vamasWriter import writeVamasBlocks, compareBlocks
+from vamasProcessing import SpectrumPipeline, stages
+from vamasAggregate import SpectrumAggregator, commonGrid, gridValues
+from vamasDuplicates import DuplicateIndex
+from vamasSession import saveSession, loadSession
+from vamasSimple import VAMAS_File, parseParameter, parseString, parameterRegex, stringRegex, commentExtractor, blockCommentExtractor
+
+#Highest memory of the parameters of a block in a VamasCollection, for 100000 blocks about 200 MB
+memoryTargetBytes = 2048
+
+#QApplication of the benchmarks of the models and views, kept for all of them
+application = None
+
+
+def qApplication():
+    """Return the QApplication, created on first use, set QT_QPA_PLATFORM before for offscreen views
+    """
+    global application
+    from PyQt5.QtWidgets import QApplication
+    application = QApplication.instance() or QApplication([])
+    return application
+
+
+#Comment and block comment as written by Omicron MATRIX V4.4.9
+matrixComment = """CREATION COMMENT START
+Created with: MATRIX V4.4.9
+Date of Acquisition: 17.05.2020 13:45
+SourceAnalyserAngle: 54.7 DEG
+pIG=1.2e-10 mbar
+pPIR=3.4e-3 mbar
+pHIS: 1e-3 mbar
+VHIS: 600 V
+WHIS: 25.5 W
+VHIS: 800 V
+Filter: 3
+FilterDeg: 45.5
+Bias: -5 V
+CREATION COMMENT END
+"""
+
+matrixBlockComment = """Aperture: 2
+X-Ray Source Voltage: 15.0 kV
+X-Ray Source Power: 250 W
+X-Ray Source Emission Current: 16.7 mA
+X-Ray Source Filament Current: 4.1 A
+X-Ray Source Leak Current: 0.01 mA
+Sample Position X: -1.5 mm
+Sample Position Y: 2.5 mm
+Sample Position Z: 10 mm
+Sample Position Theta: 0 deg
+Sample Position Phi: 90 deg
+Exit Slit: 3 (slit)
+"""
+
+#Keywords in the order they were parsed by readVamasFile before the single-pass extractor
+legacyCommentKeywords = ["SourceAnalyserAngle", "pIG", "pPIR", "pHIS", "VHIS", "WHIS", "VHIS", "Filter", "FilterDeg", "Bias"]
+legacyCommentStrings = ["Created with", "Date of Acquisition"]
+legacyBlockKeywords = ["Aperture", "X-Ray Source Voltage", "X-Ray Source Power", "X-Ray Source Emission Current",
+    "X-Ray Source Filament Current", "X-Ray Source Leak Current", "Sample Position X", "Sample Position Y",
+    "Sample Position Z", "Sample Position Theta", "Sample Position Phi"]
+legacyBlockStrings = ["Exit Slit"]
+
+
+def legacyCommentParsing(comment, blockComment, compileEachCall=True):
+    """Parse comment and block comment keyword by keyword with parseParameter/parseString like readVamasFile did before
+
+    Arguments:
+        comment {str} -- the comment
+        blockComment {str} -- the block comment
+
+    Keyword Arguments:
+        compileEachCall {bool} -- build the regular expression on every call as the uncached functions did (default: {True})
+    """
+    for keyword in legacyCommentStrings:
+        if compileEachCall:
+            stringRegex.cache_clear()
+        result, comment = parseString(comment, keyword)
+    for keyword in legacyCommentKeywords:
+        if compileEachCall:
+            parameterRegex.cache_clear()
+        result, unit, comment = parseParameter(comment, keyword)
+    for keyword in legacyBlockKeywords:
+        if compileEachCall:
+            parameterRegex.cache_clear()
+        result, unit, blockComment = parseParameter(blockComment, keyword)
+    for keyword in legacyBlockStrings:
+        if compileEachCall:
+            stringRegex.cache_clear()
+        result, blockComment = parseString(blockComment, keyword)
+
+
+def extractorCommentParsing(comment, blockComment):
+    """Parse comment and block comment with the precompiled single-pass extractors
+
+    Arguments:
+        comment {str} -- the comment
+        blockComment {str} -- the block comment
+    """
+    commentExtractor.extract(comment)
+    blockCommentExtractor.extract(blockComment)
+
+
+def benchmarkComment(repeat, noteLines):
+    """Compare the per-file cost of the comment metadata extraction before and after the single-pass extractor
+
+    Arguments:
+        repeat {int} -- number of parsed files per measurement
+        noteLines {int} -- number of lines of operator notes added to the comments for the second measurement
+    """
+    notes = "".join("Operator note {0}: sample transferred, sputter cleaned and annealed\n".format(i) for i in range(noteLines))
+    #XPS measurements have no UPS source parameters, so not all keywords are found
+    xpsComment = "".join(line + "\n" for line in matrixComment.splitlines() if not line.startswith(("pHIS", "VHIS", "WHIS", "Filter")))
+    for title, comment, blockComment in [
+            ("MATRIX comment", matrixComment, matrixBlockComment),
+            ("MATRIX XPS comment + {0} lines of notes".format(noteLines), xpsComment + notes, matrixBlockComment + notes)]:
+        candidates = [
+            ("keyword by keyword, regex built per call (before)", lambda: legacyCommentParsing(comment, blockComment)),
+            ("keyword by keyword, cached regex", lambda: legacyCommentParsing(comment, blockComment, False)),
+            ("single-pass extractor (after)", lambda: extractorCommentParsing(comment, blockComment)),
+        ]
+        print("{0}: extraction per file, best of 5 x {1} files".format(title, repeat))
+        results = []
+        for name, function in candidates:
+            seconds = min(timeit.repeat(function, number=repeat, repeat=5)) / repeat
+            results.append(seconds)
+            print("  {0:<52} {1:8.1f} µs".format(name, seconds*1e6))
+        print("  Speedup: {0:.1f}x".format(results[0]/results[-1]))
+
+
+def benchmarkMemory(fileNames, numFiles, targetBytes=memoryTargetBytes):
+    """Compare the memory per block of a list of dataclasses and of a VamasCollection
+       The files are parsed header-only as by the GUI, repeating the given files up to numFiles.
+
+    Arguments:
+        fileNames {list} -- VAMAS files to parse
+        numFiles {int} -- number of parsed files
+
+    Keyword Arguments:
+        targetBytes {int} -- highest memory per block of the collection (default: {memoryTargetBytes})
+
+    Returns:
+        {bool} -- True if the collection meets the target
+    """
+    tracemalloc.start()
+    blocks = list()
+    for i in range(numFiles):
+        blocks.extend(VAMAS_File(fileName=fileNames[i % len(fileNames)]).iterBlocks(headerOnly=True))
+    gc.collect()
+    dataclassBytes = tracemalloc.get_traced_memory()[0]
+    collection = VamasCollection(blocks)
+    del blocks
+    gc.collect()
+    collectionBytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print("{0} files, {1} blocks, parameters held in memory per block".format(numFiles, len(collection)))
+    print("  {0:<24} {1:8.0f} bytes".format("list of VAMAS_File", dataclassBytes/len(collection)))
+    print("  {0:<24} {1:8.0f} bytes".format("VamasCollection", collectionBytes/len(collection)))
+    print("  Reduction: {0:.1f}x".format(dataclassBytes/collectionBytes))
+    passed = collectionBytes/len(collection) <= targetBytes
+    print("  Target {0} bytes per block: {1}".format(targetBytes, "passed" if passed else "FAILED"))
+    return passed
+
+
+def benchmarkModel(fileNames, numFiles, repaints):
+    """Measure the repaint time of the paramTable and vmsTable views with and without the display cache of ParameterModel
+       The views are rendered offscreen while scrolling through the model.
+
+    Arguments:
+        fileNames {list} -- VAMAS files to parse
+        numFiles {int} -- number of loaded files
+        repaints {int} -- number of repaints per measurement
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtCore import QTransposeProxyModel, QSortFilterProxyModel
+    from PyQt5.QtWidgets import QTableView
+    from vmsParser import ParameterModel
+
+    class UncachedParameterModel(ParameterModel):
+        """Cell text and field names as before the display cache: dataclass fields, getattr and str() on every call
+        """
+        def displayText(self, row, column):
+            block = self.dataList[column-1]
+            return str(getattr(block, fields(VAMAS_File)[row-1].name))
+
+        def headerData(self, section, orientation, role):
+            self.fieldNames = tuple(f.name for f in fields(VAMAS_File))
+            return super().headerData(section, orientation, role)
+
+        def rowCount(self, parent=None):
+            return len(fields(VAMAS_File))+1
+
+    qApplication()
+    collection = VamasCollection()
+    for i in range(numFiles):
+        collection.extend(VAMAS_File(fileName=fileNames[i % len(fileNames)]).iterBlocks(headerOnly=True))
+    print("{0} files, {1} blocks, time per repaint while scrolling, best of 3 x {2} repaints".format(numFiles, len(collection), repaints))
+    results = []
+    for name, modelClass in [("fields() per call (before)", UncachedParameterModel), ("display cache (after)", ParameterModel)]:
+        model = modelClass(collection)
+        #Transposed and sortable as the paramTable, one block per row
+        proxy = QTransposeProxyModel()
+        proxy.setSourceModel(model)
+        sortProxy = QSortFilterProxyModel()
+        sortProxy.setSourceModel(proxy)
+        paramTable = QTableView()
+        paramTable.setModel(sortProxy)
+        paramTable.resize(1200, 800)
+        vmsTable = QTableView()
+        vmsTable.setModel(model)
+        vmsTable.resize(600, 800)
+        #Plot data columns are not shown, keep the spectra unloaded
+        for valueField in ("yAxisValuesList", "xAxisValuesList"):
+            vmsTable.hideRow(model.getFieldIndex(valueField)+1)
+        times = []
+        for run in range(3):
+            start = time.perf_counter()
+            for i in range(repaints):
+                #Scroll back and forth over the blocks and fields
+                paramTable.verticalScrollBar().setValue(i*7 % max(1, paramTable.verticalScrollBar().maximum()))
+                vmsTable.verticalScrollBar().setValue(i*5 % max(1, vmsTable.verticalScrollBar().maximum()))
+                paramTable.grab()
+                vmsTable.grab()
+            times.append((time.perf_counter()-start)/repaints)
+        results.append(min(times))
+        print("  {0:<32} {1:8.2f} ms".format(name, min(times)*1e3))
+    print("  Speedup: {0:.1f}x".format(results[0]/results[-1]))
+
+
+def benchmarkPlot(numLines, numPoints, steps):
+    """Measure the redraw time of overlaid spectra while zooming and panning, with the full spectra and decimated,
+       and while stepping the selected spectrum, re-plotting all lines and with the persistent lines
+
+    Arguments:
+        numLines {int} -- number of overlaid spectra
+        numPoints {int} -- points per spectrum
+        steps {int} -- number of zoom and pan steps
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    rng = np.random.default_rng(0)
+    x = 1200 - 0.05*np.arange(numPoints)
+    spectra = [rng.poisson(1000, numPoints).astype(float) + 5000*np.exp(-((x - 300 - 10*i)/0.5)**2) for i in range(numLines)]
+    print("{0} spectra of {1} points, time per redraw while zooming and panning, {2} steps".format(numLines, numPoints, steps))
+    results = []
+    for name, decimated in [("full spectra (before)", False), ("min/max decimation (after)", True)]:
+        figure = Figure(figsize=(12, 6), dpi=100)
+        canvas = FigureCanvasAgg(figure)
+        axes = figure.add_subplot(111)
+        if decimated:
+            #As updatePlot() shows the spectra
+            plot = DecimatedPlot(axes)
+            plot.setLines({key: (x, y) for key, y in enumerate(spectra)})
+            plot.autoscale()
+        else:
+            for y in spectra:
+                axes.plot(x, y)
+        canvas.draw()
+        xMin, xMax = axes.get_xlim()
+        start = time.perf_counter()
+        for i in range(steps):
+            #Zoom in to a tenth of the range and pan over it
+            width = (xMax - xMin) / (1 + 9*(i % 10)/9)
+            left = xMin + (xMax - xMin - width)*((i*7) % steps)/steps
+            axes.set_xlim(left, left + width)
+            canvas.draw()
+        seconds = (time.perf_counter() - start)/steps
+        results.append(seconds)
+        print("  {0:<32} {1:8.1f} ms".format(name, seconds*1e3))
+    print("  Speedup: {0:.1f}x".format(results[0]/results[-1]))
+
+    #Stepping the selected spectrum with the others as overlays, as with the next button
+    print("Stepping through {0} spectra with {1} overlays, time per step".format(steps, numLines - 1))
+    results = []
+    for name, persistent in [("clear and plot all (before)", False), ("line registry and blitting (after)", True)]:
+        figure = Figure(figsize=(12, 6), dpi=100)
+        canvas = FigureCanvasAgg(figure)
+        axes = figure.add_subplot(111)
+        plot = DecimatedPlot(axes)
+        #Decimated by both, so only the registry and blitting are compared
+        overlays = {key: (x, spectra[key]) for key in range(1, numLines)}
+        canvas.draw()
+        start = time.perf_counter()
+        for i in range(steps):
+            selected = {0: (x, spectra[i % numLines])}
+            if persistent:
+                plot.setLines({**selected, **overlays})
+                plot.autoscale()
+                plot.redraw()
+            else:
+                plot.clear()
+                for key, (xValues, yValues) in {**selected, **overlays}.items():
+                    pyramid = DecimationPyramid(xValues, yValues)
+                    axes.plot(*pyramid.decimate(pyramid.x[0], pyramid.x[-1], plot.pixelWidth()))
+                axes.set_xlabel("Kinetic Energy [eV]")
+                axes.set_ylabel("Intensity [c/s]")
+                canvas.draw()
+        seconds = (time.perf_counter() - start)/steps
+        results.append(seconds)
+        print("  {0:<36} {1:8.1f} ms".format(name, seconds*1e3))
+    print("  Speedup: {0:.1f}x".format(results[0]/results[-1]))
+
+
+#Sizes of the synthetic files: name, blocks, points per block, lines of the file and block comments
+parseSizes = [
+    ("single spectrum", 1, 1000, 10),
+    ("100 short blocks", 100, 500, 10),
+    ("4 x 100k points", 4, 100000, 10),
+    ("long comments", 10, 1000, 500),
+]
+
+
+def benchmarkParse(expModes, scanModes, repeat, folder=None):
+    """Measure the parse throughput, the time of the parser phases and the peak memory for synthetic files
+       of each experiment mode, scan mode and size
+       The phases are parsing the header and block parameters header-only as the GUI does and loading the ordinate values.
+
+    Arguments:
+        expModes {list} -- experiment modes
+        scanModes {list} -- scan modes
+        repeat {int} -- parses per measurement, the best is taken
+
+    Keyword Arguments:
+        folder {str} -- folder to keep the files in, temporary if None (default: {None})
+    """
+    with tempfile.TemporaryDirectory() as temporaryFolder:
+        folder = folder or temporaryFolder
+        os.makedirs(folder, exist_ok=True)
+        print("{0:<8} {1:<10} {2:<17} {3:>9} {4:>10} {5:>12} {6:>12} {7:>9}".format(
+            "Mode", "Scan", "File", "files/s", "Mpoints/s", "params ms", "values ms", "peak MB"))
+        for expMode in expModes:
+            for scanMode in scanModes:
+                for name, numBlocks, numPoints, numCommentLines in parseSizes:
+                    fileName = os.path.join(folder, "{0}_{1}_{2}b_{3}p_{4}c.vms".format(expMode, scanMode, numBlocks, numPoints, numCommentLines))
+                    writeVamasFile(fileName, expMode, scanMode, numBlocks, numPoints, 1, numCommentLines, numCommentLines)
+                    numValues = sum(block.numYAxisValues for block in readVamasBlocks(fileName, headerOnly=True))
+                    full = min(timeit.repeat(lambda: readVamasBlocks(fileName), number=1, repeat=repeat))
+                    parameters = min(timeit.repeat(lambda: readVamasBlocks(fileName, headerOnly=True), number=1, repeat=repeat))
+                    values = float('inf')
+                    for i in range(repeat):
+                        blocks = readVamasBlocks(fileName, headerOnly=True)
+                        start = time.perf_counter()
+                        for block in blocks:
+                            block.yAxisValuesList
+                        values = min(values, time.perf_counter() - start)
+                    #Traced separately, tracing slows down parsing
+                    tracemalloc.start()
+                    blocks = readVamasBlocks(fileName)
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    del blocks
+                    print("{0:<8} {1:<10} {2:<17} {3:9.1f} {4:10.2f} {5:12.2f} {6:12.2f} {7:9.1f}".format(
+                        expMode, scanMode, name, 1/full, numValues/full/1e6, parameters*1e3, values*1e3, peak/2**20))
+
+
+def legacyIniSave(fileName, collection):
+    """Save a collection as .ini file with configparser like ParameterModel.saveModelToConfigFile did before the session files
+    """
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    for i in range(len(collection)):
+        config["VAMAS_File_" + str(i+1)] = {name: (value.tolist() if isinstance(value, np.ndarray) else value)
+                                            for name, value in ((name, collection.getValue(i, name)) for name in collection.names)}
+    with open(fileName, 'w') as f:
+        config.write(f)
+
+
+def legacyIniLoad(fileName):
+    """Load an .ini file like ParameterModel.loadFromConfigFile did, all fields are strings
+    """
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    with open(fileName, 'r') as f:
+        config.read_file(f)
+    return [VAMAS_File(**dict(config[section])) for section in config.sections() if section.startswith('VAMAS_File')]
+
+
+def benchmarkSession(numFiles, numBlocks, numPoints):
+    """Compare saving and restoring the model as .ini file and as binary session file
+
+    Arguments:
+        numFiles {int} -- number of files of the session
+        numBlocks {int} -- blocks per file
+        numPoints {int} -- points per spectrum
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        fileName = os.path.join(folder, "synthetic.vms")
+        writeVamasFile(fileName, numBlocks=numBlocks, numPoints=numPoints)
+        blocks = readVamasBlocks(fileName)
+        collection = VamasCollection(blocks*numFiles)
+        print("Session of {0} files, {1} blocks of {2} points".format(numFiles, len(collection), numPoints))
+        results = []
+        for name, save, load in [
+                ("configparser .ini (before)", lambda path: legacyIniSave(path, collection), legacyIniLoad),
+                ("JSON + mmap arrays (after)", lambda path: saveSession(path, collection), loadSession)]:
+            path = os.path.join(folder, "session")
+            start = time.perf_counter()
+            save(path)
+            saveSeconds = time.perf_counter() - start
+            start = time.perf_counter()
+            load(path)
+            loadSeconds = time.perf_counter() - start
+            results.append(saveSeconds + loadSeconds)
+            print("  {0:<28} save {1:7.3f} s  load {2:7.3f} s  {3:7.1f} MB".format(name, saveSeconds, loadSeconds, os.path.getsize(path)/2**20))
+        print("  Speedup: {0:.1f}x".format(results[0]/results[-1]))
+
+
+def benchmarkSummary(numBlocks):
+    """Compare sorting and filtering the paramTable through the transpose and sort proxy models and with the SummaryModel
+
+    Arguments:
+        numBlocks {int} -- number of blocks
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from datetime import datetime, timedelta
+    from PyQt5.QtCore import Qt, QTransposeProxyModel, QSortFilterProxyModel
+    from vmsParser import ParameterModel, SummaryModel
+
+    qApplication()
+    rng = np.random.default_rng(0)
+    block = VAMAS_File()
+    collection = VamasCollection()
+    for i in range(numBlocks):
+        block.sampleName = "Sample{0}".format(rng.integers(500))
+        block.technique = ("XPS", "UPS", "AES dir")[i % 3]
+        block.date = datetime(2020, 1, 1) + timedelta(minutes=int(rng.integers(500000)))
+        block.analyzerPEorRR = float(rng.choice([5, 10, 20, 50, 100]))
+        block.dwellTime = float(rng.choice([0.05, 0.1, 0.5, 2]))
+        collection.append(block)
+    model = ParameterModel(collection)
+    sortColumns = [model.getFieldIndex(name)+1 for name in ("date", "analyzerPEorRR", "dwellTime", "sampleName")]
+    sampleColumn = model.getFieldIndex("sampleName")+1
+    typed = "sample12"
+    print("{0} blocks, sorting by 4 fields and typing '{1}' into the sample filter".format(numBlocks, typed))
+
+    proxy = QTransposeProxyModel()
+    proxy.setSourceModel(model)
+    sortProxy = QSortFilterProxyModel()
+    sortProxy.setSourceModel(proxy)
+    sortProxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
+    sortProxy.setFilterKeyColumn(sampleColumn)
+    summaryModel = SummaryModel(model)
+
+    results = []
+    for name, sort, setFilter in [
+            ("text sort and filter proxies (before)", sortProxy.sort, sortProxy.setFilterFixedString),
+            ("typed keys and indexes (after)", summaryModel.sort, lambda text: summaryModel.setFilters(sampleText=text))]:
+        start = time.perf_counter()
+        for column in sortColumns:
+            sort(column, Qt.AscendingOrder)
+        sortSeconds = (time.perf_counter() - start)/len(sortColumns)
+        start = time.perf_counter()
+        for i in range(1, len(typed) + 1):
+            setFilter(typed[:i])
+        filterSeconds = (time.perf_counter() - start)/len(typed)
+        results.append(sortSeconds + filterSeconds)
+        print("  {0:<40} sort {1:8.2f} ms  keystroke {2:8.2f} ms".format(name, sortSeconds*1e3, filterSeconds*1e3))
+    print("  Speedup: {0:.1f}x".format(results[0]/results[-1]))
+
+
+def benchmarkMap(size, numPoints):
+    """Compare assembling a map from the list of parsed blocks with streaming it into a memory-mapped cube
+
+    Arguments:
+        size {int} -- positions along x and y
+        numPoints {int} -- points per spectrum
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        fileName = os.path.join(folder, "map.vms")
+        writeVamasFile(fileName, "MAP", numBlocks=size*size, numPoints=numPoints, numCommentLines=10, numBlockCommentLines=2)
+        print("Map of {0} x {0} positions, {1} points per spectrum, {2:.1f} MB file".format(size, numPoints, os.path.getsize(fileName)/2**20))
+
+        def fromBlocks():
+            blocks = readVamasBlocks(fileName)
+            cube = np.full((size, size, numPoints), np.nan)
+            for block in blocks:
+                cube[block.xCoord - 1, block.yCoord - 1] = block.yAxisValuesList[0]
+            return cube
+
+        #Channels of the energy image, the second quarter of the spectrum
+        first, last = numPoints//4, max(numPoints//2, numPoints//4 + 1)
+        results = []
+        for name, assemble, pixel, image in [
+                ("parsed blocks (before)", fromBlocks, lambda cube, x, y: cube[x, y].copy(), lambda cube: cube[:, :, first:last].sum(axis=2)),
+                ("memory-mapped cube (after)", lambda: readMapCubes(fileName, useMmap=True)[0],
+                 lambda cube, x, y: cube.pixel(x, y), lambda cube: cube.image(cube.xAxisValues[first], cube.xAxisValues[last - 1]))]:
+            gc.collect()
+            tracemalloc.start()
+            start = time.perf_counter()
+            cube = assemble()
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            start = time.perf_counter()
+            for x in range(size):
+                pixel(cube, x, size - 1 - x)
+            pixelSeconds = (time.perf_counter() - start)/size
+            start = time.perf_counter()
+            image(cube)
+            imageSeconds = time.perf_counter() - start
+            results.append(peak)
+            print("  {0:<28} assemble {1:7.2f} s  peak {2:8.1f} MB  pixel {3:7.3f} ms  {4} channel image {5:7.1f} ms".format(
+                name, seconds, peak/2**20, pixelSeconds*1e3, last - first, imageSeconds*1e3))
+            del cube
+            gc.collect()
+        print("  Peak memory reduced {0:.1f}x".format(results[0]/results[-1]))
+
+
+def benchmarkDepth(numCycles, numPoints):
+    """Compare integrating each block of a depth profile separately with stacking and integrating all cycles at once
+
+    Arguments:
+        numCycles {int} -- etch cycles
+        numPoints {int} -- points per spectrum
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        fileName = os.path.join(folder, "profile.vms")
+        writeVamasFile(fileName, "SDP", numBlocks=numCycles, numPoints=numPoints, numBlockCommentLines=2)
+        blocks = readVamasBlocks(fileName)
+    print("Depth profile of {0} cycles, {1} points per spectrum".format(numCycles, numPoints))
+
+    def perBlock():
+        areas = []
+        for block in sorted(blocks, key=lambda block: block.expVariablesList[0]):
+            x = block.xAxisValuesList
+            selected = (x >= 1185) & (x <= 1195)
+            x, y = x[selected], block.yAxisValuesList[0][selected]
+            areas.append(np.sum((y[1:] + y[:-1])*np.diff(x))/2 - (y[0] + y[-1])*(x[-1] - x[0])/2)
+        return np.array(areas)
+
+    def stacked():
+        return stackDepthProfiles(blocks)[0].integrate(1185, 1195, 'linear')
+
+    results = []
+    for name, integrate in [("integration per block (before)", perBlock), ("stacked matrix (after)", stacked)]:
+        seconds = min(timeit.repeat(integrate, number=1, repeat=5))
+        results.append(seconds)
+        print("  {0:<32} {1:8.2f} ms".format(name, seconds*1e3))
+    print("  Same areas: {0}, speedup: {1:.1f}x".format(np.allclose(perBlock(), stacked()), results[0]/results[-1]))
+    profile = stackDepthProfiles(blocks)[0]
+    seconds = min(timeit.repeat(lambda: profile.integrate(1185, 1195, 'linear'), number=1, repeat=5))
+    print("  Integrating the stacked matrix again: {0:.2f} ms".format(seconds*1e3))
+
+
+def benchmarkWrite(numBlocks, numPoints):
+    """Check that written files of all experiment and scan modes are read back unchanged and compare writing
+       the whole text at once with the streaming writer
+
+    Arguments:
+        numBlocks {int} -- blocks of the file for the time and memory measurement
+        numPoints {int} -- points per spectrum
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        fileName = os.path.join(folder, "source.vms")
+        copyName = os.path.join(folder, "copy.vms")
+        print("Round trip of read, write and read again:")
+        for expMode in experimentModes:
+            for scanMode in scanModes:
+                writeVamasFile(fileName, expMode, scanMode, numBlocks=4, numPoints=100, numVars=2)
+                blocks = readVamasBlocks(fileName)
+                writeVamasBlocks(copyName, blocks)
+                differences = sorted({name for block, copy in zip(blocks, readVamasBlocks(copyName)) for name in compareBlocks(block, copy)})
+                print("  {0:<8} {1:<10} {2}".format(expMode, scanMode, ", ".join(differences) or "identical"))
+
+        writeVamasFile(fileName, numBlocks=numBlocks, numPoints=numPoints)
+        blocks = readVamasBlocks(fileName)
+        print("Writing {0} blocks of {1} points".format(numBlocks, numPoints))
+
+        def wholeText(path):
+            #Format every value separately and write the text of the file at once
+            lines = []
+            for block in blocks:
+                lines += ["{0!r}".format(value) for value in block.yAxisValuesList.T.ravel().tolist()]
+            with open(path, 'w', newline='\r\n') as f:
+                f.write("\n".join(lines))
+
+        results = []
+        for name, write in [("whole text (before)", wholeText), ("streaming writer (after)", lambda path: writeVamasBlocks(path, blocks))]:
+            gc.collect()
+            tracemalloc.start()
+            write(copyName)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            seconds = min(timeit.repeat(lambda: write(copyName), number=1, repeat=3))
+            results.append(seconds)
+            print("  {0:<26} {1:7.3f} s  {2:6.1f} MB/s  peak {3:7.1f} MB".format(name, seconds, os.path.getsize(copyName)/2**20/seconds, peak/2**20))
+        print("  Speedup: {0:.1f}x".format(results[0]/results[-1]))
+
+
+def benchmarkInsert(numFiles, batchSize):
+    """Compare inserting the blocks of loaded files into the model of the GUI one by one and in batches,
+       with the table views and the summary model attached as in the main window
+
+    Arguments:
+        numFiles {int} -- number of files with 3 blocks each
+        batchSize {int} -- files per insertion
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QTableView
+    from vmsParser import ParameterModel, SummaryModel
+
+    app = qApplication()
+    with tempfile.TemporaryDirectory() as folder:
+        fileName = os.path.join(folder, "synthetic.vms")
+        writeVamasFile(fileName, numBlocks=3, numPoints=1000)
+        blocks = readVamasBlocks(fileName, headerOnly=True)
+    print("Inserting {0} files of {1} blocks, {2} files per batch".format(numFiles, len(blocks), batchSize))
+
+    def perBlock(model):
+        for i in range(numFiles):
+            for block in blocks:
+                model.appendData(block)
+
+    def batched(model):
+        for i in range(0, numFiles, batchSize):
+            model.appendBlocks(blocks*min(batchSize, numFiles - i))
+
+    results = []
+    for name, insert in [("one insertion per block (before)", perBlock), ("one insertion per batch (after)", batched)]:
+        model = ParameterModel(VamasCollection())
+        summaryModel = SummaryModel(model)
+        vmsTable, paramTable = QTableView(), QTableView()
+        vmsTable.setModel(model)
+        paramTable.setModel(summaryModel)
+        start = time.perf_counter()
+        insert(model)
+        app.processEvents()
+        seconds = time.perf_counter() - start
+        results.append(seconds)
+        print("  {0:<34} {1:8.3f} s".format(name, seconds))
+    print("  Speedup: {0:.1f}x".format(results[0]/results[-1]))
+
+
+def benchmarkProcess(numFiles, numBlocks, numPoints):
+    """Compare processing the spectra one by one with the stages applied to stacked spectra and with cached stages
+
+    Arguments:
+        numFiles {int} -- number of files
+        numBlocks {int} -- blocks per file
+        numPoints {int} -- points per spectrum
+    """
+    parameters = dict(energy={'scale': 'binding'}, calibration={'referenceEnergy': 300.0, 'window': 3.0},
+                      background={'method': 'shirley'}, normalisation={'method': 'max'})
+    with tempfile.TemporaryDirectory() as folder:
+        blocks = []
+        for number in range(numFiles):
+            fileName = os.path.join(folder, "spectra{0}.vms".format(number))
+            writeVamasFile(fileName, numBlocks=numBlocks, numPoints=numPoints, seed=number)
+            blocks += readVamasBlocks(fileName)
+    print("Processing {0} spectra of {1} points: {2}".format(len(blocks), numPoints, ", ".join(stages)))
+
+    def perSpectrum():
+        #A new pipeline per spectrum, as a script processing file by file without cache
+        return [SpectrumPipeline(**parameters).process([block])[0] for block in blocks]
+
+    def stacked():
+        return SpectrumPipeline(**parameters).process(blocks)
+
+    results = []
+    for name, process in [("one spectrum at a time (before)", perSpectrum), ("stacked spectra (after)", stacked)]:
+        seconds = min(timeit.repeat(process, number=1, repeat=3))
+        results.append(seconds)
+        print("  {0:<34} {1:8.2f} ms".format(name, seconds*1e3))
+    same = all(np.allclose(a.y, b.y, equal_nan=True) for a, b in zip(perSpectrum(), stacked()))
+    print("  Same spectra: {0}, speedup: {1:.1f}x".format(same, results[0]/results[-1]))
+    pipeline = SpectrumPipeline(**parameters)
+    pipeline.process(blocks)
+    for stage, values in [("normalisation", {'method': 'area'}), ("background", {'method': 'linear'}), ("calibration", {'shift': 0.5, 'referenceEnergy': None})]:
+        pipeline.setParameters(stage, **values)
+        computed = dict(pipeline.computed)
+        start = time.perf_counter()
+        pipeline.process(blocks)
+        seconds = time.perf_counter() - start
+        recomputed = [name for name in stages if pipeline.computed[name] > computed[name]]
+        print("  Changing {0:<14} {1:8.2f} ms, recomputed: {2}".format(stage, seconds*1e3, ", ".join(recomputed)))
+    start = time.perf_counter()
+    pipeline.process(blocks)
+    print("  Unchanged parameters   {0:8.2f} ms".format((time.perf_counter() - start)*1e3))
+
+
+def benchmarkAggregate(numSpectra, numPoints, numAxes):
+    """Compare interpolating each spectrum onto the common grid with the aggregator and its cached interpolation weights
+
+    Arguments:
+        numSpectra {int} -- number of spectra
+        numPoints {int} -- points per spectrum
+        numAxes {int} -- number of slightly shifted energy axes, e.g. of different sample positions, repeated scans share one
+    """
+    rng = np.random.default_rng(0)
+    starts = 1180.0 + rng.uniform(-0.1, 0.1, numAxes)
+    #Each block has its own array of the axis, as created from xAxisStart and xAxisIncrement
+    spectra = [(starts[number % numAxes] + 0.02*np.arange(numPoints), rng.poisson(1000, numPoints).astype(float)) for number in range(numSpectra)]
+    weights = rng.uniform(0.5, 2.0, numSpectra)
+    print("Weighted mean of {0} spectra of {1} points on {2} energy axes".format(numSpectra, numPoints, numAxes))
+
+    def perSpectrum(spectra, weights):
+        grid = gridValues(commonGrid([x for x, y in spectra]))
+        values = np.array([np.interp(grid, x, y) for x, y in spectra])
+        return np.average(values, axis=0, weights=weights)
+
+    aggregator = SpectrumAggregator()
+    results = []
+    for name, aggregate in [("np.interp per spectrum (before)", lambda: perSpectrum(spectra, weights)),
+                            ("aggregator (after)", lambda: aggregator.aggregate(spectra, weights).y)]:
+        seconds = min(timeit.repeat(aggregate, number=1, repeat=20))
+        results.append(seconds)
+        print("  {0:<34} {1:8.2f} ms".format(name, seconds*1e3))
+    same = np.allclose(perSpectrum(spectra, weights), aggregator.aggregate(spectra, weights).y)
+    print("  Same mean: {0}, speedup: {1:.1f}x".format(same, results[0]/results[-1]))
+    computed = aggregator.computed
+    for method in ("sum", "median"):
+        seconds = min(timeit.repeat(lambda: aggregator.aggregate(spectra, weights, method), number=1, repeat=3))
+        print("  {0:<34} {1:8.2f} ms".format(method, seconds*1e3))
+    #Toggling a spectrum can change the common grid, the weights of its lattice are reused
+    toggled = []
+    for name, aggregate in [("np.interp per spectrum (before)", lambda selection: perSpectrum([spectra[row] for row in selection], weights[selection])),
+                            ("aggregator (after)", lambda selection: aggregator.aggregate([spectra[row] for row in selection], weights[selection]))]:
+        #Unchecking and checking again each of the first ten spectra
+        selections = [[row for row in range(numSpectra) if row != number] for number in range(min(10, numSpectra))]
+        start = time.perf_counter()
+        for selection in selections:
+            aggregate(selection)
+            aggregate(list(range(numSpectra)))
+        toggled.append((time.perf_counter() - start)/len(selections)/2)
+        print("  Toggling a spectrum, {0:<20} {1:8.2f} ms".format(name.split(" (")[0], toggled[-1]*1e3))
+    print("  Toggling speedup: {0:.1f}x, interpolation weights computed again: {1}".format(toggled[0]/toggled[-1], aggregator.computed - computed))
+
+
+def benchmarkDuplicates(numFiles, numCopies):
+    """Compare finding duplicate blocks by comparing all pairs of spectra with the fingerprint index
+
+    Arguments:
+        numFiles {int} -- number of different files
+        numCopies {int} -- copies of each file under other names
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        fileNames = []
+        for number in range(numFiles):
+            fileName = os.path.join(folder, "original{0}.vms".format(number))
+            writeVamasFile(fileName, numBlocks=2, numPoints=500, seed=number)
+            fileNames.append(fileName)
+            with open(fileName, 'rb') as f:
+                content = f.read()
+            for copy in range(numCopies):
+                copyName = os.path.join(folder, "copy{0}_{1}.vms".format(number, copy))
+                with open(copyName, 'wb') as f:
+                    f.write(content)
+                fileNames.append(copyName)
+        start = time.perf_counter()
+        readBlocks = lambda: [block for fileName in fileNames for block in readVamasBlocks(fileName, headerOnly=True)]
+        readBlocks()
+        print("{0} files parsed header-only in {1:.2f} s, both methods start from header-only blocks".format(len(fileNames), time.perf_counter() - start))
+
+        def pairwise():
+            #Each block against all blocks before it, loading all spectra
+            spectra = [block.yAxisValuesList for block in readBlocks()]
+            found = 0
+            for index, spectrum in enumerate(spectra):
+                if any(other.shape == spectrum.shape and np.array_equal(other, spectrum) for other in spectra[:index]):
+                    found += 1
+            return found
+
+        def fingerprints():
+            #Only the spectra of blocks with the fields of an earlier block are loaded and hashed
+            index = DuplicateIndex()
+            return sum(duplicate is not None for duplicate in index.addAll(readBlocks()))
+
+        results = []
+        for name, find in [("comparing all pairs (before)", pairwise), ("fingerprint index (after)", fingerprints)]:
+            start = time.perf_counter()
+            found = find()
+            seconds = time.perf_counter() - start
+            results.append(seconds)
+            print("  {0:<32} {1:8.3f} s, {2} duplicates".format(name, seconds, found))
+        print("  Speedup: {0:.0f}x".format(results[0]/results[-1]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the VAMAS parser")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commentCommand = commands.add_parser("comment", help="comment and block comment metadata extraction")
+    commentCommand.add_argument("--repeat", type=int, default=2000, help="parsed files per measurement")
+    commentCommand.add_argument("--notes", type=int, default=50, help="lines of operator notes added for the second measurement")
+    memoryCommand = commands.add_parser("memory", help="memory per block of dataclasses and the columnar collection")
+    memoryCommand.add_argument("files", nargs='+', help="VAMAS files, repeated up to --files")
+    memoryCommand.add_argument("--files", dest="numFiles", type=int, default=10000, help="number of parsed files")
+    memoryCommand.add_argument("--target", type=int, default=memoryTargetBytes, help="highest bytes per block of the collection")
+    modelCommand = commands.add_parser("model", help="repaint time of the tables of the GUI")
+    modelCommand.add_argument("files", nargs='+', help="VAMAS files, repeated up to --files")
+    modelCommand.add_argument("--files", dest="numFiles", type=int, default=300, help="number of loaded files")
+    modelCommand.add_argument("--repaints", type=int, default=50, help="repaints per measurement")
+    plotCommand = commands.add_parser("plot", help="redraw time of overlaid spectra while zooming, panning and stepping")
+    plotCommand.add_argument("--lines", type=int, default=50, help="number of overlaid spectra")
+    plotCommand.add_argument("--points", type=int, default=100000, help="points per spectrum")
+    plotCommand.add_argument("--steps", type=int, default=20, help="number of zoom and pan steps")
+    parseCommand = commands.add_parser("parse", help="parse throughput, phases and peak memory for synthetic files of all modes")
+    parseCommand.add_argument("--mode", nargs='+', choices=experimentModes, default=list(experimentModes), help="experiment modes")
+    parseCommand.add_argument("--scan", nargs='+', choices=scanModes, default=list(scanModes), help="scan modes")
+    parseCommand.add_argument("--repeat", type=int, default=3, help="parses per measurement, the best is taken")
+    parseCommand.add_argument("--keep", default=None, help="folder to keep the generated files in")
+    sessionCommand = commands.add_parser("session", help="save and restore time of the model")
+    sessionCommand.add_argument("--files", dest="numFiles", type=int, default=1000, help="number of files of the session")
+    sessionCommand.add_argument("--blocks", type=int, default=3, help="blocks per file")
+    sessionCommand.add_argument("--points", type=int, default=1000, help="points per spectrum")
+    summaryCommand = commands.add_parser("summary", help="sorting and filtering time of the paramTable")
+    summaryCommand.add_argument("--blocks", type=int, default=10000, help="number of blocks")
+    mapCommand = commands.add_parser("map", help="memory and access time of the spectral cube of a map")
+    mapCommand.add_argument("--size", type=int, default=64, help="positions along x and y")
+    mapCommand.add_argument("--points", type=int, default=1000, help="points per spectrum")
+    depthCommand = commands.add_parser("depth", help="integration time of the cycles of a depth profile")
+    depthCommand.add_argument("--cycles", type=int, default=5000, help="etch cycles")
+    depthCommand.add_argument("--points", type=int, default=200, help="points per spectrum")
+    writeCommand = commands.add_parser("write", help="round trip and throughput of the VAMAS writer")
+    writeCommand.add_argument("--blocks", type=int, default=20, help="blocks of the written file")
+    writeCommand.add_argument("--points", type=int, default=100000, help="points per spectrum")
+    insertCommand = commands.add_parser("insert", help="time of inserting loaded files into the model of the GUI")
+    insertCommand.add_argument("--files", dest="numFiles", type=int, default=1000, help="number of loaded files")
+    insertCommand.add_argument("--batch", type=int, default=50, help="files per insertion")
+    processCommand = commands.add_parser("process", help="time of the processing stages for many spectra")
+    processCommand.add_argument("--files", dest="numFiles", type=int, default=200, help="number of files")
+    processCommand.add_argument("--blocks", type=int, default=5, help="blocks per file")
+    processCommand.add_argument("--points", type=int, default=1000, help="points per spectrum")
+    aggregateCommand = commands.add_parser("aggregate", help="time of resampling and aggregating many spectra")
+    aggregateCommand.add_argument("--spectra", dest="numSpectra", type=int, default=2000, help="number of spectra")
+    aggregateCommand.add_argument("--points", type=int, default=1000, help="points per spectrum")
+    aggregateCommand.add_argument("--axes", dest="numAxes", type=int, default=10, help="number of different energy axes")
+    duplicatesCommand = commands.add_parser("duplicates", help="time of finding duplicate blocks")
+    duplicatesCommand.add_argument("--files", dest="numFiles", type=int, default=200, help="number of different files")
+    duplicatesCommand.add_argument("--copies", type=int, default=2, help="copies of each file")
+    args = parser.parse_args()
+
+    if args.command == "comment":
+        benchmarkComment(args.repeat, args.notes)
+    elif args.command == "memory":
+        if not benchmarkMemory(args.files, args.numFiles, args.target):
+            sys.exit(1)
+    elif args.command == "model":
+        benchmarkModel(args.files, args.numFiles, args.repaints)
+    elif args.command == "plot":
+        benchmarkPlot(args.lines, args.points, args.steps)
+    elif args.command == "parse":
+        benchmarkParse(args.mode, args.scan, args.repeat, args.keep)
+    elif args.command == "session":
+        benchmarkSession(args.numFiles, args.blocks, args.points)
+    elif args.command == "summary":
+        benchmarkSummary(args.blocks)
+    elif args.command == "map":
+        benchmarkMap(args.size, args.points)
+    elif args.command == "depth":
+        benchmarkDepth(args.cycles, args.points)
+    elif args.command == "write":
+        benchmarkWrite(args.blocks, args.points)
+    elif args.command == "insert":
+        benchmarkInsert(args.numFiles, args.batch)
+    elif args.command == "process":
+        benchmarkProcess(args.numFiles, args.blocks, args.points)
+    elif args.command == "aggregate":
+        benchmarkAggregate(args.numSpectra, args.points, args.numAxes)
+    elif args.command == "duplicates":
+        benchmarkDuplicates(args.numFiles, args.copies)
@@ -0,0 +1,225 @@
+import os
+import sys
+import json
+import hashlib
+import numpy as np
+from vamasSimple import VAMAS_File, OrdinateLoader
+from vamasFiles import fileState
+
+#Increase to invalidate all entries when the parser or the entry format changes
+cacheVersion = 3
+
+#Default maximal size of the cache
+defaultMaxBytes = 512*1024*1024
+
+
+def defaultCacheDirectory():
+    """Return the platform specific user cache folder for vmsParser
+
+    Returns:
+        {str} -- folder path
+    """
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA', os.path.expanduser('~'))
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache'))
+    return os.path.join(base, 'vmsParser')
+
+
+class VamasCache:
+    """Persistent on-disk cache of parsed VAMAS files
+       Each file is stored as entry of two files: the parameters of all blocks as .json
+       and the ordinate values of all blocks as one binary .npy array.
+       Entries are keyed by path, size and modification time of the file, so a changed file is parsed again
+       and its old entry is removed. When the cache grows beyond maxBytes the least recently used entries are deleted.
+       The object only holds the folder and size limit, it can be passed to worker processes.
+    """
+
+    def __init__(self, directory=None, maxBytes=defaultMaxBytes):
+        """
+        Keyword Arguments:
+            directory {str} -- cache folder, created if needed (default: {defaultCacheDirectory()})
+            maxBytes {int} -- maximal size of all entries (default: {defaultMaxBytes})
+        """
+        self.directory = directory or defaultCacheDirectory()
+        self.maxBytes = maxBytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def entryPath(self, fileName, state=None):
+        """Return the path of the cache entry for a state of a file without extension
+
+        Arguments:
+            fileName {str} -- path of the VAMAS file
+
+        Keyword Arguments:
+            state {list} -- size and modification time of the file, see fileState(), None for the current state (default: {None})
+
+        Returns:
+            {str} -- entry path, <hash of path>-<hash of size, time and version>
+        """
+        path = os.path.abspath(fileName)
+        size, time = fileState(path) if state is None else state
+        pathKey = hashlib.sha1(path.encode('utf-8')).hexdigest()
+        stateKey = hashlib.sha1("{0}|{1}|{2}".format(size, time, cacheVersion).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, "{0}-{1}".format(pathKey, stateKey[:16]))
+
+    def get(self, fileName, headerOnly=False):
+        """Return the cached blocks of a file
+
+        Arguments:
+            fileName {str} -- path of the VAMAS file
+
+        Keyword Arguments:
+            headerOnly {bool} -- read only the parameters, the spectra are loaded from the cache on first access (default: {False})
+
+        Returns:
+            {list} -- VAMAS_File dataclass for each block, None if the file is not in the cache
+        """
+        try:
+            state = fileState(fileName)
+            path = self.entryPath(fileName, state)
+            with open(path + '.json', 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            blocks = [VAMAS_File.fromParameters(parameters) for parameters in entry['blocks']]
+            if headerOnly:
+                for block, (start, shape) in zip(blocks, entry['arrays']):
+                    block.ordinateLoader = CachedOrdinateLoader(path + '.npy', start, shape, block, state)
+            else:
+                values = np.load(path + '.npy')
+                for block, (start, shape) in zip(blocks, entry['arrays']):
+                    block.yAxisValuesList = values[start:start + shape[0]*shape[1]].reshape(shape)
+        except (OSError, ValueError, KeyError):
+            return None
+        #Mark as recently used
+        os.utime(path + '.json')
+        return blocks
+
+    def put(self, fileName, blocks, state=None):
+        """Store the blocks of a file, replacing older entries of the same file
+           The ordinate values of header-only blocks are loaded for storing.
+
+        Arguments:
+            fileName {str} -- path of the VAMAS file
+            blocks {list} -- VAMAS_File dataclass for each block
+
+        Keyword Arguments:
+            state {list} -- state of the file before it was parsed, see fileState(), so blocks of a file changed
+                            while parsing are stored for the old state and never returned (default: {None})
+
+        Returns:
+            {bool} -- True if stored
+        """
+        try:
+            path = self.entryPath(fileName, state)
+            arrays = list()
+            start = 0
+            for block in blocks:
+                shape = block.yAxisValuesList.shape
+                arrays.append((start, shape))
+                start += shape[0]*shape[1]
+            values = np.concatenate([block.yAxisValuesList.ravel() for block in blocks]) if blocks else np.empty(0)
+            entry = {'blocks': [block.getParameters() for block in blocks], 'arrays': arrays}
+            #Write to temporary files first, so other processes never see a partial entry
+            #The .json is written last, it marks the entry as complete
+            temporary = "{0}.{1}.tmp".format(path, os.getpid())
+            with open(temporary, 'wb') as f:
+                np.save(f, values)
+            os.replace(temporary, path + '.npy')
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(temporary, path + '.json')
+        except OSError as e:
+            print("Failed caching {0}: {1}".format(fileName, e))
+            return False
+        #Remove entries of previous versions of the file
+        pathKey = os.path.basename(path).split('-')[0]
+        for stem in self.entries():
+            if os.path.basename(stem).startswith(pathKey) and stem != path:
+                self.removeEntry(stem)
+        return True
+
+    def entries(self):
+        """Return the paths of all entries without extension
+        """
+        return {os.path.splitext(entry.path)[0] for entry in os.scandir(self.directory) if entry.name.endswith(('.json', '.npy'))}
+
+    def trim(self):
+        """Delete the least recently used entries until the cache is below its size limit
+        """
+        entries = list()
+        totalBytes = 0
+        for stem in self.entries():
+            size = 0
+            time = 0
+            for extension in ('.json', '.npy'):
+                try:
+                    stat = os.stat(stem + extension)
+                except FileNotFoundError:
+                    continue
+                size += stat.st_size
+                if extension == '.json':
+                    time = stat.st_mtime
+            entries.append((time, size, stem))
+            totalBytes += size
+        entries.sort()
+        for time, size, stem in entries:
+            if totalBytes <= self.maxBytes:
+                break
+            self.removeEntry(stem)
+            totalBytes -= size
+
+    def clear(self):
+        """Delete all entries
+        """
+        for stem in self.entries():
+            self.removeEntry(stem)
+
+    def removeEntry(self, stem):
+        """Delete an entry, ignoring files already deleted by another process
+        """
+        for extension in ('.json', '.npy'):
+            try:
+                os.remove(stem + extension)
+            except FileNotFoundError:
+                pass
+
+
+class CachedOrdinateLoader:
+    """Loads the ordinate values of a block from its cache entry on first access
+       The values are read through a memory map, so only the block is read from the entry of the file.
+       Reads the VAMAS file instead if the entry was deleted in the meantime and the file did not change since the entry was read.
+    """
+    __slots__ = ('arrayPath', 'start', 'shape', 'fileName', 'dataOffset', 'numValues', 'numVars', 'blockNumber', 'state')
+
+    def __init__(self, arrayPath, start, shape, block, state):
+        """
+        Arguments:
+            arrayPath {str} -- path of the .npy file of the entry
+            start {int} -- position of the values of the block in the array
+            shape {tuple} -- shape of the values of the block
+            block {VAMAS_File} -- the block
+            state {list} -- size and modification time of the file of the entry, see fileState()
+        """
+        self.arrayPath = arrayPath
+        self.start = start
+        self.shape = tuple(shape)
+        self.fileName = block.fileName
+        self.dataOffset = block.dataOffset
+        self.numValues = block.numYAxisValues
+        self.numVars = block.numYAxisVars
+        self.blockNumber = block.blockNumber
+        self.state = state
+
+    def load(self):
+        """Read the ordinate values
+
+        Returns:
+            {np.ndarray} -- 2-dim array with one row per corresponding variable
+        """
+        try:
+            values = np.load(self.arrayPath, mmap_mode='r')
+            return np.array(values[self.start:self.start + self.shape[0]*self.shape[1]]).reshape(self.shape)
+        except (OSError, ValueError):
+            return OrdinateLoader(self.fileName, self.dataOffset, self.numValues, self.numVars, self.blockNumber, fileState=self.state).load()
@@ -0,0 +1,400 @@
+from array import array
+from dataclasses import fields
+from datetime import datetime
+import csv
+import numpy as np
+from vamasSimple import VAMAS_File, fieldTypes, valueFields, blockFingerprint
+
+#Typecodes of the arrays holding the numeric fields, all other fields are kept in lists
+columnTypecodes = {int: 'q', float: 'd'}
+
+
+class VamasCollection:
+    """Columnar store of the parameters of many VAMAS blocks
+       Each dataclass field is one column instead of one dataclass per block: numeric fields are typed arrays,
+       equal strings and lists of different blocks share one object and lists are stored as tuples.
+       Indexing returns a VamasRow, a view on one block with the attributes of VAMAS_File.
+       The spectra of header-only blocks are loaded on first access as for the dataclass, fingerprints are computed on first access.
+    """
+
+    def __init__(self, blocks=()):
+        """
+        Keyword Arguments:
+            blocks {iterable} -- VAMAS_File dataclasses or rows to add (default: {()})
+        """
+        self.names = [f.name for f in fields(VAMAS_File)]
+        self.columns = dict()
+        for name in self.names:
+            if name in valueFields:
+                continue
+            if fieldTypes[name] in columnTypecodes:
+                self.columns[name] = array(columnTypecodes[fieldTypes[name]])
+            else:
+                self.columns[name] = list()
+        #Values shared between the blocks, per column
+        self.sharedValues = {name: dict() for name in self.columns}
+        #Spectra: arrays or None, the ordinate values of header-only blocks are loaded by their loader
+        self.yAxisValues = list()
+        self.xAxisValues = list()
+        self.ordinateLoaders = list()
+        self.extend(blocks)
+
+    @classmethod
+    def fromParameters(cls, parametersList):
+        """Create a collection from dicts created by VAMAS_File.getParameters(), the blocks have no spectra
+
+        Arguments:
+            parametersList {iterable} -- dict for each block
+
+        Returns:
+            {VamasCollection} -- the collection
+        """
+        return cls(VAMAS_File.fromParameters(parameters) for parameters in parametersList)
+
+    @classmethod
+    def fromColumns(cls, columns, yAxisValues, xAxisValues):
+        """Create a collection from columns created by jsonColumns() and the spectra of the blocks
+           Fields missing in the columns, e.g. added to VAMAS_File later, get their default value
+
+        Arguments:
+            columns {dict} -- field name: list of JSON compatible values
+            yAxisValues {list} -- ordinate values of each block
+            xAxisValues {list} -- abscissa values of each block, None to create them from xAxisStart and xAxisIncrement
+
+        Returns:
+            {VamasCollection} -- the collection
+        """
+        collection = cls()
+        numBlocks = len(yAxisValues)
+        default = VAMAS_File()
+        for name, column in collection.columns.items():
+            values = columns.get(name)
+            if values is None:
+                values = [getattr(default, name)]*numBlocks
+            elif fieldTypes[name] is datetime:
+                values = [datetime.fromisoformat(value) for value in values]
+            if isinstance(column, array):
+                collection.columns[name] = array(column.typecode, values)
+            else:
+                collection.columns[name] = [collection.storedValue(name, value) for value in values]
+        collection.yAxisValues = list(yAxisValues)
+        collection.xAxisValues = list(xAxisValues)
+        collection.ordinateLoaders = [None]*numBlocks
+        return collection
+
+    def __len__(self):
+        return len(self.yAxisValues)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("VamasCollection index out of range")
+        return VamasRow(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield VamasRow(self, index)
+
+    def append(self, block):
+        """Append a block
+
+        Arguments:
+            block {VAMAS_File} -- dataclass or row of another collection
+        """
+        self.insert(len(self), block)
+
+    def extend(self, blocks):
+        """Append blocks
+
+        Arguments:
+            blocks {iterable} -- VAMAS_File dataclasses or rows
+        """
+        for block in blocks:
+            self.insert(len(self), block)
+
+    def insert(self, index, block):
+        """Insert a block before index, rows of the following blocks taken before refer to the next block afterwards
+
+        Arguments:
+            index {int} -- position of the new block
+            block {VAMAS_File} -- dataclass or row of another collection
+        """
+        for name, column in self.columns.items():
+            column.insert(index, self.storedValue(name, self.blockValue(block, name)))
+        if isinstance(block, VamasRow):
+            yAxisValues, xAxisValues, ordinateLoader = block.collection.valueState(block.index)
+        else:
+            #Keep the spectra of header-only blocks unloaded
+            yAxisValues, xAxisValues, ordinateLoader = block._yAxisValues, block._xAxisValues, block.ordinateLoader
+        self.yAxisValues.insert(index, yAxisValues)
+        self.xAxisValues.insert(index, xAxisValues)
+        self.ordinateLoaders.insert(index, ordinateLoader)
+
+    def replace(self, index, block):
+        """Replace a block, e.g. by the block parsed again from its changed file
+
+        Arguments:
+            index {int} -- position of the block
+            block {VAMAS_File} -- dataclass or row of another collection
+        """
+        for name, column in self.columns.items():
+            column[index] = self.storedValue(name, self.blockValue(block, name))
+        if isinstance(block, VamasRow):
+            valueState = block.collection.valueState(block.index)
+        else:
+            valueState = block._yAxisValues, block._xAxisValues, block.ordinateLoader
+        self.yAxisValues[index], self.xAxisValues[index], self.ordinateLoaders[index] = valueState
+
+    def blockValue(self, block, name):
+        """Return the value of a field of a block to store, without computing a fingerprint not computed yet
+
+        Arguments:
+            block {VAMAS_File} -- dataclass or row of another collection
+            name {str} -- field name
+
+        Returns:
+            {object} -- value of the field, an empty string for a fingerprint not computed yet
+        """
+        if name != "fingerprint":
+            return getattr(block, name)
+        if isinstance(block, VamasRow):
+            return block.collection.columns[name][block.index]
+        return block._fingerprint
+
+    def storedValue(self, name, value):
+        """Convert a value to the representation in the column of the field
+
+        Arguments:
+            name {str} -- field name
+            value {object} -- value of the field
+
+        Returns:
+            {object} -- value to store
+        """
+        fieldType = fieldTypes[name]
+        if fieldType in columnTypecodes:
+            return fieldType(value)
+        if isinstance(value, list):
+            value = tuple(value)
+        try:
+            return self.sharedValues[name].setdefault(value, value)
+        except TypeError:
+            #Not hashable, e.g. list of lists
+            return value
+
+    def getValue(self, index, name):
+        """Return the value of a field of a block
+
+        Arguments:
+            index {int} -- block index
+            name {str} -- field name
+
+        Returns:
+            {object} -- value, lists are returned as new list
+        """
+        if name == "yAxisValuesList":
+            return self.getYAxisValues(index)
+        if name == "xAxisValuesList":
+            return self.getXAxisValues(index)
+        if name == "fingerprint":
+            return self.getFingerprint(index)
+        value = self.columns[name][index]
+        if isinstance(value, tuple) and fieldTypes[name] is list:
+            return list(value)
+        return value
+
+    def setValue(self, index, name, value):
+        """Set a field of a block, converting the value to the type of the field
+
+        Arguments:
+            index {int} -- block index
+            name {str} -- field name
+            value {object} -- new value, numbers and dates can be given as text
+
+        Raises:
+            ValueError: if the value cannot be converted
+        """
+        if name == "yAxisValuesList":
+            self.ordinateLoaders[index] = None
+            self.yAxisValues[index] = value
+            return
+        if name == "xAxisValuesList":
+            self.xAxisValues[index] = value
+            return
+        fieldType = fieldTypes[name]
+        if fieldType is datetime and isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        elif fieldType is list and not isinstance(value, (list, tuple)):
+            raise ValueError("{0} must be a list".format(name))
+        try:
+            self.columns[name][index] = self.storedValue(name, value)
+        except TypeError as e:
+            raise ValueError("Invalid value for {0}: {1}".format(name, e))
+
+    def column(self, name):
+        """Return the values of a field of all blocks
+
+        Arguments:
+            name {str} -- field name
+
+        Returns:
+            {np.ndarray or list} -- array for numeric fields, otherwise list
+        """
+        column = self.columns[name]
+        if isinstance(column, array):
+            return np.frombuffer(column, dtype=column.typecode).copy()
+        return list(column)
+
+    def jsonColumns(self):
+        """Return the values of all fields except the spectra as JSON compatible lists, see fromColumns()
+
+        Returns:
+            {dict} -- field name: list of values, dates as ISO format strings
+        """
+        columns = dict()
+        for name, column in self.columns.items():
+            if isinstance(column, array):
+                columns[name] = column.tolist()
+            elif fieldTypes[name] is datetime:
+                columns[name] = [value.isoformat() for value in column]
+            else:
+                #Tuples are written as lists
+                columns[name] = column
+        return columns
+
+    def getYAxisValues(self, index):
+        """Return the ordinate values of a block, loading them from the file if the block was read header-only
+
+        Returns:
+            {np.ndarray} -- 2-dim array with one row per corresponding variable
+        """
+        if self.ordinateLoaders[index] is not None:
+            self.yAxisValues[index] = self.ordinateLoaders[index].load()
+            self.ordinateLoaders[index] = None
+        return self.yAxisValues[index]
+
+    def getXAxisValues(self, index):
+        """Return the abscissa values of a block, created from xAxisStart and xAxisIncrement on first access
+
+        Returns:
+            {np.ndarray} -- x-values
+        """
+        if self.xAxisValues[index] is None:
+            numValues = self.columns['numYAxisValues'][index]
+            numVars = self.columns['numYAxisVars'][index]
+            numPoints = int(numValues/numVars) if numVars > 0 else 0
+            self.xAxisValues[index] = self.columns['xAxisStart'][index] + self.columns['xAxisIncrement'][index]*np.arange(numPoints)
+        return self.xAxisValues[index]
+
+    def getFingerprint(self, index):
+        """Return the fingerprint of a block, computed from the ordinate values on first access
+           The values of a header-only block are loaded for it but not kept.
+
+        Returns:
+            {str} -- hexadecimal fingerprint, see blockFingerprint()
+        """
+        fingerprint = self.columns['fingerprint'][index]
+        if not fingerprint:
+            loader = self.ordinateLoaders[index]
+            values = self.yAxisValues[index] if loader is None else loader.load()
+            fingerprint = self.columns['fingerprint'][index] = blockFingerprint(VamasRow(self, index), values)
+        return fingerprint
+
+    def valueState(self, index):
+        """Return the spectra of a block without loading them
+
+        Returns:
+            {tuple} -- ordinate values, abscissa values, pending ordinate loader
+        """
+        return self.yAxisValues[index], self.xAxisValues[index], self.ordinateLoaders[index]
+
+    def getBlock(self, index):
+        """Return a block as VAMAS_File dataclass, the spectra are shared and loaded on first access
+
+        Arguments:
+            index {int} -- block index
+
+        Returns:
+            {VAMAS_File} -- the dataclass
+        """
+        block = VAMAS_File(**{name: self.getValue(index, name) for name in self.columns if name != "fingerprint"})
+        block.fingerprint = self.columns['fingerprint'][index]
+        block._yAxisValues, block._xAxisValues, block.ordinateLoader = self.valueState(index)
+        return block
+
+    def getParameters(self, index):
+        """Return all fields except the spectra of a block as dict of JSON compatible values, see VAMAS_File.getParameters()
+        """
+        parameters = dict()
+        for name in self.columns:
+            value = self.getValue(index, name)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            parameters[name] = value
+        return parameters
+
+    def writeCsv(self, fileName, leadingColumns=None):
+        """Write the parameters as table with one row per block
+
+        Arguments:
+            fileName {str} -- path of the .csv file
+
+        Keyword Arguments:
+            leadingColumns {dict} -- header: list of values for each block, written before the fields (default: {None})
+        """
+        leadingColumns = leadingColumns or dict()
+        columns = list(leadingColumns.values())
+        for name, column in self.columns.items():
+            #Lists as written by the dataclass
+            columns.append([list(value) for value in column] if fieldTypes[name] is list else column)
+        with open(fileName, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(list(leadingColumns) + list(self.columns))
+            writer.writerows(zip(*columns))
+
+
+class VamasRow:
+    """View on one block of a VamasCollection with the attributes of VAMAS_File
+       Rows are created on access and refer to their position, keep the index instead of the row
+       when blocks are inserted before it.
+    """
+    __slots__ = ('collection', 'index')
+
+    def __init__(self, collection, index):
+        object.__setattr__(self, 'collection', collection)
+        object.__setattr__(self, 'index', index)
+
+    def __getattr__(self, name):
+        #Only called for the fields, the slots and the properties of the spectra are found before
+        try:
+            return self.collection.getValue(self.index, name)
+        except KeyError:
+            raise AttributeError("'VamasRow' object has no attribute '{0}'".format(name)) from None
+
+    def __setattr__(self, name, value):
+        #Also sets the spectra, the properties have no setter
+        if name not in self.collection.columns and name not in valueFields:
+            raise AttributeError("'VamasRow' object has no attribute '{0}'".format(name))
+        self.collection.setValue(self.index, name, value)
+
+    def __repr__(self):
+        return "VamasRow({0!r}, {1})".format(self.collection.getValue(self.index, 'fileName'), self.collection.getValue(self.index, 'blockName'))
+
+    @property
+    def yAxisValuesList(self):
+        return self.collection.getYAxisValues(self.index)
+
+    @property
+    def xAxisValuesList(self):
+        return self.collection.getXAxisValues(self.index)
+
+    def getParameters(self):
+        """Return all fields except the spectra as dict of JSON compatible values
+        """
+        return self.collection.getParameters(self.index)
+
+    def toBlock(self):
+        """Return the block as VAMAS_File dataclass
+        """
+        return self.collection.getBlock(self.index)
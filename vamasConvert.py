@@ -0,0 +1,251 @@
+"""Headless batch converter for VAMAS files, needs no display and no PyQt
+
+Walks directory trees, parses the .vms files in parallel worker processes and writes for each file
+the spectra as .csv and/or compressed .npz next to a metadata table of all blocks (metadata.csv).
+Files converted by a previous run into the same output folder are skipped unless they changed.
+Blocks with the fingerprint of a block converted before are reported, files of only such blocks,
+copies of other files, are not converted with --skip-duplicates.
+
+Usage:
+    python vamasConvert.py SOURCE [SOURCE ...] -o OUTPUT [--format csv npz] [--workers N] [--force] [--skip-duplicates]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from itertools import zip_longest
+import numpy as np
+from vamasLoader import VamasLoader
+from vamasCollection import VamasCollection
+from vamasSimple import VAMAS_File
+from vamasDuplicates import DuplicateIndex
+from vamasFiles import findVamasFiles, fileState
+
+#Written to the output folder, remembers the converted files and their blocks for incremental runs
+manifestName = "manifest.json"
+metadataName = "metadata.csv"
+formats = ("csv", "npz")
+
+
+def writeSpectraCsv(fileName, blocks):
+    """Write the spectra of all blocks of a VAMAS file as columns of one .csv file
+       Each block has one column for the abscissa and one for each corresponding variable.
+
+    Arguments:
+        fileName {str} -- path of the .csv file
+        blocks {list} -- VAMAS_File dataclass for each block
+    """
+    header = list()
+    columns = list()
+    for block in blocks:
+        header.append("{0} {1} [{2}]".format(block.blockName, block.xAxisLabel, block.xAxisUnit))
+        columns.append(block.xAxisValuesList.tolist())
+        for i, values in enumerate(block.yAxisValuesList):
+            label = block.yAxisVarsLabelList[i] if i < len(block.yAxisVarsLabelList) else "Variable {0}".format(i+1)
+            unit = block.yAxisVarsUnitList[i] if i < len(block.yAxisVarsUnitList) else ""
+            header.append("{0} {1} [{2}]".format(block.blockName, label, unit))
+            columns.append(values.tolist())
+    with open(fileName, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        #Blocks can have a different number of points
+        writer.writerows(zip_longest(*columns, fillvalue=""))
+
+
+def writeSpectraNpz(fileName, blocks):
+    """Write the spectra and parameters of all blocks of a VAMAS file as compressed .npz file
+       Contains the arrays x1, y1, x2, y2, ... for each block, y with one row per corresponding variable,
+       and 'parameters' with the JSON encoded parameters of the blocks.
+
+    Arguments:
+        fileName {str} -- path of the .npz file
+        blocks {list} -- VAMAS_File dataclass for each block
+    """
+    arrays = {'parameters': np.array(json.dumps([block.getParameters() for block in blocks]))}
+    for i, block in enumerate(blocks):
+        arrays["x{0}".format(i+1)] = block.xAxisValuesList
+        arrays["y{0}".format(i+1)] = block.yAxisValuesList
+    np.savez_compressed(fileName, **arrays)
+
+
+def writeMetadataCsv(fileName, manifest):
+    """Write the parameters of all blocks of all converted files as table with one row per block
+
+    Arguments:
+        fileName {str} -- path of the .csv file
+        manifest {dict} -- relative output path: manifest entry with the parameters of the blocks
+    """
+    outputNames = sorted(manifest)
+    collection = VamasCollection.fromParameters(parameters for outputName in outputNames for parameters in manifest[outputName]['blocks'])
+    collection.writeCsv(fileName, {"output": [outputName for outputName in outputNames for parameters in manifest[outputName]['blocks']]})
+
+
+def loadManifest(outputFolder):
+    """Return the manifest of a previous run, empty if there is none or it is unreadable
+    """
+    try:
+        with open(os.path.join(outputFolder, manifestName), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return dict()
+
+
+def saveManifest(outputFolder, manifest):
+    """Write the manifest, replacing the old one only when completely written
+    """
+    path = os.path.join(outputFolder, manifestName)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(path + '.tmp', path)
+
+
+def outputPaths(sources):
+    """Return the output path of each VAMAS file in the sources, relative to the output folder and without extension
+       The folder structure below the common folder of the sources is kept. Sources on different drives have no
+       common folder, their files are put into a folder named after each source.
+
+    Arguments:
+        sources {list} -- paths of files and folders
+
+    Returns:
+        {dict} -- absolute file path: output path
+    """
+    fileNames = findVamasFiles(sources)
+    if not fileNames:
+        return dict()
+    try:
+        root = os.path.commonpath([os.path.dirname(fileName) for fileName in fileNames])
+        return {fileName: os.path.splitext(os.path.relpath(fileName, root))[0] for fileName in fileNames}
+    except ValueError:
+        pass
+    outputNames = dict()
+    for source in sources:
+        source = os.path.abspath(source)
+        root = os.path.dirname(source) if os.path.isfile(source) else source
+        #The name of a drive root as C:\ is its letter
+        folderName = os.path.basename(root) or os.path.splitdrive(root)[0].rstrip(':') or "source"
+        for fileName in findVamasFiles([source]):
+            outputNames.setdefault(fileName, os.path.join(folderName, os.path.splitext(os.path.relpath(fileName, root))[0]))
+    return outputNames
+
+
+def withinSources(fileName, sources):
+    """Return if a file is one of the sources or in one of their folders
+    """
+    fileName = os.path.normcase(os.path.abspath(fileName))
+    for source in sources:
+        source = os.path.normcase(os.path.abspath(source))
+        if fileName == source or fileName.startswith(source.rstrip(os.sep) + os.sep):
+            return True
+    return False
+
+
+def convert(sources, outputFolder, outputFormats=formats, workers=None, force=False, skipDuplicates=False):
+    """Convert all VAMAS files in the sources into the output folder
+       The folder structure below the common folder of the sources is kept.
+
+    Arguments:
+        sources {list} -- paths of files and folders
+        outputFolder {str} -- folder for the converted files, created if needed
+
+    Keyword Arguments:
+        outputFormats {tuple} -- formats of the spectra, 'csv' and/or 'npz' (default: {formats})
+        workers {int} -- number of worker processes, defaults to the number of cores (default: {None})
+        force {bool} -- convert files already converted by a previous run as well (default: {False})
+        skipDuplicates {bool} -- do not convert files of which all blocks are duplicates of converted blocks (default: {False})
+
+    Returns:
+        {tuple} -- number of converted, skipped, failed and duplicate files
+    """
+    outputNames = outputPaths(sources)
+    fileNames = list(outputNames)
+    if not fileNames:
+        return 0, 0, 0, 0
+    os.makedirs(outputFolder, exist_ok=True)
+    oldManifest = loadManifest(outputFolder)
+    #Files converted by previous runs from other sources stay in the manifest and metadata table
+    manifest = {outputName: entry for outputName, entry in oldManifest.items()
+                if not withinSources(entry['source'], sources) and outputName not in outputNames.values()}
+    states = dict()
+    toConvert = list()
+    for fileName in fileNames:
+        outputName = outputNames[fileName]
+        #Taken before parsing, so a file changed meanwhile is converted again by the next run
+        states[fileName] = fileState(fileName)
+        entry = oldManifest.get(outputName)
+        outputPath = os.path.join(outputFolder, outputName)
+        if (not force and entry is not None and entry['source'] == fileName and entry['state'] == states[fileName]
+                and ((skipDuplicates and 'duplicateOf' in entry)
+                     or all(os.path.exists(outputPath + '.' + outputFormat) for outputFormat in outputFormats))):
+            manifest[outputName] = entry
+        else:
+            toConvert.append(fileName)
+    skipped = len(fileNames) - len(toConvert)
+    #Parameters of the blocks converted by previous runs and this one with their fingerprints, indexed as rows
+    convertedBlocks = VamasCollection.fromParameters(parameters for entry in manifest.values() for parameters in entry['blocks'])
+    index = DuplicateIndex(convertedBlocks)
+
+    converted = 0
+    failed = 0
+    duplicateFiles = 0
+    loader = VamasLoader(toConvert, workers=workers)
+    try:
+        for result in loader:
+            outputName = outputNames[result.fileName]
+            if result.error:
+                print("Failed parsing {0}: {1}".format(result.fileName, result.error))
+                failed += 1
+                continue
+            #Computes the fingerprints while the spectra are in memory
+            blockParameters = [block.getParameters() for block in result.blocks]
+            fileBlocks = DuplicateIndex()
+            duplicates = [duplicate for duplicate in (index.find(block) or fileBlocks.add(block) for block in result.blocks) if duplicate is not None]
+            for duplicate in duplicates:
+                print(duplicate)
+            if skipDuplicates and result.blocks and len(duplicates) == len(result.blocks):
+                #Remembered to skip the file in the next run as well
+                manifest[outputName] = {'source': result.fileName, 'state': states[result.fileName],
+                                        'duplicateOf': duplicates[0].originalFileName, 'blocks': []}
+                duplicateFiles += 1
+                continue
+            outputPath = os.path.join(outputFolder, outputName)
+            try:
+                os.makedirs(os.path.dirname(outputPath), exist_ok=True)
+                if 'csv' in outputFormats:
+                    writeSpectraCsv(outputPath + '.csv', result.blocks)
+                if 'npz' in outputFormats:
+                    writeSpectraNpz(outputPath + '.npz', result.blocks)
+            except (OSError, ValueError) as e:
+                print("Failed writing {0}: {1}".format(outputPath, e))
+                failed += 1
+                continue
+            manifest[outputName] = {'source': result.fileName, 'state': states[result.fileName], 'blocks': blockParameters}
+            first = len(convertedBlocks)
+            convertedBlocks.extend(VAMAS_File.fromParameters(parameters) for parameters in blockParameters)
+            index.addAll(convertedBlocks[row] for row in range(first, len(convertedBlocks)))
+            converted += 1
+            print("[{0}/{1}] {2}".format(converted + failed, len(toConvert), outputName))
+    finally:
+        #Keep the progress of an interrupted run
+        saveManifest(outputFolder, manifest)
+        writeMetadataCsv(os.path.join(outputFolder, metadataName), manifest)
+    #Collected if the environment variable VAMAS_PARSE_STATS is set
+    if loader.stats is not None:
+        print(loader.stats.summary())
+    return converted, skipped, failed, duplicateFiles
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert VAMAS files in directory trees to .csv and .npz")
+    parser.add_argument("sources", nargs='+', help=".vms files or folders searched recursively")
+    parser.add_argument("-o", "--output", required=True, help="output folder")
+    parser.add_argument("--format", nargs='+', choices=formats, default=list(formats), help="formats of the spectra")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes, default: number of cores")
+    parser.add_argument("--force", action="store_true", help="convert files already converted by a previous run as well")
+    parser.add_argument("--skip-duplicates", dest="skipDuplicates", action="store_true", help="do not convert copies of converted files")
+    args = parser.parse_args()
+
+    converted, skipped, failed, duplicates = convert(args.sources, args.output, tuple(args.format), args.workers, args.force, args.skipDuplicates)
+    print("Converted {0}, skipped {1} unchanged and {2} duplicate files, {3} failed".format(converted, skipped, duplicates, failed))
+    sys.exit(1 if failed else 0)
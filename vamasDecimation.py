@@ -0,0 +1,233 @@
+import numpy as np
+
+
+class DecimationPyramid:
+    """Min/max pyramid of a spectrum to plot it with about two points per pixel
+       Level k holds the minimum and maximum of bins of 2**(k+1) points, computed once from the level below.
+       The decimated line shows the minimum and maximum of every bin, so peaks narrower than a pixel stay visible.
+    """
+    #Bins of the coarsest level, no plot is narrower
+    minimumBins = 64
+
+    def __init__(self, x, y):
+        """
+        Arguments:
+            x {np.ndarray} -- abscissa values, ascending or descending
+            y {np.ndarray} -- ordinate values
+        """
+        #The arrays of the spectrum, to detect if a line shows other data
+        self.source = (x, y)
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if len(x) > 1 and x[0] > x[-1]:
+            #Binding energy scales are descending, searchsorted needs ascending values
+            x = x[::-1]
+            y = y[::-1]
+        self.x = x
+        self.y = y
+        #Range of the values for autoscaling
+        self.yRange = (np.nanmin(y), np.nanmax(y)) if len(y) > 0 else (0, 0)
+        #(binSize, bin centers, bin minima, bin maxima) with increasing bin size
+        self.levels = list()
+        binSize = 1
+        yMin = yMax = y
+        while len(yMin) > 2*self.minimumBins:
+            if len(yMin) % 2:
+                #Repeat the last value, which does not change minimum and maximum of the last bin
+                yMin = np.append(yMin, yMin[-1])
+                yMax = np.append(yMax, yMax[-1])
+            yMin = np.minimum(yMin[0::2], yMin[1::2])
+            yMax = np.maximum(yMax[0::2], yMax[1::2])
+            binSize *= 2
+            first = np.arange(len(yMin))*binSize
+            last = np.minimum(first + binSize, len(x)) - 1
+            self.levels.append((binSize, (x[first] + x[last])/2, yMin, yMax))
+
+    def decimate(self, xMin, xMax, pixels):
+        """Return the points to plot for a visible x-range
+
+        Arguments:
+            xMin {float} -- lower limit of the visible range
+            xMax {float} -- upper limit of the visible range
+            pixels {int} -- width of the plot in pixels
+
+        Returns:
+            {tuple} -- x and y arrays with at most 2*pixels points, the raw values if there are not more in the range
+        """
+        if xMin > xMax:
+            xMin, xMax = xMax, xMin
+        #One point beyond the limits to draw the line up to the edges
+        first = max(np.searchsorted(self.x, xMin, 'left') - 1, 0)
+        last = min(np.searchsorted(self.x, xMax, 'right') + 1, len(self.x))
+        count = last - first
+        pixels = max(int(pixels), 1)
+        if count <= 2*pixels or not self.levels:
+            return self.x[first:last], self.y[first:last]
+        for binSize, centers, yMin, yMax in self.levels:
+            if count <= binSize*pixels:
+                break
+        firstBin = first // binSize
+        lastBin = -(-last // binSize)
+        x = np.repeat(centers[firstBin:lastBin], 2)
+        y = np.empty(len(x))
+        y[0::2] = yMin[firstBin:lastBin]
+        y[1::2] = yMax[firstBin:lastBin]
+        return x, y
+
+
+class DecimatedPlot:
+    """Plots spectra on matplotlib axes as decimated lines, which are decimated again when the x-range
+       or the size of the axes change, e.g. by zooming and panning with the navigation toolbar
+       The lines are kept in a registry by key and updated with set_data, lines of keys no longer plotted
+       are hidden and reused. Changed lines are animated: a full draw saves the background with the
+       unchanged lines, when the same lines change again only they are drawn onto it and blitted.
+    """
+    #Fraction the range of the spectra can be smaller than the axes before they are scaled again
+    rescaleTolerance = 0.2
+
+    def __init__(self, axes):
+        """
+        Arguments:
+            axes {matplotlib.axes.Axes} -- the axes to plot on, its figure needs a canvas
+        """
+        self.axes = axes
+        self.canvas = axes.figure.canvas
+        #key: Line2D, DecimationPyramid of each line
+        self.lines = dict()
+        self.pyramids = dict()
+        #Saved axes without the animated lines and the state of the axes it shows
+        self.background = None
+        self.backgroundState = None
+        #Lines changed since the last redraw
+        self.changedLines = set()
+        self.canvas.mpl_connect('draw_event', self.onDraw)
+        self.connectAxes()
+
+    def connectAxes(self):
+        """Update the lines when the x-range changes, cla() removes the callback
+        """
+        self.axes.callbacks.connect('xlim_changed', lambda axes: self.update())
+
+    def clear(self):
+        """Clear the axes and forget the lines
+        """
+        self.axes.cla()
+        self.lines.clear()
+        self.pyramids.clear()
+        self.changedLines.clear()
+        self.background = None
+        self.connectAxes()
+
+    def setLines(self, spectra):
+        """Show the spectra as lines, other lines are hidden
+           Lines of keys shown before are updated only if their arrays changed.
+
+        Arguments:
+            spectra {dict} -- key, e.g. the model column: (x, y) arrays
+        """
+        unused = [key for key in self.lines if key not in spectra]
+        for key, (x, y) in spectra.items():
+            line = self.lines.get(key)
+            if line is None:
+                if unused:
+                    line = self.lines.pop(unused.pop())
+                else:
+                    line, = self.axes.plot([], [])
+                self.lines[key] = line
+            pyramid = self.pyramids.get(line)
+            if pyramid is None or not (sameArray(pyramid.source[0], x) and sameArray(pyramid.source[1], y)):
+                self.pyramids[line] = DecimationPyramid(x, y)
+                self.changedLines.add(line)
+            if not line.get_visible():
+                line.set_visible(True)
+                self.changedLines.add(line)
+        for key in unused:
+            if self.lines[key].get_visible():
+                self.lines[key].set_visible(False)
+                self.changedLines.add(self.lines[key])
+        #Hidden lines were not updated by zooming
+        self.update()
+
+    def autoscale(self):
+        """Scale the axes to the full spectra of the visible lines, the lines are decimated for the new x-range
+           The limits are kept if the new ones lie within them and are not more than rescaleTolerance smaller,
+           so similar spectra are stepped through by blitting without drawing the axes again.
+        """
+        limits = (self.axes.get_xlim(), self.axes.get_ylim())
+        #Also after zooming with the navigation toolbar, which switches autoscaling off
+        self.axes.set_autoscale_on(True)
+        self.axes.ignore_existing_data_limits = True
+        for line, pyramid in self.pyramids.items():
+            if line.get_visible() and len(pyramid.x) > 0:
+                self.axes.update_datalim([(pyramid.x[0], pyramid.yRange[0]), (pyramid.x[-1], pyramid.yRange[1])])
+        self.axes.autoscale_view()
+        if self.background is not None and all(containsLimits(old, new, self.rescaleTolerance)
+                                               for old, new in zip(limits, (self.axes.get_xlim(), self.axes.get_ylim()))):
+            self.axes.set_xlim(limits[0])
+            self.axes.set_ylim(limits[1])
+
+    def pixelWidth(self):
+        """Return the width of the axes in pixels
+        """
+        return max(int(self.axes.bbox.width), 1)
+
+    def update(self):
+        """Decimate all lines for the current x-range and size of the axes
+        """
+        xMin, xMax = self.axes.get_xlim()
+        pixels = self.pixelWidth()
+        for line, pyramid in self.pyramids.items():
+            if line.get_visible() and len(pyramid.x) > 0:
+                line.set_data(*pyramid.decimate(xMin, xMax, pixels))
+
+    def axesState(self):
+        """Return what the saved background depends on besides the lines
+        """
+        return (tuple(self.axes.get_xlim()), tuple(self.axes.get_ylim()), self.axes.get_xlabel(), self.axes.get_ylabel(),
+                tuple(self.axes.bbox.bounds))
+
+    def onDraw(self, event):
+        """Save the background after a full draw of the canvas and draw the lines onto it
+        """
+        if event.canvas is self.canvas:
+            self.background = self.canvas.copy_from_bbox(self.axes.bbox)
+            self.backgroundState = self.axesState()
+        #Also draws the lines when the figure is saved to a file by another canvas
+        self.drawAnimatedLines(event.renderer)
+
+    def drawAnimatedLines(self, renderer):
+        for line in self.pyramids:
+            if line.get_animated() and line.get_visible():
+                line.draw(renderer)
+
+    def redraw(self):
+        """Show the changes of the lines, blitting them onto the saved background if the axes did not change
+           and exactly the animated lines changed, otherwise the changed lines are animated from now on and all is drawn
+        """
+        changedLines = self.changedLines
+        self.changedLines = set()
+        animatedLines = {line for line in self.pyramids if line.get_animated() and line.get_visible()}
+        if (self.background is None or self.backgroundState != self.axesState()
+                or any(not line.get_animated() for line in changedLines) or not animatedLines <= changedLines):
+            for line in self.pyramids:
+                line.set_animated(line in changedLines)
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self.drawAnimatedLines(self.canvas.get_renderer())
+        self.canvas.blit(self.axes.bbox)
+
+
+def containsLimits(old, new, tolerance):
+    """Return if the new axis limits lie within the old ones and span at least (1 - tolerance) of them
+    """
+    oldMin, oldMax = sorted(old)
+    newMin, newMax = sorted(new)
+    return oldMin <= newMin and newMax <= oldMax and (newMax - newMin) >= (1 - tolerance)*(oldMax - oldMin)
+
+
+def sameArray(a, b):
+    """Return if two arrays are the same values in memory, also for views as y[0] which are new objects on each access
+    """
+    return a is b or (a.shape == b.shape and a.strides == b.strides and a.dtype == b.dtype
+                      and a.__array_interface__['data'][0] == b.__array_interface__['data'][0])
@@ -0,0 +1,127 @@
+"""Depth profiles of sputter depth profiling experiments
+
+The blocks of a depth profile are the spectra of a few regions measured again after each etch cycle.
+stackDepthProfiles() stacks the spectra of each region into a matrix of shape (cycle, energy) ordered by
+the experimental variable, e.g. the etch time, so all cycles are integrated with one array operation.
+The blocks of a MAPDP file are stacked separately for each map position.
+"""
+import numpy as np
+from vamasSimple import mappingModes
+
+
+class DepthProfile:
+    """Spectra of one region of a depth profile as rows of a matrix, one row per etch cycle
+    """
+
+    def __init__(self, regionName, depths, depthLabel, xAxisValues, matrix, blocks, sputteringSourceEnergies=None):
+        """
+        Arguments:
+            regionName {str} -- name of the region, species and transition
+            depths {np.ndarray} -- experimental variable value of each cycle, the cycle number if the blocks have none
+            depthLabel {str} -- label and unit of the depths
+            xAxisValues {np.ndarray} -- energy of each channel
+            matrix {np.ndarray} -- spectra of shape (cycle, energy)
+            blocks {list} -- index of the block of each cycle in the stacked blocks
+
+        Keyword Arguments:
+            sputteringSourceEnergies {np.ndarray} -- sputtering source energy of each cycle (default: {None})
+        """
+        self.regionName = regionName
+        self.depths = depths
+        self.depthLabel = depthLabel
+        self.xAxisValues = xAxisValues
+        self.matrix = matrix
+        self.blocks = blocks
+        self.sputteringSourceEnergies = sputteringSourceEnergies
+
+    def __len__(self):
+        return len(self.depths)
+
+    def channels(self, energyMin=None, energyMax=None):
+        """Return the slice of the channels within an energy range
+        """
+        x = self.xAxisValues
+        lowest, highest = (x[0], x[-1]) if len(x) == 0 or x[0] <= x[-1] else (x[-1], x[0])
+        energyMin = lowest if energyMin is None else energyMin
+        energyMax = highest if energyMax is None else energyMax
+        selected = np.flatnonzero((x >= min(energyMin, energyMax)) & (x <= max(energyMin, energyMax)))
+        if len(selected) == 0:
+            return slice(0, 0)
+        return slice(selected[0], selected[-1] + 1)
+
+    def integrate(self, energyMin=None, energyMax=None, background=None):
+        """Return the peak area of each cycle within an energy range, all cycles at once
+
+        Keyword Arguments:
+            energyMin {float} -- lowest energy, None for the first channel (default: {None})
+            energyMax {float} -- highest energy, None for the last channel (default: {None})
+            background {str} -- 'linear' to subtract a line between the first and last channel of the range, None for no background (default: {None})
+
+        Raises:
+            ValueError: if the background is unknown
+
+        Returns:
+            {np.ndarray} -- area of each cycle, zero if the range contains less than two channels
+        """
+        if background not in (None, 'linear'):
+            raise ValueError("Unknown background {0}".format(background))
+        channels = self.channels(energyMin, energyMax)
+        x = self.xAxisValues[channels]
+        y = self.matrix[:, channels]
+        if len(x) < 2:
+            return np.zeros(len(self))
+        #Trapezoidal rule for all rows at once, also for decreasing energies
+        width = np.abs(np.diff(x))
+        area = ((y[:, 1:] + y[:, :-1])*width).sum(axis=1)/2
+        if background == 'linear':
+            area -= (y[:, 0] + y[:, -1])*width.sum()/2
+        return area
+
+
+def regionKey(block):
+    """Return what the blocks of one region have in common: species, transition, energy axis and the map position of mapping blocks
+    """
+    numPoints = int(block.numYAxisValues/block.numYAxisVars) if block.numYAxisVars > 0 else 0
+    position = (block.xCoord, block.yCoord) if block.expMode in mappingModes else None
+    return (block.speciesLabel, block.transitionLabel, block.xAxisLabel, block.xAxisStart, block.xAxisIncrement, position, numPoints)
+
+
+def stackDepthProfiles(blocks, variable=0):
+    """Stack the spectra of depth profile blocks into one DepthProfile per region
+       Blocks are assigned to regions by species, transition, energy axis and for MAPDP by map position, the cycles are ordered by the first
+       experimental variable, blocks without one by their order. Blocks without values of the variable are left out.
+
+    Arguments:
+        blocks {list} -- VAMAS_File or VamasRow of the blocks, e.g. of one SDP or MAPDP file
+
+    Keyword Arguments:
+        variable {int} -- corresponding variable of the spectra (default: {0})
+
+    Returns:
+        {list} -- DepthProfile for each region and map position in the order of the blocks
+    """
+    regions = dict()
+    for index, block in enumerate(blocks):
+        if block.numYAxisValues == 0 or block.numYAxisVars <= variable:
+            continue
+        regions.setdefault(regionKey(block), []).append((index, block))
+    profiles = list()
+    for members in regions.values():
+        first = members[0][1]
+        if first.numExpVariables > 0:
+            depths = np.array([block.expVariablesList[0] for index, block in members], dtype=float)
+            depthLabel = "{0} [{1}]".format(first.expVariableLabels[0], first.expVariableUnits[0])
+        else:
+            depths = np.arange(1, len(members) + 1, dtype=float)
+            depthLabel = "Cycle"
+        order = np.argsort(depths, kind='stable')
+        matrix = np.empty((len(members), regionKey(first)[-1]))
+        for row, position in enumerate(order):
+            matrix[row] = members[position][1].yAxisValuesList[variable]
+        regionName = " ".join(label for label in (first.speciesLabel, first.transitionLabel) if label) or first.blockName
+        if first.expMode in mappingModes:
+            regionName += " ({0}, {1})".format(first.xCoord, first.yCoord)
+        profiles.append(DepthProfile(regionName, depths[order], depthLabel, np.asarray(first.xAxisValuesList, dtype=float), matrix,
+                                     [members[position][0] for position in order],
+                                     np.array([members[position][1].sputteringSourceEnergy for position in order], dtype=float)))
+    return profiles
@@ -0,0 +1,98 @@
+"""Detection of duplicate blocks by their fingerprint
+
+Every block has a fingerprint of its ordinate values and the fields identifying the measurement, so copies
+of a file under other names or appended twice have equal fingerprints. DuplicateIndex groups the blocks by
+these fields: finding the duplicates of a block is one dict lookup instead of comparing it with all blocks
+loaded before. The fingerprints, which need the ordinate values, are only computed for blocks with the fields
+of an earlier block, so indexing header-only blocks does not load their spectra.
+"""
+from dataclasses import dataclass
+from vamasSimple import fingerprintKey
+
+
+@dataclass
+class Duplicate:
+    """A block with the fingerprint of an earlier block
+    """
+    fileName: str
+    blockNumber: int
+    originalFileName: str
+    originalBlockNumber: int
+
+    def __str__(self):
+        return "{0} block {1} is a duplicate of {2} block {3}".format(self.fileName, self.blockNumber, self.originalFileName, self.originalBlockNumber)
+
+
+class DuplicateIndex:
+    """Index of the first blocks with each fingerprint
+       The blocks are kept to compute their fingerprints when a block with the same fields is added,
+       add the rows of a VamasCollection instead of dataclasses to keep only views on its columns.
+       Blocks of which the ordinate values cannot be read, e.g. of a file changed meanwhile, are never duplicates.
+    """
+
+    def __init__(self, blocks=()):
+        """
+        Keyword Arguments:
+            blocks {iterable} -- VAMAS_File or VamasRow of blocks to add (default: {()})
+        """
+        #fingerprintKey(): first blocks with these fields and different fingerprints
+        self.originals = dict()
+        for block in blocks:
+            self.add(block)
+
+    def __len__(self):
+        return sum(len(blocks) for blocks in self.originals.values())
+
+    def clear(self):
+        self.originals.clear()
+
+    def find(self, block):
+        """Return the earlier block with the fingerprint of a block without adding it
+
+        Arguments:
+            block {VAMAS_File} -- VAMAS_File or VamasRow
+
+        Returns:
+            {Duplicate} -- the earlier block with the same fingerprint, None if there is none
+        """
+        for original in self.originals.get(fingerprintKey(block), ()):
+            try:
+                if original.fingerprint == block.fingerprint:
+                    return Duplicate(block.fileName, block.blockNumber, original.fileName, original.blockNumber)
+            except OSError as e:
+                print("Failed comparing {0} block {1}: {2}".format(block.fileName, block.blockNumber, e))
+        return None
+
+    def add(self, block):
+        """Add a block to the index unless it is a duplicate
+
+        Arguments:
+            block {VAMAS_File} -- VAMAS_File or VamasRow
+
+        Returns:
+            {Duplicate} -- the earlier block with the same fingerprint, None if there is none
+        """
+        duplicate = self.find(block)
+        if duplicate is None:
+            self.originals.setdefault(fingerprintKey(block), []).append(block)
+        return duplicate
+
+    def addAll(self, blocks):
+        """Add blocks, e.g. of one file, to the index
+
+        Arguments:
+            blocks {iterable} -- VAMAS_File or VamasRow of the blocks
+
+        Returns:
+            {list} -- Duplicate or None for each block
+        """
+        return [self.add(block) for block in blocks]
+
+    def remove(self, block):
+        """Remove a block if it was added, e.g. before its file is loaded again after a change
+        """
+        key = fingerprintKey(block)
+        blocks = self.originals.get(key, [])
+        blocks[:] = [original for original in blocks if (original.fileName, original.blockNumber) != (block.fileName, block.blockNumber)]
+        if not blocks:
+            self.originals.pop(key, None)
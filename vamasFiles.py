@@ -0,0 +1,36 @@
+"""Finding VAMAS files in directory trees and identifying their versions, shared by the converter and the folder watcher
+"""
+import os
+
+
+def findVamasFiles(sources, cancelled=None):
+    """Return all .vms files in the sources, folders are searched recursively
+
+    Arguments:
+        sources {list} -- paths of files and folders
+
+    Keyword Arguments:
+        cancelled {callable} -- called before each folder, the search stops when it returns True (default: {None})
+
+    Returns:
+        {list} -- absolute file paths, sorted within each folder, the files found so far if cancelled
+    """
+    fileNames = list()
+    for source in sources:
+        source = os.path.abspath(source)
+        if os.path.isfile(source):
+            fileNames.append(source)
+            continue
+        for folder, subFolders, files in os.walk(source):
+            if cancelled is not None and cancelled():
+                return fileNames
+            subFolders.sort()
+            fileNames.extend(os.path.join(folder, name) for name in sorted(files) if name.lower().endswith('.vms'))
+    return fileNames
+
+
+def fileState(fileName):
+    """Return size and modification time, which identify a version of a file
+    """
+    stat = os.stat(fileName)
+    return [stat.st_size, stat.st_mtime_ns]
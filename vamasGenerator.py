@@ -0,0 +1,215 @@
+"""Generator of synthetic VAMAS files for benchmarks and for trying the GUI without measured data
+
+Writes valid files of all experiment modes read by the parser with REGULAR or IRREGULAR scans.
+The spectra are peaks on a step background with Poisson noise, the comments are written as by Omicron MATRIX.
+
+Usage:
+    python vamasGenerator.py OUTPUT [--mode NORM SDP MAP ...] [--scan REGULAR IRREGULAR] [--blocks N] [--points N]
+                                    [--vars N] [--comment N] [--seed N]
+"""
+import argparse
+import os
+import numpy as np
+from vamasSimple import normalModes, mappingModes, sputteringModes
+
+experimentModes = ("NORM", "SDP", "SDPSV", "MAP", "MAPDP", "MAPSV", "MAPSVDP")
+scanModes = ("REGULAR", "IRREGULAR")
+
+#Experiment modes with field of view and line scan coordinates in the blocks
+fieldOfViewModes = ('MAP', 'MAPDP', 'MAPSV', 'MAPSVDP', 'SEM')
+lineScanModes = ('MAPSV', 'MAPSVDP', 'SEM')
+
+#Comment lines as written by Omicron MATRIX V4.4.9, parsed by the comment extractors
+matrixCommentLines = ["Created with: MATRIX V4.4.9", "Date of Acquisition: 17.05.2020 13:45", "SourceAnalyserAngle: 54.7 DEG",
+                      "pIG=1.2e-10 mbar", "pPIR=3.4e-3 mbar", "Bias: -5 V"]
+matrixBlockCommentLines = ["Aperture: 2", "X-Ray Source Voltage: 15.0 kV", "X-Ray Source Power: 250 W",
+                           "X-Ray Source Emission Current: 16.7 mA", "Sample Position X: -1.5 mm", "Sample Position Y: 2.5 mm",
+                           "Sample Position Z: 10 mm", "Exit Slit: 3 (slit)"]
+
+#Region of the synthetic spectra in kinetic energy
+xAxisStart = 1180.0
+xAxisRange = 20.0
+
+
+def syntheticSpectrum(x, rng, numPeaks=3):
+    """Return counts of Gaussian peaks on a step background which rises below each peak, with Poisson noise
+
+    Arguments:
+        x {np.ndarray} -- kinetic energies
+        rng {np.random.Generator} -- random numbers
+
+    Keyword Arguments:
+        numPeaks {int} -- number of peaks (default: {3})
+
+    Returns:
+        {np.ndarray} -- counts
+    """
+    counts = np.full(len(x), 1000.0)
+    for i in range(numPeaks):
+        center = x[0] + (x[-1] - x[0])*rng.uniform(0.2, 0.8) if len(x) else 0
+        height = rng.uniform(2000, 20000)
+        width = rng.uniform(0.5, 1.5)
+        counts += height*np.exp(-0.5*((x - center)/width)**2)
+        #Inelastically scattered electrons appear at lower kinetic energies
+        counts += 0.1*height/(1 + np.exp((x - center)/width))
+    return rng.poisson(counts).astype(float)
+
+
+def blockLines(header, blockNumber, numPoints, numVars, numBlockCommentLines, rng):
+    """Return the lines of one block
+
+    Arguments:
+        header {dict} -- expMode, scanMode, numExpVariables, includes and the map size of the file
+        blockNumber {int} -- number of the block starting at 1
+        numPoints {int} -- points of the spectrum
+        numVars {int} -- corresponding variables, the abscissa of IRREGULAR scans is written as an additional first variable
+        numBlockCommentLines {int} -- lines of the block comment
+        rng {np.random.Generator} -- random numbers
+
+    Returns:
+        {list} -- the lines
+    """
+    expMode = header['expMode']
+    irregular = header['scanMode'] == 'IRREGULAR'
+    technique = 'XPS'
+    #Later blocks contain only the included parameters
+    includes = header['includes']
+
+    def included(prefix):
+        return blockNumber == 1 or includes is None or prefix in includes
+
+    lines = ["Region{0}".format(blockNumber), "Sample.Pos{0}".format(blockNumber)]
+    for prefix, value in zip(range(1, 8), [2020, 5, 17, 13, 45, blockNumber % 60, 1]):
+        if included(prefix):
+            lines.append(str(value))
+    if included(8):
+        comment = matrixBlockCommentLines + ["Note {0}".format(i) for i in range(numBlockCommentLines - len(matrixBlockCommentLines))]
+        comment = comment[:numBlockCommentLines]
+        lines += [str(len(comment))] + comment
+    if included(9):
+        lines.append(technique)
+    if expMode in mappingModes and included(10):
+        #Blocks run through the map row by row
+        position = (blockNumber - 1) % header['numAnalysisPositions']
+        lines += [str(position % header['numMapX'] + 1), str(position // header['numMapX'] + 1)]
+    if included(11):
+        #Etch time of depth profiles, one etch step per block or per complete map
+        step = (blockNumber - 1) // header['numAnalysisPositions'] if expMode in mappingModes else blockNumber - 1
+        lines += ["{0:g}".format(10.0*step)]*header['numExpVariables']
+    if included(12):
+        lines.append("Al")
+    if expMode in sputteringModes and included(13):
+        lines += ["18", "1", "1"]
+    for prefix, values in [(14, ["1486.6"]), (15, ["250"]), (16, ["100", "100"])]:
+        if included(prefix):
+            lines += values
+    if expMode in fieldOfViewModes and included(17):
+        lines += ["1000", "1000"]
+    if expMode in lineScanModes and included(18):
+        lines += ["1", "1", str(header['numMapX']), "1", str(header['numMapX']), str(header['numMapY'])]
+    for prefix, values in [(19, ["54.7"]), (20, ["0"]), (21, ["FAT"]), (22, ["20"]), (24, ["2"]), (25, ["4.5"]),
+                           (26, ["0"]), (27, ["500", "500"]), (28, ["0", "0"]), (29, ["C"]), (30, ["1s", "-1"])]:
+        if included(prefix):
+            lines += values
+    increment = xAxisRange/max(numPoints - 1, 1)
+    if not irregular and included(31):
+        lines += ["kinetic energy", "eV", "{0:g}".format(xAxisStart), "{0:g}".format(increment)]
+    numColumns = numVars + 1 if irregular else numVars
+    if included(32):
+        lines.append(str(numColumns))
+        if irregular:
+            lines += ["kinetic energy", "eV"]
+        for i in range(numVars):
+            lines += ["counts", "d"]
+    for prefix, values in [(33, ["pulse counting"]), (34, ["0.1"]), (35, ["3"]), (36, ["0"])]:
+        if included(prefix):
+            lines += values
+    if expMode in sputteringModes and included(37):
+        lines += ["1000", "1", "1", "1", "45", "0", "cyclic"]
+    for prefix, values in [(38, ["0", "0"]), (39, ["0"]), (40, ["1", "ESCAPE DEPTH TYPE", "n/a", "2"])]:
+        if included(prefix):
+            lines += values
+
+    #Ordinate values, the variables interleaved point by point
+    x = xAxisStart + increment*np.arange(numPoints)
+    columns = [x] if irregular else []
+    columns += [syntheticSpectrum(x, rng) for i in range(numVars)]
+    values = np.column_stack(columns) if columns else np.empty((0, 0))
+    lines.append(str(numPoints*numColumns))
+    for i in range(numColumns):
+        lines += ["{0:g}".format(values[:, i].min() if numPoints else 0), "{0:g}".format(values[:, i].max() if numPoints else 0)]
+    lines += ["{0:g}".format(value) for value in values.ravel()]
+    return lines
+
+
+def writeVamasFile(fileName, expMode="NORM", scanMode="REGULAR", numBlocks=1, numPoints=1000, numVars=1,
+                   numCommentLines=10, numBlockCommentLines=12, includes=None, seed=0):
+    """Write a synthetic VAMAS file
+
+    Arguments:
+        fileName {str} -- path of the file
+
+    Keyword Arguments:
+        expMode {str} -- experiment mode, one of experimentModes (default: {"NORM"})
+        scanMode {str} -- 'REGULAR' or 'IRREGULAR', irregular scans have the abscissa as first corresponding variable (default: {"REGULAR"})
+        numBlocks {int} -- number of blocks (default: {1})
+        numPoints {int} -- points per spectrum (default: {1000})
+        numVars {int} -- ordinate variables per block (default: {1})
+        numCommentLines {int} -- lines of the file comment including the MATRIX parameters (default: {10})
+        numBlockCommentLines {int} -- lines of each block comment including the MATRIX parameters (default: {12})
+        includes {list} -- block parameter prefix numbers written in the blocks after the first one, None for all (default: {None})
+        seed {int} -- seed of the random spectra (default: {0})
+    """
+    if expMode not in experimentModes:
+        raise ValueError("Unknown experiment mode {0}".format(expMode))
+    if scanMode not in scanModes:
+        raise ValueError("Unknown scan mode {0}".format(scanMode))
+    rng = np.random.default_rng(seed)
+    #Square map with a position for each block
+    numMapX = max(int(np.ceil(np.sqrt(numBlocks))), 1)
+    header = {'expMode': expMode, 'scanMode': scanMode, 'includes': includes, 'numMapX': numMapX,
+              'numMapY': max(-(-numBlocks // numMapX), 1), 'numAnalysisPositions': max(numBlocks, 1),
+              'numExpVariables': 1 if expMode in sputteringModes else 0}
+
+    comment = matrixCommentLines + ["Note {0}".format(i) for i in range(numCommentLines - len(matrixCommentLines))]
+    comment = ["CREATION COMMENT START"] + comment[:numCommentLines] + ["CREATION COMMENT END"]
+    lines = ["VAMAS Surface Chemical Analysis Standard Data Transfer Format 1988 May 4", "Synthetic", "Generator",
+             "Operator", "Benchmark", str(len(comment))] + comment
+    lines += [expMode, scanMode]
+    if expMode in normalModes:
+        lines.append("1")
+    if expMode in mappingModes:
+        lines += [str(header['numAnalysisPositions']), str(header['numMapX']), str(header['numMapY'])]
+    lines.append(str(header['numExpVariables']))
+    lines += ["Etch time", "s"]*header['numExpVariables']
+    if includes is None:
+        lines.append("0")
+    else:
+        lines += [str(len(includes))] + [str(prefix) for prefix in includes]
+    #Manually entered items, future experiment and block entries
+    lines += ["0", "0", "0", str(numBlocks)]
+    for blockNumber in range(1, numBlocks + 1):
+        lines += blockLines(header, blockNumber, numPoints, numVars, numBlockCommentLines, rng)
+    lines.append("end of experiment")
+    with open(fileName, 'w', encoding='cp1252', newline='\r\n') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic VAMAS files, one for each combination of experiment and scan mode")
+    parser.add_argument("output", help="output folder")
+    parser.add_argument("--mode", nargs='+', choices=experimentModes, default=list(experimentModes), help="experiment modes")
+    parser.add_argument("--scan", nargs='+', choices=scanModes, default=list(scanModes), help="scan modes")
+    parser.add_argument("--blocks", type=int, default=4, help="blocks per file")
+    parser.add_argument("--points", type=int, default=1000, help="points per spectrum")
+    parser.add_argument("--vars", type=int, default=1, help="ordinate variables per block")
+    parser.add_argument("--comment", type=int, default=10, help="lines of the file and block comments")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random spectra")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    for expMode in args.mode:
+        for scanMode in args.scan:
+            fileName = os.path.join(args.output, "{0}_{1}.vms".format(expMode, scanMode))
+            writeVamasFile(fileName, expMode, scanMode, args.blocks, args.points, args.vars, args.comment, args.comment, seed=args.seed)
+            print(fileName)
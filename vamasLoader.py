@@ -0,0 +1,173 @@
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import multiprocessing
+import os
+from vamasSimple import VAMAS_File
+from vamasFiles import fileState
+from vamasStats import ParseStats, statsEnabled
+
+
+@dataclass
+class LoadResult:
+    """Result of loading one VAMAS file
+    """
+    index:int = 0 #Position of the file in the list of files to load
+    fileName:str = ""
+    blocks:list = field(default_factory=list) #VAMAS_File dataclass for each block
+    error:str = "" #Error message if the file could not be parsed
+    stats:ParseStats = None #Parse statistics of the file if collected
+
+
+def readVamasBlocks(fileName, headerOnly=False, cache=None, stats=None):
+    """Read all blocks of a VAMAS file, runs in the worker processes
+
+    Arguments:
+        fileName {str} -- path of the file
+
+    Keyword Arguments:
+        headerOnly {bool} -- read only the parameters, the spectra are loaded on first access (default: {False})
+        cache {VamasCache} -- take the blocks from this cache, a parsed file is added to it (default: {None})
+        stats {ParseStats} -- add the parse statistics of the file, see VAMAS_File.iterBlocks() (default: {None})
+
+    Returns:
+        {list} -- VAMAS_File dataclass for each block
+    """
+    if cache is None:
+        return list(VAMAS_File(fileName=fileName).iterBlocks(headerOnly=headerOnly, stats=stats))
+    if stats is not None:
+        stats.start('cache')
+    blocks = cache.get(fileName, headerOnly)
+    if stats is not None:
+        stats.stop()
+    if blocks is None:
+        #State before parsing, a file changing meanwhile is stored for this state and parsed again when read next
+        state = fileState(fileName)
+        #Parse the spectra as well to store them in the cache
+        blocks = list(VAMAS_File(fileName=fileName).iterBlocks(stats=stats))
+        if stats is not None:
+            stats.start('cache')
+        if cache.put(fileName, blocks, state) and headerOnly:
+            #Keep only the parameters, the spectra are taken from the cache when needed
+            blocks = cache.get(fileName, headerOnly) or blocks
+    elif stats is not None:
+        stats.files += 1
+        stats.cachedFiles += 1
+        stats.blocks += len(blocks)
+    if stats is not None:
+        stats.stop()
+    return blocks
+
+
+def readVamasBlocksWithStats(fileName, headerOnly=False, cache=None):
+    """Read all blocks of a VAMAS file collecting parse statistics, runs in the worker processes
+
+    Returns:
+        {tuple} -- list of VAMAS_File dataclasses, ParseStats of the file
+    """
+    stats = ParseStats()
+    return readVamasBlocks(fileName, headerOnly, cache, stats), stats
+
+
+class VamasLoader:
+    """Parses a list of VAMAS files in parallel using a pool of worker processes
+       Iterating over the loader yields a LoadResult for each file in the order of the list
+       as soon as the file and all files before it are parsed.
+    """
+
+    def __init__(self, fileNames, headerOnly=False, workers=None, cache=None, collectStats=None):
+        """
+        Arguments:
+            fileNames {list} -- paths of the files to load
+
+        Keyword Arguments:
+            headerOnly {bool} -- read only the parameters, the spectra are loaded on first access (default: {False})
+            workers {int} -- number of worker processes, defaults to the number of cores (default: {None})
+            cache {VamasCache} -- persistent cache of parsed files, trimmed to its size limit after loading (default: {None})
+            collectStats {bool} -- collect parse statistics per file and in self.stats for all files,
+                                   defaults to the environment variable VAMAS_PARSE_STATS (default: {None})
+        """
+        self.fileNames = list(fileNames)
+        self.headerOnly = headerOnly
+        self.cache = cache
+        self.workers = workers or os.cpu_count() or 1
+        self.cancelled = False
+        #Statistics of all loaded files
+        self.stats = ParseStats() if (statsEnabled() if collectStats is None else collectStats) else None
+
+    def cancel(self):
+        """Stop loading, files not parsed yet are skipped
+           Can be called from another thread
+        """
+        self.cancelled = True
+
+    def __len__(self):
+        return len(self.fileNames)
+
+    def __iter__(self):
+        try:
+            yield from self.iterResults()
+        finally:
+            if self.cache is not None:
+                self.cache.trim()
+
+    def readCall(self, fileName):
+        """Return the function reading a file and its arguments, called directly or in a worker process
+
+        Returns:
+            {tuple} -- function, arguments
+        """
+        if self.stats is not None:
+            return readVamasBlocksWithStats, fileName, self.headerOnly, self.cache
+        return readVamasBlocks, fileName, self.headerOnly, self.cache
+
+    def loadResult(self, index, fileName, value):
+        """Create the result of a file from the value returned by the read function
+        """
+        if self.stats is None:
+            return LoadResult(index, fileName, value)
+        blocks, stats = value
+        self.stats.add(stats)
+        return LoadResult(index, fileName, blocks, stats=stats)
+
+    def iterResults(self):
+        """Generator parsing the files, see __iter__
+        """
+        if self.workers == 1 or len(self.fileNames) < 2:
+            #Not worth starting processes
+            for index, fileName in enumerate(self.fileNames):
+                if self.cancelled:
+                    return
+                function, *arguments = self.readCall(fileName)
+                try:
+                    result = self.loadResult(index, fileName, function(*arguments))
+                except Exception as e:
+                    result = LoadResult(index, fileName, error=str(e))
+                yield result
+            return
+
+        #Spawned workers do not inherit the threads of the GUI like forked ones
+        executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        pending = deque()
+        try:
+            files = enumerate(self.fileNames)
+            #Keep a few files per worker in flight to bound the memory for results waiting for their turn
+            for index, fileName in files:
+                pending.append((index, fileName, executor.submit(*self.readCall(fileName))))
+                if len(pending) >= 2*self.workers:
+                    break
+            while pending and not self.cancelled:
+                index, fileName, future = pending.popleft()
+                try:
+                    result = self.loadResult(index, fileName, future.result())
+                except Exception as e:
+                    result = LoadResult(index, fileName, error=str(e))
+                for index, fileName in files:
+                    pending.append((index, fileName, executor.submit(*self.readCall(fileName))))
+                    break
+                yield result
+        finally:
+            #Skip files not started yet when cancelled or the consumer stopped iterating
+            for index, fileName, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
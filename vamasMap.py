@@ -0,0 +1,169 @@
+"""Spectral cubes of mapping experiments
+
+The blocks of a MAP or MAPDP file are spectra at the analysis positions xCoord, yCoord of a map of
+numDiscreteXCoordFullMap x numDiscreteYCoordFullMap positions. They are assembled into an array of shape
+(x, y, energy) per spectral region and, for depth profiles, per etch step. Cubes larger than memoryLimit
+are written to a memory-mapped .npy file while the file is streamed block by block, so neither the blocks
+nor the cube are held in memory.
+"""
+import os
+import tempfile
+import weakref
+import numpy as np
+from vamasSimple import VAMAS_File, mappingModes
+
+#Cubes larger than this are memory-mapped
+memoryLimit = 256*1024*1024
+
+
+class SpectralCube:
+    """Spectra of a map as array of shape (x, y, energy)
+       Positions without a block in the file are NaN and False in filled.
+    """
+
+    def __init__(self, values, xAxisValues, filled, regionName="", expVariables=(), path=None):
+        """
+        Arguments:
+            values {np.ndarray} -- array or memmap of shape (x, y, energy)
+            xAxisValues {np.ndarray} -- energy of each channel
+            filled {np.ndarray} -- bool array of shape (x, y), True for positions with a spectrum
+
+        Keyword Arguments:
+            regionName {str} -- block name of the spectra (default: {""})
+            expVariables {tuple} -- experimental variables of the spectra, e.g. the etch time of a depth profile (default: {()})
+            path {str} -- .npy file backing values if memory-mapped (default: {None})
+        """
+        self.values = values
+        self.xAxisValues = xAxisValues
+        self.filled = filled
+        self.regionName = regionName
+        self.expVariables = tuple(expVariables)
+        self.path = path
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def pixel(self, x, y):
+        """Return the spectrum at a position
+
+        Arguments:
+            x {int} -- x index starting at 0
+            y {int} -- y index starting at 0
+
+        Returns:
+            {np.ndarray} -- the spectrum, read from the file if memory-mapped
+        """
+        return np.array(self.values[x, y])
+
+    def channel(self, energy):
+        """Return the nearest channel of an energy
+        """
+        return int(np.argmin(np.abs(self.xAxisValues - energy)))
+
+    def image(self, energyMin, energyMax=None):
+        """Return the map of the intensity summed over an energy range
+
+        Arguments:
+            energyMin {float} -- first energy of the range, the nearest channel is used
+
+        Keyword Arguments:
+            energyMax {float} -- last energy of the range, None for one channel (default: {None})
+
+        Returns:
+            {np.ndarray} -- array of shape (x, y)
+        """
+        first = self.channel(energyMin)
+        last = first if energyMax is None else self.channel(energyMax)
+        first, last = min(first, last), max(first, last)
+        return np.asarray(self.values[:, :, first:last + 1]).sum(axis=2)
+
+
+def cubeKey(block):
+    """Return what the blocks of one cube have in common: the energy axis and the experimental variables
+    """
+    numPoints = int(block.numYAxisValues/block.numYAxisVars) if block.numYAxisVars > 0 else 0
+    return (block.xAxisLabel, block.xAxisStart, block.xAxisIncrement, numPoints, tuple(block.expVariablesList))
+
+
+def readMapCubes(fileName, variable=0, useMmap=None, directory=None):
+    """Read a MAP or MAPDP file into spectral cubes, one per spectral region and etch step
+       The file is streamed block by block, the blocks are not kept.
+
+    Arguments:
+        fileName {str} -- path of the VAMAS file
+
+    Keyword Arguments:
+        variable {int} -- corresponding variable of the spectra (default: {0})
+        useMmap {bool} -- write the cubes to memory-mapped files, None if larger than memoryLimit (default: {None})
+        directory {str} -- folder of the memory-mapped files which are kept, temporary files if None (default: {None})
+
+    Raises:
+        ValueError: if the file is no mapping experiment or a coordinate lies outside of the map
+
+    Returns:
+        {list} -- SpectralCube for each region and etch step in the order of the file
+    """
+    cubes = dict()
+    reader = VAMAS_File(fileName=fileName)
+    for block in reader.iterBlocks():
+        if block.expMode not in mappingModes:
+            raise ValueError("{0} is no mapping experiment: {1}".format(fileName, block.expMode))
+        key = cubeKey(block)
+        cube = cubes.get(key)
+        if cube is None:
+            cube = cubes[key] = createCube(block, len(cubes), useMmap, directory)
+        #Coordinates start at 1 in the files
+        x, y = block.xCoord - 1, block.yCoord - 1
+        if not (0 <= x < cube.shape[0] and 0 <= y < cube.shape[1]):
+            raise ValueError("Block {0} at {1}, {2} lies outside of the map of {3} x {4} positions".format(
+                block.blockNumber, block.xCoord, block.yCoord, cube.shape[0], cube.shape[1]))
+        cube.values[x, y] = block.yAxisValuesList[variable]
+        cube.filled[x, y] = True
+    for cube in cubes.values():
+        if isinstance(cube.values, np.memmap):
+            cube.values.flush()
+    return list(cubes.values())
+
+
+def createCube(block, number, useMmap, directory):
+    """Create an empty cube for the blocks like the given one
+
+    Arguments:
+        block {VAMAS_File} -- first block of the cube
+        number {int} -- number of the cube in the file, for the name of the memory-mapped file
+        useMmap {bool} -- write to a memory-mapped file, None if larger than memoryLimit
+        directory {str} -- folder of the memory-mapped file, temporary if None
+
+    Returns:
+        {SpectralCube} -- cube filled with NaN
+    """
+    numPoints = cubeKey(block)[3]
+    shape = (max(block.numDiscreteXCoordFullMap, 1), max(block.numDiscreteYCoordFullMap, 1), numPoints)
+    if useMmap is None:
+        useMmap = np.prod(shape)*8 > memoryLimit
+    path = None
+    if useMmap:
+        if directory is None:
+            handle, path = tempfile.mkstemp(suffix=".npy")
+            os.close(handle)
+        else:
+            os.makedirs(directory, exist_ok=True)
+            baseName = os.path.splitext(os.path.basename(block.fileName))[0]
+            path = os.path.join(directory, "{0}_cube{1}.npy".format(baseName, number + 1))
+        values = np.lib.format.open_memmap(path, mode='w+', dtype=float, shape=shape)
+        values[:] = np.nan
+    else:
+        values = np.full(shape, np.nan)
+    cube = SpectralCube(values, block.xAxisValuesList, np.zeros(shape[:2], dtype=bool), block.blockName, block.expVariablesList, path)
+    if useMmap and directory is None:
+        #Delete the temporary file with the cube, fails on Windows while still mapped elsewhere
+        weakref.finalize(cube, removeFile, path)
+    return cube
+
+
+def removeFile(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,354 @@
+"""Batch processing of the spectra of many blocks
+
+The spectra are processed in stages: conversion of the energy scale between kinetic and binding energy,
+calibration of the energy scale to a reference peak, subtraction of a linear or Shirley background and
+normalisation. Each stage is applied to all spectra with the same number of points at once as array
+operations on a matrix of shape (spectrum, point). The result of every stage is cached per file and block
+for the parameters of the stage and the stages before, so changing the parameters of one stage recomputes
+only this stage and the following ones.
+
+    pipeline = SpectrumPipeline(background={'method': 'shirley'}, normalisation={'method': 'max'})
+    spectra = pipeline.process(readVamasBlocks("survey.vms"))
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+import numpy as np
+
+#Stages in the order they are applied
+stages = ('energy', 'calibration', 'background', 'normalisation')
+#Parameters of each stage and their defaults, which leave the spectra unchanged
+defaultParameters = {
+    'energy': {'scale': None, 'workFunction': None},
+    'calibration': {'shift': 0.0, 'referenceEnergy': None, 'window': 2.0},
+    'background': {'method': None, 'energyMin': None, 'energyMax': None, 'maxIterations': 50, 'tolerance': 1e-6},
+    'normalisation': {'method': None},
+}
+#Labels of the energy scales
+scaleLabels = {'kinetic': "Kinetic Energy", 'binding': "Binding Energy"}
+
+
+@dataclass
+class ProcessedSpectrum:
+    """Result of a stage for one spectrum, the arrays are read-only views on the matrix of the stage
+    """
+    x: np.ndarray
+    y: np.ndarray
+    #Subtracted background in the intensity of the spectrum before normalisation, NaN outside the energy range
+    background: np.ndarray
+    #Calibration shift added to the energies
+    shift: float = 0.0
+    xAxisLabel: str = ""
+
+
+def energyScale(label):
+    """Return the energy scale of an abscissa label
+
+    Returns:
+        {str} -- 'kinetic', 'binding' or None for other abscissae
+    """
+    label = label.lower()
+    for scale in scaleLabels:
+        if scale in label:
+            return scale
+    return None
+
+
+def convertEnergyScale(x, sourceEnergies, workFunctions):
+    """Convert kinetic to binding energies or back of all spectra at once: Eb = hv - Ek - phi
+
+    Arguments:
+        x {np.ndarray} -- energies of shape (spectrum, point)
+        sourceEnergies {np.ndarray} -- analysis source energy hv of each spectrum
+        workFunctions {np.ndarray} -- analyser work function phi of each spectrum
+
+    Returns:
+        {np.ndarray} -- the converted energies
+    """
+    return (sourceEnergies - workFunctions)[:, None] - x
+
+
+def peakShifts(x, y, referenceEnergy, window):
+    """Return the shift of each spectrum moving the highest point within a window to the reference energy
+
+    Arguments:
+        x {np.ndarray} -- energies of shape (spectrum, point)
+        y {np.ndarray} -- intensities of shape (spectrum, point)
+        referenceEnergy {float} -- energy of the reference peak, e.g. 284.8 for adventitious carbon
+        window {float} -- the peak is searched within referenceEnergy +- window
+
+    Returns:
+        {np.ndarray} -- shift of each spectrum, 0 if it has no point within the window
+    """
+    inside = np.abs(x - referenceEnergy) <= window
+    peaks = np.argmax(np.where(inside, y, -np.inf), axis=1)
+    peakEnergies = x[np.arange(len(x)), peaks]
+    return np.where(inside.any(axis=1), referenceEnergy - peakEnergies, 0.0)
+
+
+def energyRange(x, energyMin=None, energyMax=None):
+    """Return the points of each spectrum within an energy range and the first and last of them
+
+    Returns:
+        {tuple} -- bool array of shape (spectrum, point), index of the first and of the last point within the range
+    """
+    inside = np.ones(x.shape, dtype=bool)
+    if energyMin is not None:
+        inside &= x >= energyMin
+    if energyMax is not None:
+        inside &= x <= energyMax
+    first = np.argmax(inside, axis=1)
+    last = x.shape[1] - 1 - np.argmax(inside[:, ::-1], axis=1)
+    return inside, first, last
+
+
+def linearBackground(x, y, energyMin=None, energyMax=None):
+    """Return the line between the first and last point within an energy range of all spectra at once
+
+    Arguments:
+        x {np.ndarray} -- energies of shape (spectrum, point)
+        y {np.ndarray} -- intensities of shape (spectrum, point)
+
+    Keyword Arguments:
+        energyMin {float} -- lower limit of the range, None for the whole spectrum (default: {None})
+        energyMax {float} -- upper limit of the range, None for the whole spectrum (default: {None})
+
+    Returns:
+        {np.ndarray} -- background of shape (spectrum, point), NaN outside the range, all NaN for spectra without points in it
+    """
+    inside, first, last = energyRange(x, energyMin, energyMax)
+    rows = np.arange(len(x))
+    x0, x1 = x[rows, first][:, None], x[rows, last][:, None]
+    y0, y1 = y[rows, first][:, None], y[rows, last][:, None]
+    span = np.where(x1 != x0, x1 - x0, 1.0)
+    background = y0 + (y1 - y0)*(x - x0)/span
+    return np.where(inside, background, np.nan)
+
+
+def shirleyBackground(x, y, energyMin=None, energyMax=None, maxIterations=50, tolerance=1e-6):
+    """Return the iterated Shirley background within an energy range of all spectra at once
+       The background at a point lies between the intensities at the ends of the range in proportion to the
+       peak area between the point and the end of lower intensity. It does not depend on the order of the energies.
+
+    Arguments:
+        x {np.ndarray} -- energies of shape (spectrum, point)
+        y {np.ndarray} -- intensities of shape (spectrum, point)
+
+    Keyword Arguments:
+        energyMin {float} -- lower limit of the range, None for the whole spectrum (default: {None})
+        energyMax {float} -- upper limit of the range, None for the whole spectrum (default: {None})
+        maxIterations {int} -- iterations at most (default: {50})
+        tolerance {float} -- the iteration stops when no background changes more than tolerance times the largest intensity (default: {1e-6})
+
+    Returns:
+        {np.ndarray} -- background of shape (spectrum, point), NaN outside the range, all NaN for spectra without points in it
+    """
+    inside, first, last = energyRange(x, energyMin, energyMax)
+    rows = np.arange(len(x))
+    y0, y1 = y[rows, first][:, None], y[rows, last][:, None]
+    #Trapezoids between neighbouring points within the range
+    segments = inside[:, :-1] & inside[:, 1:]
+    width = np.where(segments, np.abs(np.diff(x, axis=1)), 0.0)
+    limits = tolerance*np.max(np.abs(np.where(inside, y, 0.0)), axis=1, initial=0.0)
+    background = np.repeat(y1, y.shape[1], axis=1)
+    #Spectra still iterated, converged ones are not computed again
+    active = rows
+    for iteration in range(maxIterations):
+        signal = y[active] - background[active]
+        #Area from each point to the last point of the range
+        tail = np.zeros(signal.shape)
+        tail[:, :-1] = np.cumsum(((signal[:, :-1] + signal[:, 1:])*width[active])[:, ::-1], axis=1)[:, ::-1]/2
+        total = tail[np.arange(len(active)), first[active]][:, None]
+        ratio = np.divide(tail, total, out=np.zeros(tail.shape), where=total != 0)
+        updated = y1[active] + (y0[active] - y1[active])*ratio
+        change = np.max(np.abs(np.where(inside[active], updated - background[active], 0.0)), axis=1, initial=0.0)
+        background[active] = updated
+        active = active[change > limits[active]]
+        if len(active) == 0:
+            break
+    return np.where(inside, background, np.nan)
+
+
+def normalisationFactors(x, y, method):
+    """Return the divisor of each spectrum
+
+    Arguments:
+        x {np.ndarray} -- energies of shape (spectrum, point)
+        y {np.ndarray} -- intensities of shape (spectrum, point), NaN points are ignored
+        method {str} -- 'max' for the highest intensity, 'area' for the area of the spectrum
+
+    Raises:
+        ValueError: if the method is unknown
+
+    Returns:
+        {np.ndarray} -- divisor of each spectrum, 1 where it is 0 or undefined
+    """
+    if method == 'max':
+        factors = np.max(np.where(np.isnan(y), -np.inf, y), axis=1, initial=-np.inf)
+    elif method == 'area':
+        factors = np.nansum((y[:, 1:] + y[:, :-1])*np.abs(np.diff(x, axis=1)), axis=1)/2
+    else:
+        raise ValueError("Unknown normalisation {0}".format(method))
+    return np.where(np.isfinite(factors) & (factors != 0), factors, 1.0)
+
+
+class SpectrumPipeline:
+    """Processes the spectra of many blocks in stages with cached results
+       The parameters of each stage are given as dict, missing ones have the values of defaultParameters:
+
+       energy: scale 'binding' or 'kinetic' to convert the spectra with the other scale, None to keep it,
+               workFunction in eV instead of analyzerWorkFunction of the blocks, None to use the blocks'
+       calibration: shift in eV added to the energies or, if referenceEnergy is given, the shift moving the
+                    highest point within referenceEnergy +- window to referenceEnergy
+       background: method 'linear' or 'shirley', None for none, between energyMin and energyMax,
+                   maxIterations and tolerance of the Shirley iteration
+       normalisation: method 'max' or 'area', None for none
+    """
+    #Cached stage results at most, the least recently used are removed
+    maxEntries = 100000
+
+    def __init__(self, **parameters):
+        """
+        Keyword Arguments:
+            energy, calibration, background, normalisation {dict} -- parameters of the stages
+        """
+        self.parameters = {stage: dict(defaults) for stage, defaults in defaultParameters.items()}
+        for stage, values in parameters.items():
+            self.setParameters(stage, **values)
+        #(fileName, blockNumber, variable, stage, state): ProcessedSpectrum
+        self.cache = OrderedDict()
+        #Spectra computed per stage, to check which stages were recomputed
+        self.computed = {stage: 0 for stage in stages}
+
+    def setParameters(self, stage, **values):
+        """Change parameters of a stage, the cached results of the other parameters are kept
+
+        Raises:
+            ValueError: if the stage or a parameter is unknown
+        """
+        if stage not in self.parameters:
+            raise ValueError("Unknown stage {0}".format(stage))
+        for name in values:
+            if name not in self.parameters[stage]:
+                raise ValueError("Unknown parameter {0} of stage {1}".format(name, stage))
+        self.parameters[stage].update(values)
+
+    def stateKey(self, stage):
+        """Return the parameters of a stage and the stages before, on which the result of the stage depends
+        """
+        position = stages.index(stage)
+        return tuple(tuple(sorted(self.parameters[name].items())) for name in stages[:position + 1])
+
+    def invalidate(self, fileName=None):
+        """Remove the cached results of a file, e.g. after it changed, or of all files if None
+        """
+        if fileName is None:
+            self.cache.clear()
+            return
+        for key in [key for key in self.cache if key[0] == fileName]:
+            del self.cache[key]
+
+    def process(self, blocks, variable=0):
+        """Apply all stages to the spectra of blocks, using the cached results of unchanged stages
+
+        Arguments:
+            blocks {list} -- VAMAS_File or VamasRow of the blocks
+
+        Keyword Arguments:
+            variable {int} -- corresponding variable of the spectra (default: {0})
+
+        Returns:
+            {list} -- ProcessedSpectrum for each block, None for blocks without ordinate values
+        """
+        states = [self.stateKey(stage) for stage in stages]
+        results = [None]*len(blocks)
+        #Index of the first stage to compute for each block, after the last cached one
+        pending = [None]*len(blocks)
+        for index, block in enumerate(blocks):
+            if block.numYAxisValues == 0 or block.numYAxisVars <= variable:
+                continue
+            pending[index] = 0
+            for position in range(len(stages) - 1, -1, -1):
+                cached = self.cache.get((block.fileName, block.blockNumber, variable, stages[position], states[position]))
+                if cached is not None:
+                    self.cache.move_to_end((block.fileName, block.blockNumber, variable, stages[position], states[position]))
+                    results[index] = cached
+                    pending[index] = position + 1
+                    break
+            if pending[index] == 0:
+                results[index] = ProcessedSpectrum(np.asarray(block.xAxisValuesList, dtype=float), np.asarray(block.yAxisValuesList[variable], dtype=float),
+                                                   None, 0.0, block.xAxisLabel)
+        for position, stage in enumerate(stages):
+            indexes = [index for index, start in enumerate(pending) if start is not None and start <= position]
+            #Spectra of the same length are stacked into one matrix
+            groups = dict()
+            for index in indexes:
+                groups.setdefault(len(results[index].y), []).append(index)
+            for group in groups.values():
+                for index, spectrum in zip(group, self.applyStage(stage, [blocks[index] for index in group], [results[index] for index in group])):
+                    results[index] = spectrum
+                    self.store((blocks[index].fileName, blocks[index].blockNumber, variable, stage, states[position]), spectrum)
+                self.computed[stage] += len(group)
+        return results
+
+    def store(self, key, spectrum):
+        self.cache[key] = spectrum
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.maxEntries:
+            self.cache.popitem(last=False)
+
+    def applyStage(self, stage, blocks, spectra):
+        """Apply a stage to spectra of the same length at once
+
+        Arguments:
+            stage {str} -- name of the stage
+            blocks {list} -- blocks of the spectra
+            spectra {list} -- ProcessedSpectrum of the stage before
+
+        Returns:
+            {list} -- ProcessedSpectrum for each spectrum
+        """
+        parameters = self.parameters[stage]
+        x = np.stack([spectrum.x for spectrum in spectra])
+        y = np.stack([spectrum.y for spectrum in spectra])
+        labels = [spectrum.xAxisLabel for spectrum in spectra]
+        shifts = np.array([spectrum.shift for spectrum in spectra], dtype=float)
+        backgrounds = None
+        if stage == 'energy' and parameters['scale'] is not None:
+            if parameters['scale'] not in scaleLabels:
+                raise ValueError("Unknown energy scale {0}".format(parameters['scale']))
+            converted = np.array([energyScale(label) not in (None, parameters['scale']) for label in labels])
+            if converted.any():
+                sourceEnergies = np.array([block.analysisSourceEnergy for block in blocks], dtype=float)
+                if parameters['workFunction'] is None:
+                    workFunctions = np.array([block.analyzerWorkFunction for block in blocks], dtype=float)
+                else:
+                    workFunctions = np.full(len(blocks), float(parameters['workFunction']))
+                x = np.where(converted[:, None], convertEnergyScale(x, sourceEnergies, workFunctions), x)
+                labels = [scaleLabels[parameters['scale']] if convert else label for label, convert in zip(labels, converted)]
+        elif stage == 'calibration':
+            if parameters['referenceEnergy'] is None:
+                stageShifts = np.full(len(x), float(parameters['shift']))
+            else:
+                stageShifts = peakShifts(x, y, parameters['referenceEnergy'], parameters['window'])
+            x = x + stageShifts[:, None]
+            shifts = shifts + stageShifts
+        elif stage == 'background' and parameters['method'] is not None:
+            if parameters['method'] == 'linear':
+                backgrounds = linearBackground(x, y, parameters['energyMin'], parameters['energyMax'])
+            elif parameters['method'] == 'shirley':
+                backgrounds = shirleyBackground(x, y, parameters['energyMin'], parameters['energyMax'],
+                                                parameters['maxIterations'], parameters['tolerance'])
+            else:
+                raise ValueError("Unknown background {0}".format(parameters['method']))
+            #Outside the energy range the background is NaN and the spectrum is kept
+            inside = energyRange(x, parameters['energyMin'], parameters['energyMax'])[0]
+            y = np.where(inside, y - backgrounds, y)
+        elif stage == 'normalisation' and parameters['method'] is not None:
+            y = y/normalisationFactors(x, y, parameters['method'])[:, None]
+        if backgrounds is None:
+            backgrounds = np.stack([spectrum.background if spectrum.background is not None else np.zeros(len(spectrum.y)) for spectrum in spectra])
+        #The rows are shared with the cache
+        for array in (x, y, backgrounds):
+            array.setflags(write=False)
+        return [replace(spectrum, x=x[row], y=y[row], background=backgrounds[row], shift=float(shifts[row]), xAxisLabel=labels[row])
+                for row, spectrum in enumerate(spectra)]
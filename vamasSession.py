@@ -0,0 +1,130 @@
+"""Session files of the GUI: the parameters of all blocks as typed JSON and the spectra as binary arrays
+
+Layout of a .vmss file:
+    magic line b"VMSSESSION 1\\n"
+    length of the JSON document as 8 byte little endian integer
+    JSON document: field columns of all blocks, position and shape of each array, state of the model
+    padding to a multiple of 8 bytes
+    all arrays as little endian float64 one after another
+
+The arrays are memory-mapped when a session is loaded, so only the spectra which are plotted are read.
+"""
+import json
+import math
+import os
+import struct
+import numpy as np
+from vamasCollection import VamasCollection
+
+sessionMagic = b"VMSSESSION 1\n"
+sessionExtension = ".vmss"
+#dtype of the stored arrays
+sessionDtype = np.dtype('<f8')
+
+
+def saveSession(fileName, collection, state=None):
+    """Save all blocks of a collection including their spectra
+       The spectra of header-only blocks are loaded for saving. The file is written to a temporary file first
+       and replaces the old one only when complete, it is removed if writing fails. Spectra of the collection mapped from the file itself, when
+       saving a loaded session again, are copied into memory, Windows cannot replace a file which is mapped.
+       Other arrays viewing them, e.g. plotted lines, must be released before.
+
+    Arguments:
+        fileName {str} -- path of the .vmss file
+        collection {VamasCollection} -- the blocks
+
+    Keyword Arguments:
+        state {dict} -- JSON compatible values restored by loadSession, e.g. the selected rows and columns of the model (default: {None})
+    """
+    target = os.path.normcase(os.path.abspath(fileName))
+    for values in (collection.yAxisValues, collection.xAxisValues):
+        for index, array in enumerate(values):
+            if mappedFile(array) == target:
+                values[index] = np.array(array)
+    arrays = list()
+    #Start, shape of the y and the x array of each block in units of values, x is None if computed from the parameters
+    layout = list()
+    start = 0
+    for index in range(len(collection)):
+        yValues = np.asarray(collection.getYAxisValues(index), dtype=sessionDtype)
+        xValues = collection.valueState(index)[1]
+        entry = [start, list(yValues.shape)]
+        arrays.append(yValues)
+        start += yValues.size
+        if xValues is not None:
+            xValues = np.asarray(xValues, dtype=sessionDtype)
+            arrays.append(xValues)
+            entry += [start, list(xValues.shape)]
+            start += xValues.size
+        layout.append(entry)
+    document = json.dumps({'columns': collection.jsonColumns(), 'arrays': layout, 'state': state or dict()}).encode('utf-8')
+    header = sessionMagic + struct.pack('<Q', len(document)) + document
+    header += b"\0"*(-len(header) % sessionDtype.itemsize)
+
+    temporary = fileName + ".tmp"
+    try:
+        with open(temporary, 'wb') as f:
+            f.write(header)
+            for values in arrays:
+                f.write(np.ascontiguousarray(values).data)
+        os.replace(temporary, fileName)
+    except BaseException:
+        #No partial file is left next to the session, e.g. when the disk is full
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        raise
+
+
+def mappedFile(values):
+    """Return the normalized path of the file an array is memory-mapped from, None if it is not mapped
+    """
+    while isinstance(values, np.ndarray):
+        if isinstance(values, np.memmap):
+            return os.path.normcase(os.path.abspath(values.filename)) if values.filename else None
+        values = values.base
+    return None
+
+
+def loadSession(fileName, useMmap=True):
+    """Load a session saved by saveSession()
+
+    Arguments:
+        fileName {str} -- path of the .vmss file
+
+    Keyword Arguments:
+        useMmap {bool} -- map the arrays of the file instead of reading them, changing them does not change the file (default: {True})
+
+    Raises:
+        ValueError: if the file is no session file
+
+    Returns:
+        {tuple} -- VamasCollection of the blocks, saved state
+    """
+    with open(fileName, 'rb') as f:
+        if f.read(len(sessionMagic)) != sessionMagic:
+            raise ValueError("{0} is no vmsParser session file".format(fileName))
+        length, = struct.unpack('<Q', f.read(8))
+        document = json.loads(f.read(length).decode('utf-8'))
+        dataOffset = len(sessionMagic) + 8 + length
+        dataOffset += -dataOffset % sessionDtype.itemsize
+        numValues = (os.fstat(f.fileno()).st_size - dataOffset) // sessionDtype.itemsize
+        if useMmap and numValues > 0:
+            #Copy on write, np.memmap cannot map an empty range
+            #Plain array view of the map, so results of calculations with the spectra are no memmaps
+            values = np.memmap(f, dtype=sessionDtype, mode='c', offset=dataOffset, shape=(numValues,)).view(np.ndarray)
+        else:
+            f.seek(dataOffset)
+            values = np.fromfile(f, dtype=sessionDtype, count=numValues)
+    yAxisValues = list()
+    xAxisValues = list()
+    for entry in document['arrays']:
+        start, shape = entry[0], entry[1]
+        yAxisValues.append(values[start:start + math.prod(shape)].reshape(shape))
+        if len(entry) > 2:
+            start, shape = entry[2], entry[3]
+            xAxisValues.append(values[start:start + math.prod(shape)].reshape(shape))
+        else:
+            xAxisValues.append(None)
+    return VamasCollection.fromColumns(document['columns'], yAxisValues, xAxisValues), document['state']
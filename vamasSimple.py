@@ -1,7 +1,15 @@
 
 from dataclasses import dataclass, fields, field, asdict, replace
+import argparse
 from datetime import datetime
+from functools import lru_cache
+import os
+import math
+import hashlib
+import mmap
 import re
+import numpy as np
+from vamasStats import ParseStats, statsEnabled
 
 
 #DataClass to store the experiment data contained in a VAMAS file
@@ -22,7 +30,7 @@ class VAMAS_File:
     instrumentModelName:str = "Not Specified"
     operatorName:str = "Not Specified"
     experimentName:str = "Not Specified"
-    numCommentLines:str = 0 #number of lines in comment
+    numCommentLines:int = 0 #number of lines in comment
     comment:str = "Not Specified"
 
     #Optional parameters parsed from comment:
@@ -90,11 +98,12 @@ class VAMAS_File:
     futureExpEntriesList : list = field(default_factory=list)
 
     #Number of data blocks
-    #To keep the dataclass 1-dim only first block is read, so this is always 1
+    #To keep the dataclass 1-dim each block is read into its own dataclass, see iterBlocks()
     numBlocks: int = 1
 
 
-    #Block 1 data
+    #Block data
+    blockNumber:int = 1 #Number of the block in the file, starting at 1
     blockName:str = "Not Specified" #Block identifier
     sampleName:str = "Not Specified" #Sample identifier
     #B.K. added: part of sample name after . is MATRIX V4.4.9 stage position name
@@ -179,7 +188,7 @@ class VAMAS_File:
     diffWidth:float = 0
 
     #magnification of analyser transfer lens
-    analyzerMagnification:int = 1
+    analyzerMagnification:float = 1
 
     # analyser work function or acceptance energy of atom or ion
     analyzerWorkFunction:float = 0 # in eV
@@ -205,7 +214,7 @@ class VAMAS_File:
     transitionLabel:str = "Not Specified"
 
     #  -1 for AES and XPS, 
-    detectedParticleCharge:str = -1
+    detectedParticleCharge:int = -1
 
     # Only used for 'REGULAR'. Abscissa = xaxis parameter
     xAxisLabel:str = "Not Specified"  # text line
@@ -267,14 +276,18 @@ class VAMAS_File:
 
     #Product of numYAxisVars and len of yAxis values list
     numYAxisValues:int = 1 #number of ordinate values
+    #Byte offset of the first ordinate value in the file
+    dataOffset:int = 0
+    #Hash of the ordinate values and the fields identifying the measurement, equal for copies of a file, computed on first access
+    fingerprint:str = ""
 
     minYAxisValuesList : list = field(default_factory=list)
     maxYAxisValuesList : list = field(default_factory=list)
 
-    # Replace by numpy dings
-    yAxisValuesList : list = field(default_factory=list)
+    #Ordinate values as 2-dim numpy array, one row per corresponding variable
+    yAxisValuesList : np.ndarray = field(default_factory=lambda: np.empty((0, 0)))
     #B.K. added:
-    xAxisValuesList : list = field(default_factory=list)
+    xAxisValuesList : np.ndarray = field(default_factory=lambda: np.empty(0))
     
     #End of file
     expTerm:str = 'end of experiment'
@@ -282,19 +295,96 @@ class VAMAS_File:
 
 
 
-    def readVamasFile(self):
+    def readVamasFile(self, headerOnly=False, useMmap=False, stats=None):
         """Read the content of the VAMAS file into the dataclass according to the paper
-        """
-        self.file = open(self.fileName, encoding='cp1252') #Western Windows encoding
-        self.file.seek(0)
-        lines = iter(self.file.readlines())
+           Only the first block is read, use iterBlocks() to read all blocks of the file
 
+        Keyword Arguments:
+            headerOnly {bool} -- read only the parameters, the ordinate values are loaded on first access (default: {False})
+            useMmap {bool} -- load the ordinate values of a header-only read through mmap (default: {False})
+            stats {ParseStats} -- add the time per phase, bytes read and object counts, also collected into
+                                  self.parseStats if the environment variable VAMAS_PARSE_STATS is set (default: {None})
+        """
+        stats = self.startStats(stats)
+        with openTimed(self.fileName, stats) as file:
+            lines = LineReader(file) if stats is None else TimedLineReader(file, stats)
+            self.readHeader(lines)
+            self.readBlock(lines, headerOnly=headerOnly, useMmap=useMmap)
+        if stats is not None:
+            stats.blocks += 1
+            stats.stop()
+
+    def iterBlocks(self, headerOnly=False, useMmap=False, stats=None):
+        """Generator reading the VAMAS file block by block
+           The experiment header is read into this object, every block is yielded as a new dataclass
+           holding a copy of the header and the parameters and data of the block.
+           The file is streamed, so only one block at a time is kept in memory.
+
+        Keyword Arguments:
+            headerOnly {bool} -- read only the parameters, the ordinate values are loaded on first access (default: {False})
+            useMmap {bool} -- load the ordinate values of a header-only read through mmap (default: {False})
+            stats {ParseStats} -- add the time per phase, bytes read and object counts, also collected into
+                                  self.parseStats if the environment variable VAMAS_PARSE_STATS is set (default: {None})
+
+        Yields:
+            {VAMAS_File} -- dataclass for each block in the file
+        """
+        stats = self.startStats(stats)
+        with openTimed(self.fileName, stats) as file:
+            lines = LineReader(file) if stats is None else TimedLineReader(file, stats)
+            self.readHeader(lines)
+            firstBlock = None
+            for blockNumber in range(1, self.numBlocks + 1):
+                #Start each block from the header only
+                block = replace(self, fingerprint="")
+                block.readBlock(lines, firstBlock, blockNumber, headerOnly, useMmap)
+                if firstBlock is None:
+                    #Keep parameters of the first block for the parameters excluded in later blocks
+                    firstBlock = replace(block, yAxisValuesList=np.empty((0, 0)), xAxisValuesList=np.empty(0), fingerprint="")
+                if stats is not None:
+                    stats.blocks += 1
+                    #The time until the next block is requested is not parsing
+                    stats.stop()
+                    yield block
+                    stats.start()
+                else:
+                    yield block
+        if stats is not None:
+            stats.stop()
+
+    def startStats(self, stats):
+        """Return the statistics to collect while reading the file and count the file
+
+        Arguments:
+            stats {ParseStats} -- statistics given by the caller or None
+
+        Returns:
+            {ParseStats} -- the statistics or None if not collected
+        """
+        if stats is None and statsEnabled():
+            stats = ParseStats()
+        if stats is not None:
+            #Not a dataclass field, kept on the object reading the file only
+            self.parseStats = stats
+            stats.files += 1
+            stats.start()
+        return stats
+
+    def readHeader(self, lines):
+        """Read the experiment header preceding the blocks
+
+        Arguments:
+            lines {iterator} -- line iterator positioned at the start of the file
+        """
+        stats = lines.stats
+        if stats is not None:
+            stats.switch('header')
         self.formatName = next(lines).strip()
         self.institutionName = next(lines).strip()
         self.instrumentModelName = next(lines).strip()
         self.operatorName = next(lines).strip()
         self.experimentName = next(lines).strip()
-        self.numCommentLines = int(next(lines).strip())
+        self.numCommentLines = int(lines.nextRaw())
 
         #Parse the comment
         for i in range(self.numCommentLines):
@@ -303,21 +393,15 @@ class VAMAS_File:
             self.comment = self.comment + next(lines)
 
         #B.K. Parse Additional Info from comment:
-        self.commentCreatedWith, self.comment = parseString(self.comment, "Created with")
-        self.commentAcquisition, self.comment = parseString(self.comment, "Date of Acquisition")
-        self.commentSourceAnalyzerAngle, unit, self.comment = parseParameter(self.comment, "SourceAnalyserAngle")
-        self.commentpIG, unit, self.comment = parseParameter(self.comment, "pIG")
-        self.commentpPir, unit, self.comment = parseParameter(self.comment, "pPIR")
-        self.commentpHIS, unit, self.comment = parseParameter(self.comment, "pHIS")
-        self.commentVHIS, unit, self.comment = parseParameter(self.comment, "VHIS")
-        self.commentWHIS, unit, self.comment = parseParameter(self.comment, "WHIS")
-        self.commentVHISstart, unit, self.comment = parseParameter(self.comment, "VHIS")
-        self.commentUPSFilterNr, unit, self.comment = parseParameter(self.comment, "Filter")
-        self.commentUPSFilterAngle, unit, self.comment = parseParameter(self.comment, "FilterDeg")
-        self.commentSampleBias, unit, self.comment = parseParameter(self.comment, "Bias")
+        if stats is not None:
+            stats.switch('comment')
+        values, self.comment = commentExtractor.extract(self.comment)
+        self.setFieldValues(values)
         #Save to vamas field for sample bias
-        self.sampleName = self.commentSampleBias
+        self.sampleBias = self.commentSampleBias
 
+        if stats is not None:
+            stats.switch('header')
         #Remove comment header
         self.comment = self.comment.replace("CREATION COMMENT START", "")
         self.comment = self.comment.replace("CREATION COMMENT END", "")
@@ -327,60 +411,108 @@ class VAMAS_File:
         self.expMode = next(lines).strip()
         self.scanMode = next(lines).strip()
 
-        normalModes = ['MAP', 'MAPDP', 'NORM', 'SDP']
         if self.expMode in normalModes:
-            self.numSpectralRegions = int(next(lines).strip())
+            self.numSpectralRegions = int(lines.nextRaw())
 
-        mappingModes = ['MAP', 'MAPDP']
         if self.expMode in mappingModes:
-            self.numAnalysisPositions = int(next(lines).strip())
-            self.numDiscreteXCoordFullMap = int(next(lines).strip())
-            self.numDiscreteYCoordFullMap = int(next(lines).strip())
+            self.numAnalysisPositions = int(lines.nextRaw())
+            self.numDiscreteXCoordFullMap = int(lines.nextRaw())
+            self.numDiscreteYCoordFullMap = int(lines.nextRaw())
 
-        self.numExpVariables = int(next(lines).strip())
+        self.numExpVariables = int(lines.nextRaw())
 
         for i in range(self.numExpVariables):
             self.expVariableLabels.append(next(lines).strip())
             self.expVariableUnits.append(next(lines).strip())
 
-        self.lenParamExclusionInclusionList = int(next(lines).strip())
+        self.lenParamExclusionInclusionList = int(lines.nextRaw())
 
         for i in range(abs(self.lenParamExclusionInclusionList)):
-            self.paramExclusionInclusionPrefix.append(int(next(lines).strip()))
+            self.paramExclusionInclusionPrefix.append(int(lines.nextRaw()))
 
-        self.numManuallyBlockItems = int(next(lines).strip())
+        self.numManuallyBlockItems = int(lines.nextRaw())
 
         for i in range(self.numManuallyBlockItems):
-            self.numManuallyBlockItemsPrefix.append(int(next(lines).strip()))
+            self.numManuallyBlockItemsPrefix.append(int(lines.nextRaw()))
 
-        self.numFutureExpEntries = int(next(lines).strip())
+        self.numFutureExpEntries = int(lines.nextRaw())
 
-        self.numFutureBlockEntries = int(next(lines).strip())
+        self.numFutureBlockEntries = int(lines.nextRaw())
 
-        for i in range(self.numFutureBlockEntries):
+        for i in range(self.numFutureExpEntries):
             self.futureExpEntriesList.append(next(lines).strip())
 
-        self.numBlocks = int(next(lines).strip())
+        self.numBlocks = int(lines.nextRaw())
 
-        #Read only first block:
+    def blockParameterIncludes(self):
+        """Evaluate the parameter inclusion or exclusion list of the header
+           The first block contains all parameters, the following blocks only the included ones.
+           A positive list length gives an inclusion list, zero or a negative length an exclusion list.
+
+        Returns:
+            {list} -- bool for each block parameter prefix number 1..40 (index 0 unused)
+        """
+        default = self.lenParamExclusionInclusionList <= 0
+        includes = [default] * 41
+        for prefix in self.paramExclusionInclusionPrefix:
+            includes[prefix] = not default
+        return includes
+
+    def readBlock(self, lines, firstBlock=None, blockNumber=1, headerOnly=False, useMmap=False):
+        """Read one block of the VAMAS file into the dataclass
+
+        Arguments:
+            lines {LineReader} -- line iterator positioned at the start of the block
+
+        Keyword Arguments:
+            firstBlock {VAMAS_File} -- first block of the file to copy excluded parameters from (default: {None})
+            blockNumber {int} -- number of the block in the file (default: {1})
+            headerOnly {bool} -- skip the ordinate values and load them on first access (default: {False})
+            useMmap {bool} -- load the skipped ordinate values through mmap (default: {False})
+        """
+        stats = lines.stats
+        if stats is not None:
+            stats.switch('blockParameters')
+        self.blockNumber = blockNumber
+        includes = self.blockParameterIncludes()
+
+        def included(prefix):
+            """Check if the block parameter with the given prefix number is present in the file for this block
+               If not, its fields are copied from the first block
+            """
+            if firstBlock is None or includes[prefix]:
+                return True
+            for name in blockParameterFields[prefix]:
+                setattr(self, name, getattr(firstBlock, name))
+            return False
 
-        
         self.blockName = next(lines).strip()
         self.sampleName = next(lines).strip()
+        self.posName = ""
         #B.K. split sample identifier into sample name and positon name at 1st dot
         if '.' in self.sampleName:
             self.sampleName, self.posName = self.sampleName.split(".", 1)
         #Parse dateTime:
-        year = int(next(lines).strip())
-        month = int(next(lines).strip())
-        day = int(next(lines).strip())
-        hours = int(next(lines).strip())
-        if hours == 24:
-            hours = 0 #24:00 = 00:00
-        minutes = int(next(lines).strip())
-        seconds = int(next(lines).strip())
-
-        self.timeZone = int(next(lines).strip())
+        if firstBlock is not None:
+            year, month, day = firstBlock.date.year, firstBlock.date.month, firstBlock.date.day
+            hours, minutes, seconds = firstBlock.date.hour, firstBlock.date.minute, firstBlock.date.second
+        if included(1):
+            year = int(lines.nextRaw())
+        if included(2):
+            month = int(lines.nextRaw())
+        if included(3):
+            day = int(lines.nextRaw())
+        if included(4):
+            hours = int(lines.nextRaw())
+            if hours == 24:
+                hours = 0 #24:00 = 00:00
+        if included(5):
+            minutes = int(lines.nextRaw())
+        if included(6):
+            seconds = int(lines.nextRaw())
+
+        if included(7):
+            self.timeZone = int(lines.nextRaw())
         #Todo: Correct for Timezone and DST
         try:
             self.date = datetime(year,month,day,hours,minutes,seconds)
@@ -390,203 +522,811 @@ class VAMAS_File:
 
 
         # 8
-        self.numBlockCommentLines = int(next(lines).strip())
-    
-        for i in range(self.numBlockCommentLines):
-            if i == 0:
-                self.blockComment = ""
-            self.blockComment = self.blockComment + next(lines)
-
-        #B.K. parse optional parameters from block comment
-        self.analyserAperture, unit, self.blockComment = parseParameter(self.blockComment, "Aperture")    
-        #X-Ray source parameters
-        self.xrayVoltage, unit, self.blockComment = parseParameter(self.blockComment, "X-Ray Source Voltage")
-        self.xrayPower, unit, self.blockComment = parseParameter(self.blockComment, "X-Ray Source Power")    
-        self.xrayEmCurr, unit, self.blockComment = parseParameter(self.blockComment, "X-Ray Source Emission Current")    
-        self.xrayFilCurr, unit, self.blockComment = parseParameter(self.blockComment, "X-Ray Source Filament Current")    
-        self.xrayLeakCurr, unit, self.blockComment = parseParameter(self.blockComment, "X-Ray Source Leak Current")    
-        #Sample stage parameters
-        self.sampleStageX, unit, self.blockComment = parseParameter(self.blockComment, "Sample Position X")
-        self.sampleStageY, unit, self.blockComment = parseParameter(self.blockComment, "Sample Position Y")
-        self.sampleStageZ, unit, self.blockComment = parseParameter(self.blockComment, "Sample Position Z")
-        self.sampleStageTheta, unit, self.blockComment = parseParameter(self.blockComment, "Sample Position Theta")
-        self.sampleStagePhi, unit, self.blockComment = parseParameter(self.blockComment, "Sample Position Phi")
-        self.analyserExitSlit, self.blockComment = parseString(self.blockComment, "Exit Slit")
-
-        self.blockComment = self.blockComment.strip()
-
-        self.technique = next(lines).strip()
-
-        if self.expMode in mappingModes:
-            self.xCoord = int(next(lines).strip())
-            self.yCoord = int(next(lines).strip())
-
-        for i in range(self.numExpVariables):
-            self.expVariablesList.append(float(next(lines).strip()))
-
-        self.AnalysisSourceLabel = next(lines).strip()
-
-        sputteringModes = ['MAPDP', 'MAPSVDP', 'SDP', 'SDPSV']
-        sputteringTechs = ['FABMS', 'FABMS energy spec', 'ISS', 'SIMS', 'SIMS energy spec', 'SNMS', 'SNMS energy spec']
-        if self.expMode in sputteringModes or self.technique in sputteringTechs:
-            self.sputteringIonAtomicNum = next(lines).strip()
-            self.numAtomsSputteringIon = int(next(lines).strip())
-            self.sputteringIonCharge = int(next(lines).strip())
-
-        self.analysisSourceEnergy = float(next(lines).strip())
+        if included(8):
+            self.numBlockCommentLines = int(lines.nextRaw())
+
+            for i in range(self.numBlockCommentLines):
+                if i == 0:
+                    self.blockComment = ""
+                self.blockComment = self.blockComment + next(lines)
+
+            #B.K. parse optional parameters from block comment
+            if stats is not None:
+                stats.switch('comment')
+            values, self.blockComment = blockCommentExtractor.extract(self.blockComment)
+            self.setFieldValues(values)
+            if stats is not None:
+                stats.switch('blockParameters')
+
+            self.blockComment = self.blockComment.strip()
+
+        # 9
+        if included(9):
+            self.technique = next(lines).strip()
+
+        # 10
+        if self.expMode in mappingModes and included(10):
+            self.xCoord = int(lines.nextRaw())
+            self.yCoord = int(lines.nextRaw())
+
+        # 11
+        if included(11):
+            self.expVariablesList = [float(lines.nextRaw()) for i in range(self.numExpVariables)]
+
+        # 12
+        if included(12):
+            self.AnalysisSourceLabel = next(lines).strip()
+
+        # 13
+        if (self.expMode in sputteringModes or self.technique in sputteringTechs) and included(13):
+            self.sputteringIonAtomicNum = int(lines.nextRaw())
+            self.numAtomsSputteringIon = int(lines.nextRaw())
+            self.sputteringIonCharge = int(lines.nextRaw())
+
+        # 14
+        if included(14):
+            self.analysisSourceEnergy = float(lines.nextRaw())
         #B.K: Guess UPS technique from source energy
         if self.analysisSourceEnergy < 100:
             self.technique = 'UPS'
 
-        self.analyisSourceStrength = float(next(lines).strip())
-        #B.K. added: Use HIS13 power if UPS:
-        if self.technique == 'UPS':
-            self.analyisSourceStrength = self.commentWHIS
+        # 15
+        if included(15):
+            self.analyisSourceStrength = float(lines.nextRaw())
+            #B.K. added: Use HIS13 power if UPS:
+            if self.technique == 'UPS':
+                self.analyisSourceStrength = self.commentWHIS
 
         # 16
-        self.analysisSourceBeamWidthX = float(next(lines).strip())
-        self.analysisSourceBeamWidthY = float(next(lines).strip())
+        if included(16):
+            self.analysisSourceBeamWidthX = float(lines.nextRaw())
+            self.analysisSourceBeamWidthY = float(lines.nextRaw())
 
         # 17
         mode = ['MAP', 'MAPDP', 'MAPSV', 'MAPSVDP', 'SEM']
-        if self.expMode in mode:
-            self.fieldOfViewX = float(next(lines).strip())
-            self.fieldOfViewY = float(next(lines).strip())
+        if self.expMode in mode and included(17):
+            self.fieldOfViewX = float(lines.nextRaw())
+            self.fieldOfViewY = float(lines.nextRaw())
 
         # 18
         mode = ['MAPSV', 'MAPSVDP', 'SEM']
-        if self.expMode in mode:
-            self.firstLineScanStartXCoord = int(next(lines).strip())
-            self.firstLineScanStartYCoord = int(next(lines).strip())
-            self.firstLineScanFinishXCoord = int(next(lines).strip())
-            self.firstLineScanFinishYCoord = int(next(lines).strip())
-            self.lastLineScanFinishXCoord = int(next(lines).strip())
-            self.lastLineScanFinishYCoord = int(next(lines).strip())
+        if self.expMode in mode and included(18):
+            self.firstLineScanStartXCoord = int(lines.nextRaw())
+            self.firstLineScanStartYCoord = int(lines.nextRaw())
+            self.firstLineScanFinishXCoord = int(lines.nextRaw())
+            self.firstLineScanFinishYCoord = int(lines.nextRaw())
+            self.lastLineScanFinishXCoord = int(lines.nextRaw())
+            self.lastLineScanFinishYCoord = int(lines.nextRaw())
 
         # 19
-        self.analysisSourceAngleOfIncidence = float(next(lines).strip())
+        if included(19):
+            self.analysisSourceAngleOfIncidence = float(lines.nextRaw())
 
         # 20
-        self.analysisSourceAzimuth = float(next(lines).strip())
+        if included(20):
+            self.analysisSourceAzimuth = float(lines.nextRaw())
 
         # 21
-        self.analyserMode = next(lines).strip()
+        if included(21):
+            self.analyserMode = next(lines).strip()
 
         # 22
-        self.analyzerPEorRR = float(next(lines).strip())
+        if included(22):
+            self.analyzerPEorRR = float(lines.nextRaw())
 
         # 23
-        if (self.technique == 'AES DIFF'):
-            self.diffWidth = float(next(lines).strip())
+        if (self.technique == 'AES diff') and included(23):
+            self.diffWidth = float(lines.nextRaw())
 
         # 24
-        self.analyzerMagnification = float(next(lines).strip())
+        if included(24):
+            self.analyzerMagnification = float(lines.nextRaw())
         #B.K. Build analyzer setting string from Aperture and magnification
-        self.analyserSettingStr = str(self.analyserAperture)
+        self.analyserSettingStr = str(self.analyserAperture) if self.analyserAperture else ""
         mag = self.analyzerMagnification
         self.analyserSettingStr += "low" if mag == 1 else ("med" if mag == 2 else ("high" if mag == 5 else "n.d."))
 
         # 25
-        self.analyzerWorkFunction = float(next(lines).strip())
+        if included(25):
+            self.analyzerWorkFunction = float(lines.nextRaw())
 
         # 26
-        self.targetBias = float(next(lines).strip())
+        if included(26):
+            self.targetBias = float(lines.nextRaw())
 
         # 27
-        self.analysisWidthX = float(next(lines).strip())
-        self.analysisWidthY = float(next(lines).strip())
+        if included(27):
+            self.analysisWidthX = float(lines.nextRaw())
+            self.analysisWidthY = float(lines.nextRaw())
 
         # 28
-        self.analysisTakeOffAngle = float(next(lines).strip())
-        self.analysisTakeoffAzimuth = float(next(lines).strip())
+        if included(28):
+            self.analysisTakeOffAngle = float(lines.nextRaw())
+            self.analysisTakeoffAzimuth = float(lines.nextRaw())
 
         # 29
-        self.speciesLabel = next(lines).strip()
+        if included(29):
+            self.speciesLabel = next(lines).strip()
 
         # 30
-        self.transitionLabel = next(lines).strip()
-        self.detectedParticleCharge = int(next(lines).strip())
+        if included(30):
+            self.transitionLabel = next(lines).strip()
+            self.detectedParticleCharge = int(lines.nextRaw())
 
         # 31: Parse x axis info
-        if (self.scanMode == 'REGULAR'):
+        if (self.scanMode == 'REGULAR') and included(31):
             self.xAxisLabel = next(lines).strip()
             self.xAxisUnit = next(lines).strip()
-            self.xAxisStart = float(next(lines).strip())
-            self.xAxisIncrement = float(next(lines).strip())
-    
+            self.xAxisStart = float(lines.nextRaw())
+            self.xAxisIncrement = float(lines.nextRaw())
+
 
         # 32: Parse y axis info
-        self.numYAxisVars = int(next(lines).strip())
-        for i in range(self.numYAxisVars):
-            self.yAxisVarsLabelList.append(next(lines).strip())
-            self.yAxisVarsUnitList.append(next(lines).strip())
+        if included(32):
+            self.numYAxisVars = int(lines.nextRaw())
+            self.yAxisVarsLabelList = []
+            self.yAxisVarsUnitList = []
+            for i in range(self.numYAxisVars):
+                self.yAxisVarsLabelList.append(next(lines).strip())
+                self.yAxisVarsUnitList.append(next(lines).strip())
 
 
         # 33
-        self.signalMode = next(lines).strip()
+        if included(33):
+            self.signalMode = next(lines).strip()
 
         # 34
-        self.dwellTime = float(next(lines).strip())
+        if included(34):
+            self.dwellTime = float(lines.nextRaw())
 
         # 35
-        self.numSweeps = int(next(lines).strip())
+        if included(35):
+            self.numSweeps = int(lines.nextRaw())
 
         # 36
-        self.signalTimeCorr = float(next(lines).strip())
+        if included(36):
+            self.signalTimeCorr = float(lines.nextRaw())
 
         # 37
-        sputteringCoTechs = ['AES diff', 'AES dir', 'EDX', 'ELS', 'UPS', 'XPS', 'XRF']
-        if self.technique in sputteringCoTechs and self.expMode in sputteringTechs:
-            self.sputteringSourceEnergy = float(next(lines).strip())
-            self.sputteringSourceBeamCurrent = float(next(lines).strip())
-            self.sputteringSourceWidthX = float(next(lines).strip())
-            self.sputteringSourceWidthY = float(next(lines).strip())
-            self.sputteringSourceAngleOfIncidence = float(next(lines).strip())
-            self.sputteringSourceAzimuth = float(next(lines).strip())
+        if self.technique in sputteringCoTechs and self.expMode in sputteringModes and included(37):
+            self.sputteringSourceEnergy = float(lines.nextRaw())
+            self.sputteringSourceBeamCurrent = float(lines.nextRaw())
+            self.sputteringSourceWidthX = float(lines.nextRaw())
+            self.sputteringSourceWidthY = float(lines.nextRaw())
+            self.sputteringSourceAngleOfIncidence = float(lines.nextRaw())
+            self.sputteringSourceAzimuth = float(lines.nextRaw())
             self.sputteringMode = next(lines).strip()
 
         # 38
-        self.sampleNormalTiltAngle = float(next(lines).strip())
-        self.sampleNormalTiltAzimuth = float(next(lines).strip())
+        if included(38):
+            self.sampleNormalTiltAngle = float(lines.nextRaw())
+            self.sampleNormalTiltAzimuth = float(lines.nextRaw())
 
         # 39
-        self.sampleRotationAngle = float(next(lines).strip())
+        if included(39):
+            self.sampleRotationAngle = float(lines.nextRaw())
 
         # 40 Additional Parameters
-        self.numAddNumParams = int(next(lines).strip())
-        for i in range(self.numAddNumParams):
-            self.addParamsLabelList.append(next(lines).strip())
-            self.addParamUnitList.append(next(lines).strip())
-            self.addParamValueList.append(float(next(lines).strip()))
+        if included(40):
+            self.numAddNumParams = int(lines.nextRaw())
+            self.addParamsLabelList = []
+            self.addParamUnitList = []
+            self.addParamValueList = []
+            for i in range(self.numAddNumParams):
+                self.addParamsLabelList.append(next(lines).strip())
+                self.addParamUnitList.append(next(lines).strip())
+                self.addParamValueList.append(float(lines.nextRaw()))
 
         # 40 Future Block Entries
-        for i in range(self.numFutureBlockEntries):
-            self.futureBlockEntriesList.append(next(lines).strip())
+        self.futureBlockEntriesList = [next(lines).strip() for i in range(self.numFutureBlockEntries)]
 
-        self.numYAxisValues = int(next(lines).strip())
+        self.numYAxisValues = int(lines.nextRaw())
 
+        self.minYAxisValuesList = []
+        self.maxYAxisValuesList = []
+        self.yAxisValuesList = np.empty((0, 0))
+        #Computed from the values on first access
+        self.fingerprint = ""
+        #x-values are created from xAxisStart and xAxisIncrement on first access
+        self.xAxisValuesList = None
         #B.K. Added test for number of vars > 0
         if self.numYAxisVars > 0:
+            numPoints = int(self.numYAxisValues/self.numYAxisVars)
             #Calculate x axis end:
-            self.xAxisEnd = self.xAxisStart + self.xAxisIncrement*int(self.numYAxisValues/self.numYAxisVars)
+            self.xAxisEnd = self.xAxisStart + self.xAxisIncrement*numPoints
 
-            variables = []
             for i in range(self.numYAxisVars):
-                self.minYAxisValuesList.append(float(next(lines).strip()))
-                self.maxYAxisValuesList.append(float(next(lines).strip()))
-                variables.append([])
+                self.minYAxisValuesList.append(float(lines.nextRaw()))
+                self.maxYAxisValuesList.append(float(lines.nextRaw()))
+
+            self.dataOffset = lines.offset
+            if headerOnly:
+                #Remember where the values are and skip them only if another line is requested
+                self.ordinateLoader = OrdinateLoader(self.fileName, self.dataOffset, self.numYAxisValues, self.numYAxisVars, self.blockNumber, useMmap)
+                lines.skip = self.numYAxisValues
+            else:
+                if stats is not None:
+                    stats.switch('ordinates')
+                self.yAxisValuesList = convertOrdinates(lines.readRaw(self.numYAxisValues), self.numYAxisValues, self.numYAxisVars, self.blockNumber)
+                if stats is not None:
+                    stats.values += self.numYAxisValues
+                    stats.arrayBytes += self.yAxisValuesList.nbytes
+
+    def getParameters(self):
+        """Return all fields except the value arrays as dict of JSON compatible values
+
+        Returns:
+            {dict} -- field name: value, dates as ISO format string
+        """
+        parameters = dict()
+        for f in fields(self):
+            if f.name in valueFields:
+                continue
+            value = getattr(self, f.name)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            parameters[f.name] = value
+        return parameters
+
+    @classmethod
+    def fromParameters(cls, parameters):
+        """Create a dataclass from a dict created by getParameters()
+           Unknown fields are ignored, missing fields keep their default value
+
+        Arguments:
+            parameters {dict} -- field name: value
+
+        Returns:
+            {VAMAS_File} -- the dataclass without ordinate values, the abscissa values are created on first access
+        """
+        values = dict()
+        for name, value in parameters.items():
+            if name not in fieldTypes or name in valueFields:
+                continue
+            if fieldTypes[name] is datetime:
+                value = datetime.fromisoformat(value)
+            values[name] = value
+        block = cls(**values)
+        block.xAxisValuesList = None
+        return block
+
+    def setFieldValues(self, values):
+        """Set dataclass fields from a dict, converting the values to the type of the field
+
+        Arguments:
+            values {dict} -- field name: value
+        """
+        for name, value in values.items():
+            setattr(self, name, fieldTypes[name](value))
+
+    def getYAxisValues(self):
+        """Return the ordinate values, loading them from the file if the block was read header-only
+
+        Returns:
+            {np.ndarray} -- 2-dim array with one row per corresponding variable
+        """
+        if self.ordinateLoader is not None:
+            self._yAxisValues = self.ordinateLoader.load()
+            self.ordinateLoader = None
+        return self._yAxisValues
+
+    def setYAxisValues(self, values):
+        """Set the ordinate values, discarding pending values of a header-only read
+        """
+        self.ordinateLoader = None
+        self._yAxisValues = values
+
+    def getXAxisValues(self):
+        """Return the abscissa values, created from xAxisStart and xAxisIncrement on first access
+
+        Returns:
+            {np.ndarray} -- x-values
+        """
+        if self._xAxisValues is None:
+            numPoints = int(self.numYAxisValues/self.numYAxisVars) if self.numYAxisVars > 0 else 0
+            self._xAxisValues = self.xAxisStart + self.xAxisIncrement*np.arange(numPoints)
+        return self._xAxisValues
+
+    def setXAxisValues(self, values):
+        """Set the abscissa values, None creates them from xAxisStart and xAxisIncrement on next access
+        """
+        self._xAxisValues = values
+
+    def getFingerprint(self):
+        """Return the fingerprint of the block, computed from the ordinate values on first access
+           The values of a block read header-only are loaded for it but not kept.
+
+        Returns:
+            {str} -- hexadecimal fingerprint, see blockFingerprint()
+        """
+        if not self._fingerprint:
+            values = self._yAxisValues if self.ordinateLoader is None else self.ordinateLoader.load()
+            self._fingerprint = blockFingerprint(self, values)
+        return self._fingerprint
+
+    def setFingerprint(self, fingerprint):
+        """Set the fingerprint, an empty string computes it again on next access
+        """
+        self._fingerprint = fingerprint
+
+
+#The value lists are properties to be able to load the ordinate values on demand, the fingerprint to hash them on demand
+#Defined after the class so the dataclass still sees them as fields
+VAMAS_File.yAxisValuesList = property(VAMAS_File.getYAxisValues, VAMAS_File.setYAxisValues)
+VAMAS_File.xAxisValuesList = property(VAMAS_File.getXAxisValues, VAMAS_File.setXAxisValues)
+VAMAS_File.fingerprint = property(VAMAS_File.getFingerprint, VAMAS_File.setFingerprint)
+
+#Types of the dataclass fields to convert parsed values
+fieldTypes = {f.name: f.type for f in fields(VAMAS_File)}
+#Fields holding the numpy value arrays
+valueFields = ("yAxisValuesList", "xAxisValuesList")
+#Fields hashed with the ordinate values into the fingerprint, not the file name or the position of the block in the file
+fingerprintFields = ("date", "expMode", "technique", "sampleName", "posName", "blockName", "speciesLabel", "transitionLabel", "expVariablesList",
+                     "xCoord", "yCoord", "analysisSourceEnergy", "analyzerPEorRR", "xAxisStart", "xAxisIncrement",
+                     "numYAxisValues", "numYAxisVars", "dwellTime", "numSweeps")
+
+
+class LineReader:
+    """Line iterator over a VAMAS file opened in binary mode, tokenizing a bytes buffer
+       The file is read in chunks into a buffer in which the lines are found with bytes.find and,
+       for runs of many lines, counted with numpy, without a Python call per line.
+       Only text lines returned by next() are decoded with the Western Windows encoding, numbers are
+       converted from the bytes of nextRaw() and the ordinate values are returned as one bytes object to convert them at once.
+       The byte offset of the next line is tracked to be able to load the ordinate values later on.
+    """
+    #Bytes read from the file at once, more if a run of lines is longer
+    bufferSize = 1 << 20
+
+    #Statistics of an instrumented read, see TimedLineReader
+    stats = None
+
+    def __init__(self, file):
+        self.file = file
+        self.offset = file.tell()
+        #Unread part of the buffer starts at position
+        self.buffer = b""
+        self.position = 0
+        #Number of lines to skip before the next line is returned
+        self.skip = 0
+
+    def __iter__(self):
+        return self
+
+    def fill(self):
+        """Append the next chunk of the file to the unread part of the buffer
+
+        Returns:
+            {int} -- number of bytes read, 0 at the end of the file
+        """
+        #Growing chunks for long runs of lines, so they are not copied again for every chunk
+        chunk = self.file.read(max(self.bufferSize, len(self.buffer) - self.position))
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return len(chunk)
+
+    def __next__(self):
+        return self.nextRaw().decode('cp1252').replace("\r\n", "\n") #Western Windows encoding
+
+    def nextRaw(self):
+        """Return the next line without decoding it, for numbers, which int() and float() convert from bytes
+
+        Raises:
+            StopIteration: at the end of the file
+
+        Returns:
+            {bytes} -- the line including the line break
+        """
+        if self.skip:
+            self.skipLines(self.skip)
+            self.skip = 0
+        end = self.buffer.find(b"\n", self.position)
+        while end < 0:
+            searched = len(self.buffer) - self.position
+            if not self.fill():
+                #Last line without line break
+                end = len(self.buffer) - 1
+                if end < self.position:
+                    raise StopIteration
+                break
+            end = self.buffer.find(b"\n", searched)
+        line = self.buffer[self.position:end + 1]
+        self.position = end + 1
+        self.offset += len(line)
+        return line
+
+    def lineEnd(self, count, keep=True):
+        """Return the position in the buffer after the next lines, reading more of the file as needed
+           The line breaks are counted in windows of the buffer, only in the last one they are located.
+
+        Arguments:
+            count {int} -- number of lines
+
+        Keyword Arguments:
+            keep {bool} -- keep the lines in the buffer, otherwise the lines before the last window are consumed (default: {True})
+
+        Returns:
+            {int} -- position after the last line break, the end of the buffer at the end of the file
+        """
+        scanned = self.position
+        remaining = count
+        while remaining > 0:
+            end = min(scanned + max(16*remaining, 4096), len(self.buffer))
+            found = self.buffer.count(b"\n", scanned, end)
+            if found >= remaining:
+                breaks = np.flatnonzero(np.frombuffer(self.buffer, np.uint8, end - scanned, scanned) == 10)
+                return scanned + int(breaks[remaining - 1]) + 1
+            remaining -= found
+            scanned = end
+            if scanned == len(self.buffer):
+                if not keep:
+                    self.offset += scanned - self.position
+                    self.position = scanned
+                #Relative to the unread part, which starts the buffer after filling
+                scanned -= self.position
+                if not self.fill():
+                    return len(self.buffer)
+        return scanned
+
+    def readRaw(self, count):
+        """Read lines without decoding them
+
+        Arguments:
+            count {int} -- number of lines
+
+        Returns:
+            {bytes} -- the lines
+        """
+        end = self.lineEnd(count)
+        raw = self.buffer[self.position:end]
+        self.position = end
+        self.offset += len(raw)
+        return raw
+
+    def skipLines(self, count):
+        """Skip lines without keeping them in memory
+        """
+        end = self.lineEnd(count, keep=False)
+        self.offset += end - self.position
+        self.position = end
+
+
+class TimedLineReader(LineReader):
+    """LineReader adding the time of reading to the 'io' phase of parse statistics and counting lines and bytes
+       A subclass so the uninstrumented reader has no overhead per line
+    """
+
+    def __init__(self, file, stats):
+        super().__init__(file)
+        self.stats = stats
+
+    def fill(self):
+        previous = self.stats.switch('io')
+        numBytes = super().fill()
+        self.stats.switch(previous)
+        self.stats.bytesRead += numBytes
+        return numBytes
+
+    def nextRaw(self):
+        line = super().nextRaw()
+        self.stats.lines += 1
+        return line
+
+
+def openTimed(fileName, stats):
+    """Open a file for reading in binary mode, adding the time to the 'io' phase of the statistics if given
+    """
+    if stats is None:
+        return open(fileName, 'rb')
+    previous = stats.switch('io')
+    file = open(fileName, 'rb')
+    stats.switch(previous)
+    return file
 
-            for i in range(int(self.numYAxisValues/self.numYAxisVars)):
-                for j in range(self.numYAxisVars):
-                    variables[j].append(float(next(lines).strip()))
 
-            self.yAxisValuesList = variables
+class OrdinateLoader:
+    """Loads the ordinate values of a block read header-only from the recorded offset in the file
+    """
+    #One loader is kept per block until the values are needed
+    __slots__ = ('fileName', 'offset', 'numValues', 'numVars', 'blockNumber', 'useMmap', 'fileSize', 'fileTime')
+
+    def __init__(self, fileName, offset, numValues, numVars, blockNumber=1, useMmap=False, fileState=None):
+        self.fileName = fileName
+        self.offset = offset
+        self.numValues = numValues
+        self.numVars = numVars
+        self.blockNumber = blockNumber
+        self.useMmap = useMmap
+        #Detect changes of the file between reading the header and loading the values
+        if fileState is None:
+            stat = os.stat(fileName)
+            fileState = (stat.st_size, stat.st_mtime_ns)
+        self.fileSize, self.fileTime = fileState
+
+    def load(self):
+        """Read and convert the ordinate values
+
+        Returns:
+            {np.ndarray} -- 2-dim array with one row per corresponding variable
+        """
+        with open(self.fileName, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            if stat.st_size != self.fileSize or stat.st_mtime_ns != self.fileTime:
+                raise IOError("{0} changed after reading its header".format(self.fileName))
+            if self.useMmap:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as source:
+                    return self.readValues(source)
+            return self.readValues(file)
+
+    def readValues(self, source):
+        """Read the values from a file or mmap object
+        """
+        source.seek(self.offset)
+        raw = LineReader(source).readRaw(self.numValues)
+        return convertOrdinates(raw, self.numValues, self.numVars, self.blockNumber)
 
-            #Create x-values
-            self.xAxisValuesList = []
-            for i in range(int(self.numYAxisValues/self.numYAxisVars)):
-                self.xAxisValuesList.append(self.xAxisStart +  i*self.xAxisIncrement)
 
+def fingerprintKey(block):
+    """Return the fields identifying the measurement of a block, only blocks with equal keys can be duplicates
+       Numbers are converted to the type of their field and lists to tuples, so a dataclass and a VamasRow
+       of the same block give equal keys.
+
+    Arguments:
+        block {VAMAS_File} -- VAMAS_File or VamasRow
+
+    Returns:
+        {tuple} -- hashable values of fingerprintFields
+    """
+    key = list()
+    for name in fingerprintFields:
+        value = getattr(block, name)
+        if isinstance(value, list):
+            value = tuple(value)
+        elif fieldTypes[name] in (int, float):
+            value = fieldTypes[name](value)
+        key.append(value)
+    return tuple(key)
+
+
+def blockFingerprint(block, values):
+    """Return the fingerprint of a block: the hash of its ordinate values completed with the fields identifying the measurement
+
+    Arguments:
+        block {VAMAS_File} -- VAMAS_File or VamasRow
+        values {np.ndarray} -- ordinate values of the block
+
+    Returns:
+        {str} -- hexadecimal fingerprint
+    """
+    digest = hashlib.blake2b(np.ascontiguousarray(values, dtype=float), digest_size=16)
+    digest.update(repr(fingerprintKey(block)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+#Characters of ordinate values written as integers
+integerCharacters = b"0123456789-+ \t\r\n"
+
+
+def convertOrdinates(raw, numValues, numVars, blockNumber=1):
+    """Convert the data section of a block at once, the values of the variables are interleaved
+
+    Arguments:
+        raw {bytes} -- the lines containing the ordinate values
+        numValues {int} -- total number of values
+        numVars {int} -- number of corresponding variables
+
+    Keyword Arguments:
+        blockNumber {int} -- block number for the error message (default: {1})
+
+    Returns:
+        {np.ndarray} -- 2-dim array with one row per corresponding variable
+    """
+    if not raw.translate(None, integerCharacters):
+        #Counts written as integers are converted a lot faster
+        values = np.fromstring(raw, dtype=np.int64, sep=" ").astype(float)
+    else:
+        values = np.fromstring(raw, sep=" ")
+    if len(values) != numValues:
+        raise ValueError("Expected {0} ordinate values in block {1}, found {2}".format(numValues, blockNumber, len(values)))
+    return np.ascontiguousarray(values.reshape(int(numValues/numVars), numVars).T)
+
+
+#Experiment modes with number of spectral regions in header
+normalModes = ['MAP', 'MAPDP', 'NORM', 'SDP']
+#Experiment modes with map coordinates
+mappingModes = ['MAP', 'MAPDP']
+#Experiment modes and techniques with sputtering parameters
+sputteringModes = ['MAPDP', 'MAPSVDP', 'SDP', 'SDPSV']
+sputteringTechs = ['FABMS', 'FABMS energy spec', 'ISS', 'SIMS', 'SIMS energy spec', 'SNMS', 'SNMS energy spec']
+#Techniques with sputtering source parameters in depth profiling modes
+sputteringCoTechs = ['AES diff', 'AES dir', 'EDX', 'ELS', 'UPS', 'XPS', 'XRF']
+
+#Dataclass fields of the block parameters by prefix number used in the parameter inclusion or exclusion list
+blockParameterFields = {
+    1: [], 2: [], 3: [], 4: [], 5: [], 6: [], #Date, handled by readBlock
+    7: ["timeZone"],
+    8: ["numBlockCommentLines", "blockComment", "analyserAperture", "xrayVoltage", "xrayPower", "xrayEmCurr",
+        "xrayFilCurr", "xrayLeakCurr", "sampleStageX", "sampleStageY", "sampleStageZ", "sampleStageTheta",
+        "sampleStagePhi", "analyserExitSlit"],
+    9: ["technique"],
+    10: ["xCoord", "yCoord"],
+    11: ["expVariablesList"],
+    12: ["AnalysisSourceLabel"],
+    13: ["sputteringIonAtomicNum", "numAtomsSputteringIon", "sputteringIonCharge"],
+    14: ["analysisSourceEnergy"],
+    15: ["analyisSourceStrength"],
+    16: ["analysisSourceBeamWidthX", "analysisSourceBeamWidthY"],
+    17: ["fieldOfViewX", "fieldOfViewY"],
+    18: ["firstLineScanStartXCoord", "firstLineScanStartYCoord", "firstLineScanFinishXCoord",
+         "firstLineScanFinishYCoord", "lastLineScanFinishXCoord", "lastLineScanFinishYCoord"],
+    19: ["analysisSourceAngleOfIncidence"],
+    20: ["analysisSourceAzimuth"],
+    21: ["analyserMode"],
+    22: ["analyzerPEorRR"],
+    23: ["diffWidth"],
+    24: ["analyzerMagnification"],
+    25: ["analyzerWorkFunction"],
+    26: [], #Target bias is not stored in a field
+    27: ["analysisWidthX", "analysisWidthY"],
+    28: ["analysisTakeOffAngle", "analysisTakeoffAzimuth"],
+    29: ["speciesLabel"],
+    30: ["transitionLabel", "detectedParticleCharge"],
+    31: ["xAxisLabel", "xAxisUnit", "xAxisStart", "xAxisIncrement"],
+    32: ["numYAxisVars", "yAxisVarsLabelList", "yAxisVarsUnitList"],
+    33: ["signalMode"],
+    34: ["dwellTime"],
+    35: ["numSweeps"],
+    36: ["signalTimeCorr"],
+    37: ["sputteringSourceEnergy", "sputteringSourceBeamCurrent", "sputteringSourceWidthX", "sputteringSourceWidthY",
+         "sputteringSourceAngleOfIncidence", "sputteringSourceAzimuth", "sputteringMode"],
+    38: ["sampleNormalTiltAngle", "sampleNormalTiltAzimuth"],
+    39: ["sampleRotationAngle"],
+    40: ["numAddNumParams", "addParamsLabelList", "addParamUnitList", "addParamValueList"],
+}
+
+
+class CommentExtractor:
+    """Extracts <keyword>: <value> or <keyword>=<value> parameters from a comment in a single pass
+       All keywords are combined into one precompiled regular expression, the matches are
+       removed from the comment while joining the residual text once.
+       Numeric values are any number format with DECIMAL POINT (e.g., 23, 6e23. -0.1E-23, etc.) followed by an optional unit,
+       string values are terminated by NEWLINE. Keywords are case-insensitive.
+    """
+
+    def __init__(self, parameters, strings):
+        """Compile the regular expression for the keywords
+
+        Arguments:
+            parameters {dict} -- keyword of numeric parameter: list of field names for 1st, 2nd... occurrence
+            strings {dict} -- keyword of string parameter: list of field names for 1st, 2nd... occurrence
+        """
+        self.fieldNames = {keyword.lower(): names for keyword, names in {**parameters, **strings}.items()}
+        #Keywords as written by compose()
+        self.keywords = {**parameters, **strings}
+        self.strings = set(strings)
+        self.numFields = sum(len(names) for names in self.fieldNames.values())
+        #Longest keywords first, so that e.g. "FilterDeg" is not taken for "Filter"
+        alternatives = lambda keywords: "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+        initials = "".join(sorted({re.escape(k[0]) for k in self.fieldNames}))
+        self.regex = re.compile(r"""
+            \s                          #Whitespace before keyword, the comment is scanned with a leading newline
+            (?=[{}])                    #Quick check of the first character of all keywords
+            (?:                         #Either a numeric parameter
+            (?P<parameter>{})           #Numeric keywords inserted by .format()
+            (?::|\ ?=)?\ ?              #Optional ":" or space + "=", optional space
+            (?P<number>                 #Start of capturing group which will contain the parsed number
+            -?\ ?                       #Optional minus + optional space
+            [0-9]+\.?[0-9]*             #One or more numbers + optional decimal point + numbers
+            (?:[Ee]\ ?[-+]?\ ?[0-9]+)?   #Optional scientific exponent
+            )                           #End of capturing group
+            \ ?(?:[A-Z°]+)?             #Optional Space and unit
+            |                           #or a string parameter
+            (?P<string>{})              #String keywords inserted by .format()
+            (?::|\ ?=)?\ ?              #Optional ":" or space + "=", optional space
+            (?P<text>.*)$               #Any String until end of line
+            )
+        """.format(initials, alternatives(parameters) or "(?!)", alternatives(strings) or "(?!)"), re.VERBOSE|re.IGNORECASE|re.MULTILINE)
+
+    def extract(self, comment):
+        """Scan the comment once for all keywords
+
+        Arguments:
+            comment {str} -- the comment string
+
+        Returns:
+            [dict, str] -- field name: value (float for numeric, str for string parameters), residual comment
+        """
+        values = dict()
+        occurrences = dict()
+        residual = list()
+        #The leading newline replaces <Start of string> and lets the regex skip quickly to whitespace
+        #It is not part of the residual comment
+        text = "\n" + comment
+        position = 1
+        remaining = self.numFields
+        for match in self.regex.finditer(text):
+            parameter, number, string, value = match.group('parameter', 'number', 'string', 'text')
+            keyword = (parameter or string).lower()
+            names = self.fieldNames[keyword]
+            count = occurrences.get(keyword, 0)
+            if count >= len(names):
+                #Further occurrences stay in the comment
+                continue
+            occurrences[keyword] = count + 1
+            values[names[count]] = value if parameter is None else float(number.replace(" ", ""))
+            start, end = match.span()
+            residual.append(text[position:start])
+            position = end
+            remaining -= 1
+            if remaining == 0:
+                #All fields found, no need to scan the rest
+                break
+        residual.append(text[position:])
+        return values, "".join(residual)
+
+    def compose(self, getValue, residual):
+        """Return the comment lines for field values, which extract() takes from the comment again
+           A keyword is written if one of its fields is set or if the residual comment contains it,
+           so that the values extracted are those of the fields and not of the residual text.
+
+        Arguments:
+            getValue {function} -- returns the value of a field name
+            residual {str} -- comment following the lines
+
+        Returns:
+            {list} -- lines "<keyword>: <value>"
+        """
+        inResidual = self.extract(residual)[0]
+        lines = list()
+        for keyword, names in self.keywords.items():
+            count = len(names) if any(name in inResidual for name in names) else 0
+            for i, name in enumerate(names):
+                value = getValue(name)
+                if value and (keyword in self.strings or math.isfinite(value)):
+                    count = max(count, i + 1)
+            for name in names[:count]:
+                value = getValue(name)
+                lines.append("{0}: {1}".format(keyword, value if keyword in self.strings else repr(float(value))))
+        return lines
+
+
+#Parameters saved by Omicron MATRIX in the comment: keyword: fields for the 1st, 2nd... occurrence
+commentExtractor = CommentExtractor(
+    parameters={
+        "SourceAnalyserAngle": ["commentSourceAnalyzerAngle"],
+        "pIG": ["commentpIG"],
+        "pPIR": ["commentpPir"],
+        "pHIS": ["commentpHIS"],
+        "VHIS": ["commentVHIS", "commentVHISstart"],
+        "WHIS": ["commentWHIS"],
+        "Filter": ["commentUPSFilterNr"],
+        "FilterDeg": ["commentUPSFilterAngle"],
+        "Bias": ["commentSampleBias"],
+    },
+    strings={
+        "Created with": ["commentCreatedWith"],
+        "Date of Acquisition": ["commentAcquisition"],
+    })
+
+#Parameters saved by Omicron MATRIX in the block comment
+blockCommentExtractor = CommentExtractor(
+    parameters={
+        "Aperture": ["analyserAperture"],
+        #X-Ray source parameters
+        "X-Ray Source Voltage": ["xrayVoltage"],
+        "X-Ray Source Power": ["xrayPower"],
+        "X-Ray Source Emission Current": ["xrayEmCurr"],
+        "X-Ray Source Filament Current": ["xrayFilCurr"],
+        "X-Ray Source Leak Current": ["xrayLeakCurr"],
+        #Sample stage parameters
+        "Sample Position X": ["sampleStageX"],
+        "Sample Position Y": ["sampleStageY"],
+        "Sample Position Z": ["sampleStageZ"],
+        "Sample Position Theta": ["sampleStageTheta"],
+        "Sample Position Phi": ["sampleStagePhi"],
+    },
+    strings={
+        "Exit Slit": ["analyserExitSlit"],
+    })
 
 
 def parseParameter(comment, keyword):
@@ -602,11 +1342,23 @@ def parseParameter(comment, keyword):
     Returns:
         [str, str, str] -- result, unit_string residual comment
     """
+    #Scan forward through the comment for the first match
+    result = parameterRegex(keyword).search(comment) 
+    if result:
+        #Return tuple with capturing-group and comment with removed match
+        return result.group(1), result.group(2), comment.replace(result.group(0), "")
+    else:
+        return "", "", comment
+
 
+@lru_cache(maxsize=None)
+def parameterRegex(keyword):
+    """Compiled regular expression for parseParameter, cached per keyword
+    """
     #Escape spaces in keyword!
     keyword = keyword.replace(" ", r"\ ")
 
-    regex = re.compile(r"""
+    return re.compile(r"""
         (?:                     #Start of non-capturing group
         (?:\s|\A)               #non-capturing group: Whitespace or <Start of string> before keyword!
         {}                      #Keyword inserted by .format()
@@ -625,13 +1377,6 @@ def parseParameter(comment, keyword):
         )?                      #End of optional capturing group
                         
     """.format(keyword), re.VERBOSE|re.IGNORECASE)
-    #Scan forward through the comment for the first match
-    result = regex.search(comment) 
-    if result:
-        #Return tuple with capturing-group and comment with removed match
-        return result.group(1), result.group(2), comment.replace(result.group(0), "")
-    else:
-        return "", "", comment
 
 
 def parseString(comment, keyword):
@@ -647,11 +1392,23 @@ def parseString(comment, keyword):
     Returns:
         [str, str] -- result, residual comment
     """
+    #Scan forward through the comment for the first match
+    result = stringRegex(keyword).search(comment) 
+    if result:
+        #Return tuple with capturing-group and comment with removed match
+        return result.group(1), comment.replace(result.group(0), "")
+    else:
+        return "", comment        
+
 
+@lru_cache(maxsize=None)
+def stringRegex(keyword):
+    """Compiled regular expression for parseString, cached per keyword
+    """
     #Escape spaces in keyword!
     keyword = keyword.replace(" ", r"\ ")
 
-    regex = re.compile(r"""
+    return re.compile(r"""
         (?:                     #Start of non-capturing group
         (?:\s|\A)               #non-capturing group: Whitespace or <Start of string> before keyword!
         {}                      #Keyword inserted by .format()
@@ -663,23 +1420,19 @@ def parseString(comment, keyword):
         $                       #End of line                     
                         
     """.format(keyword), re.VERBOSE|re.IGNORECASE|re.MULTILINE)
-    #Scan forward through the comment for the first match
-    result = regex.search(comment) 
-    if result:
-        #Return tuple with capturing-group and comment with removed match
-        return result.group(1), comment.replace(result.group(0), "")
-    else:
-        return "", comment        
 
 
 if __name__ == "__main__":
-    vms = VAMAS_File(fileName="test.vms")
-    vms.readVamasFile()
-    print(vms.fileName)
-    print(vms.comment)
-    print(vms.date)
-    print(vms.blockComment)
-    print(vms.xrayVoltage)
-    print(vms.analyserAperture)
-    print(vms.analyserSettingStr)
-    
+    parser = argparse.ArgumentParser(description="Print the header and some parameters of each block of a VAMAS file")
+    parser.add_argument("fileName", help=".vms file")
+    args = parser.parse_args()
+
+    vms = VAMAS_File(fileName=args.fileName)
+    for block in vms.iterBlocks(headerOnly=True):
+        print(block.fileName, block.blockNumber)
+        print(block.comment)
+        print(block.date)
+        print(block.blockComment)
+        print(block.xrayVoltage)
+        print(block.analyserAperture)
+        print(block.analyserSettingStr)
@@ -0,0 +1,100 @@
+from dataclasses import dataclass, field
+import os
+import time
+
+#Set to 1 to collect parse statistics in the GUI, the converter and the loader
+statsVariable = "VAMAS_PARSE_STATS"
+
+#Phases of parsing in the order of the summary
+phases = ("io", "header", "comment", "blockParameters", "ordinates", "cache", "other")
+
+
+def statsEnabled():
+    """Return if the parse statistics are switched on by the environment variable
+    """
+    return os.environ.get(statsVariable, "") not in ("", "0")
+
+
+@dataclass
+class ParseStats:
+    """Wall time per parsing phase, bytes read and object counts of one or more parsed VAMAS files
+       The parser switches between the phases, the time since the last switch is added to the previous phase,
+       so the phases do not overlap: 'io' is reading lines from the file, 'comment' the metadata extraction
+       from the comments, 'ordinates' converting the values and 'other' everything between.
+       Ordinate values of header-only reads are loaded later and not included.
+    """
+    seconds:dict = field(default_factory=lambda: dict.fromkeys(phases, 0.0))
+    files:int = 0
+    cachedFiles:int = 0 #Files taken from the persistent cache, not parsed
+    blocks:int = 0
+    lines:int = 0 #Decoded lines
+    bytesRead:int = 0
+    values:int = 0 #Converted ordinate values
+    arrayBytes:int = 0 #Size of the created ordinate arrays
+    phase:str = field(default="other", repr=False)
+    phaseStart:float = field(default=0.0, repr=False)
+
+    def start(self, phase="other"):
+        """Start timing with the given phase
+        """
+        self.phase = phase
+        self.phaseStart = time.perf_counter()
+
+    def switch(self, phase):
+        """Add the time since the last switch to the current phase and continue with another one
+
+        Arguments:
+            phase {str} -- the next phase
+
+        Returns:
+            {str} -- the previous phase, to switch back after a nested phase
+        """
+        now = time.perf_counter()
+        self.seconds[self.phase] += now - self.phaseStart
+        previous = self.phase
+        self.phase = phase
+        self.phaseStart = now
+        return previous
+
+    def stop(self):
+        """Add the time of the current phase
+        """
+        self.switch("other")
+
+    def add(self, other):
+        """Add the statistics of other files, e.g. parsed by a worker process
+
+        Arguments:
+            other {ParseStats} -- statistics to add
+        """
+        for phase, seconds in other.seconds.items():
+            self.seconds[phase] = self.seconds.get(phase, 0.0) + seconds
+        for name in ("files", "cachedFiles", "blocks", "lines", "bytesRead", "values", "arrayBytes"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def totalSeconds(self):
+        return sum(self.seconds.values())
+
+    def summary(self, oneLine=False):
+        """Return the statistics as text
+
+        Keyword Arguments:
+            oneLine {bool} -- only totals and the slowest phase, e.g. for a status bar (default: {False})
+
+        Returns:
+            {str} -- the text
+        """
+        total = self.totalSeconds()
+        text = "{0} files ({1} cached), {2} blocks, {3:.1f} MB in {4:.2f} s parse time".format(
+            self.files, self.cachedFiles, self.blocks, self.bytesRead/2**20, total)
+        if total <= 0:
+            return text
+        if oneLine:
+            slowest = max(self.seconds, key=self.seconds.get)
+            return text + ", {0:.0f}% {1}".format(100*self.seconds[slowest]/total, slowest)
+        lines = [text]
+        for phase, seconds in self.seconds.items():
+            lines.append("  {0:<16} {1:8.3f} s {2:5.1f}%".format(phase, seconds, 100*seconds/total))
+        lines.append("  {0} lines, {1} values, {2:.1f} MB of arrays, {3:.1f} MB/s".format(
+            self.lines, self.values, self.arrayBytes/2**20, self.bytesRead/2**20/total))
+        return "\n".join(lines)
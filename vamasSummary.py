@@ -0,0 +1,214 @@
+from datetime import datetime
+import numpy as np
+from vamasSimple import fieldTypes
+
+
+class SummaryIndex:
+    """Typed sort keys and filter indexes for the blocks of a VamasCollection
+       The keys of a block are computed once when it is added: numbers and dates sort by value,
+       text case-insensitively. Filtering by sample name only tests the distinct names,
+       technique is looked up, date and pass energy ranges are searched in the sorted values.
+       Call update() after blocks were appended and updateBlocks() after blocks changed.
+    """
+
+    def __init__(self, collection):
+        """
+        Arguments:
+            collection {VamasCollection} -- the blocks
+        """
+        self.collection = collection
+        #Field name: array of the sort key of each block, computed on first use
+        self.keys = dict()
+        #Distinct casefolded sample names and techniques: list of block indices
+        self.sampleIndex = dict()
+        self.techniqueIndex = dict()
+        #Field name: (sorted values, block indices in this order) for range filters, removed when outdated
+        self.sortedValues = dict()
+        #Number of blocks in the indexes
+        self.numBlocks = 0
+        #Last sample name filter and the names matching it, narrowed while typing
+        self.lastSampleText = None
+        self.lastSampleNames = list()
+        self.update()
+
+    @staticmethod
+    def sortKey(name, value):
+        """Return the sort key of a field value
+
+        Arguments:
+            name {str} -- field name
+            value {object} -- value of the field
+
+        Returns:
+            {object} -- number for numbers and dates, casefolded text otherwise
+        """
+        fieldType = fieldTypes[name]
+        if fieldType in (int, float):
+            return value
+        if fieldType is datetime:
+            return value.timestamp()
+        return str(value).casefold()
+
+    def keyArray(self, name, values):
+        """Return the sort keys of values of a field as array
+        """
+        keys = [self.sortKey(name, value) for value in values]
+        if fieldTypes[name] in (int, float, datetime):
+            return np.array(keys, dtype=float)
+        #Object array so a longer edited text is stored whole
+        return np.array(keys, dtype=object)
+
+    def update(self):
+        """Add the blocks appended to the collection since the last update to the keys and indexes
+        """
+        numBlocks = len(self.collection)
+        if numBlocks < self.numBlocks:
+            #Blocks were removed or the collection was replaced
+            self.keys.clear()
+            self.sampleIndex.clear()
+            self.techniqueIndex.clear()
+            self.numBlocks = 0
+        if numBlocks == self.numBlocks:
+            return
+        newBlocks = range(self.numBlocks, numBlocks)
+        for name in list(self.keys):
+            self.keys[name] = np.concatenate((self.keys[name], self.keyArray(name, (self.collection.getValue(index, name) for index in newBlocks))))
+        for index in newBlocks:
+            self.sampleIndex.setdefault(self.collection.getValue(index, 'sampleName').casefold(), []).append(index)
+            self.techniqueIndex.setdefault(self.collection.getValue(index, 'technique'), []).append(index)
+        self.numBlocks = numBlocks
+        self.sortedValues.clear()
+        #New names may match
+        self.lastSampleText = None
+
+    def updateBlocks(self, indices, names=None):
+        """Update the keys and indexes of changed blocks
+
+        Arguments:
+            indices {iterable} -- block indices
+
+        Keyword Arguments:
+            names {iterable} -- changed fields, None for all (default: {None})
+        """
+        names = set(fieldTypes if names is None else names)
+        for index in indices:
+            if index >= self.numBlocks:
+                continue
+            for name in names & set(self.keys):
+                self.keys[name][index] = self.sortKey(name, self.collection.getValue(index, name))
+            for name, fieldIndex in (('sampleName', self.sampleIndex), ('technique', self.techniqueIndex)):
+                if name in names:
+                    value = self.collection.getValue(index, name)
+                    key = value.casefold() if name == 'sampleName' else value
+                    for blocks in fieldIndex.values():
+                        if index in blocks:
+                            blocks.remove(index)
+                    fieldIndex.setdefault(key, []).append(index)
+            for name in names & set(self.sortedValues):
+                del self.sortedValues[name]
+        self.lastSampleText = None
+
+    def getKeys(self, name):
+        """Return the sort keys of a field for all blocks
+
+        Arguments:
+            name {str} -- field name
+
+        Returns:
+            {np.ndarray} -- key of each block
+        """
+        if name not in self.keys:
+            self.keys[name] = self.keyArray(name, (self.collection.getValue(index, name) for index in range(self.numBlocks)))
+        return self.keys[name]
+
+    def sortOrder(self, name, descending=False):
+        """Return the block indices sorted by a field, equal values keep the order of the blocks
+
+        Arguments:
+            name {str} -- field name
+
+        Keyword Arguments:
+            descending {bool} -- largest values first (default: {False})
+
+        Returns:
+            {np.ndarray} -- block indices
+        """
+        keys = self.getKeys(name)
+        if descending:
+            #Reverse the stable ascending order of the reversed blocks to keep equal values in block order
+            return (len(keys) - 1 - np.argsort(keys[::-1], kind='stable'))[::-1]
+        return np.argsort(keys, kind='stable')
+
+    def distinctTechniques(self):
+        """Return the techniques of the blocks
+        """
+        return sorted(technique for technique, indices in self.techniqueIndex.items() if indices)
+
+    def sampleMatches(self, text):
+        """Return the blocks with a sample name containing the text, case-insensitive
+           When the text extends the previous text only the names matching it are tested again.
+
+        Arguments:
+            text {str} -- part of the sample name
+
+        Returns:
+            {list} -- block indices
+        """
+        text = text.casefold()
+        if self.lastSampleText is not None and self.lastSampleText in text:
+            candidates = self.lastSampleNames
+        else:
+            candidates = self.sampleIndex.keys()
+        names = [name for name in candidates if text in name]
+        self.lastSampleText = text
+        self.lastSampleNames = names
+        return [index for name in names for index in self.sampleIndex[name]]
+
+    def rangeMatches(self, name, minimum=None, maximum=None):
+        """Return the blocks with a numeric or date field within a range
+
+        Arguments:
+            name {str} -- field name
+
+        Keyword Arguments:
+            minimum {float} -- lowest value, dates as datetime, None for no limit (default: {None})
+            maximum {float} -- highest value, dates as datetime, None for no limit (default: {None})
+
+        Returns:
+            {np.ndarray} -- block indices
+        """
+        if name not in self.sortedValues:
+            order = self.sortOrder(name)
+            self.sortedValues[name] = (self.getKeys(name)[order], order)
+        values, order = self.sortedValues[name]
+        first = 0 if minimum is None else np.searchsorted(values, self.sortKey(name, minimum), 'left')
+        last = len(values) if maximum is None else np.searchsorted(values, self.sortKey(name, maximum), 'right')
+        return order[first:last]
+
+    def filterMask(self, sampleText="", technique="", dateRange=(None, None), passEnergyRange=(None, None)):
+        """Return which blocks pass all filters
+
+        Keyword Arguments:
+            sampleText {str} -- part of the sample name, empty for all (default: {""})
+            technique {str} -- technique, empty for all (default: {""})
+            dateRange {tuple} -- first and last datetime, None for no limit (default: {(None, None)})
+            passEnergyRange {tuple} -- lowest and highest pass energy or retard ratio, None for no limit (default: {(None, None)})
+
+        Returns:
+            {np.ndarray} -- bool for each block
+        """
+        mask = np.ones(self.numBlocks, dtype=bool)
+        selections = list()
+        if sampleText:
+            selections.append(self.sampleMatches(sampleText))
+        if technique:
+            selections.append(self.techniqueIndex.get(technique, []))
+        if dateRange != (None, None):
+            selections.append(self.rangeMatches('date', *dateRange))
+        if passEnergyRange != (None, None):
+            selections.append(self.rangeMatches('analyzerPEorRR', *passEnergyRange))
+        for selection in selections:
+            selected = np.zeros(self.numBlocks, dtype=bool)
+            selected[np.asarray(selection, dtype=np.intp)] = True
+            mask &= selected
+        return mask
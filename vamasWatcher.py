@@ -0,0 +1,83 @@
+import os
+import time
+from vamasFiles import findVamasFiles, fileState
+
+
+class FolderWatcher:
+    """Polls a folder for new and changed VAMAS files, e.g. written by the instrument during an acquisition
+       A file is reported once it is fully written: its size and modification time did not change
+       between two scans and it was not modified for settleTime seconds.
+       Reported files are reported again only when they change afterwards.
+       Needs no PyQt, the GUI calls scan() in a background thread started by a timer, as walking the folder and
+       reading the state of every file can take long for large folders or network drives.
+       cancel() stops a running scan.
+    """
+    #Seconds a file must not be modified before it is parsed
+    settleTime = 2.0
+
+    def __init__(self, folder, knownFiles=()):
+        """
+        Arguments:
+            folder {str} -- folder to watch, searched recursively
+
+        Keyword Arguments:
+            knownFiles {iterable} -- paths of files already loaded, reported only when they change (default: {()})
+        """
+        self.folder = os.path.abspath(folder)
+        #Path: state at the last scan, of files not reported yet
+        self.pendingStates = dict()
+        #Path: state when reported
+        self.reportedStates = dict()
+        #Normalized paths of the known files, their states are read by the first scan
+        self.knownFiles = {self.normalizePath(fileName) for fileName in knownFiles}
+        self.cancelled = False
+
+    @staticmethod
+    def normalizePath(fileName):
+        """Return a path for comparing file names of the model and of the folder
+        """
+        return os.path.normcase(os.path.abspath(fileName))
+
+    def cancel(self):
+        """Stop scanning, the running and all later scans report no files
+           Can be called from another thread
+        """
+        self.cancelled = True
+
+    def scan(self):
+        """Return the files which are new or changed since they were reported and are fully written
+
+        Returns:
+            {tuple} -- list of new files, list of changed files, both empty if cancelled
+        """
+        now = time.time()
+        newFiles = list()
+        changedFiles = list()
+        try:
+            fileNames = findVamasFiles([self.folder], cancelled=lambda: self.cancelled)
+        except OSError as e:
+            print("Failed scanning {0}: {1}".format(self.folder, e))
+            return newFiles, changedFiles
+        for fileName in fileNames:
+            if self.cancelled:
+                return list(), list()
+            try:
+                state = fileState(fileName)
+            except OSError:
+                #Deleted or renamed meanwhile
+                continue
+            if self.knownFiles is not None and self.normalizePath(fileName) in self.knownFiles:
+                self.reportedStates[fileName] = state
+                continue
+            if self.reportedStates.get(fileName) == state:
+                continue
+            previousState = self.pendingStates.get(fileName)
+            self.pendingStates[fileName] = state
+            #st_mtime_ns of the state
+            if state != previousState or now - state[1]/1e9 < self.settleTime:
+                continue
+            del self.pendingStates[fileName]
+            (changedFiles if fileName in self.reportedStates else newFiles).append(fileName)
+            self.reportedStates[fileName] = state
+        self.knownFiles = None
+        return newFiles, changedFiles
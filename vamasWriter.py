@@ -0,0 +1,281 @@
+"""Writer of VAMAS files, the counterpart of VAMAS_File.readVamasFile() and iterBlocks()
+
+The experiment header is taken from the first block. Every block is written with all of its parameters,
+the parameter inclusion list of the header is written empty. Parameters the parser extracts from the
+comments are written back into them as "<keyword>: <value>" lines, so reading a written file gives the same
+dataclass fields. The blocks are streamed: each one is written when it is passed and the ordinate values are
+converted in chunks, the text of the file is never held in memory.
+"""
+import os
+import numpy as np
+from vamasSimple import (VAMAS_File, fieldTypes, valueFields, commentExtractor, blockCommentExtractor, normalModes,
+                         mappingModes, sputteringModes, sputteringTechs, sputteringCoTechs)
+
+#Ordinate values converted to text at once
+chunkSize = 65536
+#Fields describing the layout of the file rather than the data and the ranges of the ordinate values,
+#which are computed from the values when writing, may differ after writing
+layoutFields = ("fileName", "numBlocks", "numCommentLines", "numBlockCommentLines", "lenParamExclusionInclusionList",
+                "paramExclusionInclusionPrefix", "dataOffset", "minYAxisValuesList", "maxYAxisValuesList")
+#Float fields read as integers by the parser
+integerFields = ("xCoord", "yCoord", "firstLineScanStartXCoord", "firstLineScanStartYCoord", "firstLineScanFinishXCoord",
+                 "firstLineScanFinishYCoord", "lastLineScanFinishXCoord", "lastLineScanFinishYCoord")
+
+
+def formatValue(value, valueType=float):
+    """Return the text of a parameter value read back unchanged by the parser
+    """
+    if valueType is int:
+        return str(int(value))
+    if valueType is float:
+        return repr(float(value))
+    return str(value)
+
+
+class VamasWriter:
+    """Writes blocks one by one into a VAMAS file
+       The file is written to a temporary file which replaces the file when all blocks were written.
+
+        with VamasWriter(fileName, len(blocks)) as writer:
+            for block in blocks:
+                writer.writeBlock(block)
+    """
+
+    def __init__(self, fileName, numBlocks):
+        """
+        Arguments:
+            fileName {str} -- path of the VAMAS file
+            numBlocks {int} -- number of blocks which will be written
+        """
+        self.fileName = fileName
+        self.numBlocks = numBlocks
+        self.temporary = fileName + ".tmp"
+        self.file = open(self.temporary, 'wb')
+        #First block, holding the header of the file
+        self.header = None
+        self.blockCount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if excType is None:
+            self.close()
+        else:
+            self.discard()
+
+    def writeLines(self, lines):
+        self.file.write(("\r\n".join(lines) + "\r\n").encode('cp1252', errors='replace'))
+
+    def writeHeader(self, block):
+        """Write the experiment header from the fields of a block
+        """
+        lines = [block.formatName, block.institutionName, block.instrumentModelName, block.operatorName, block.experimentName]
+        comment = commentLines(block.comment, commentExtractor, lambda name: getattr(block, name))
+        lines += [str(len(comment))] + comment
+        lines += [block.expMode, block.scanMode]
+        if block.expMode in normalModes:
+            lines.append(formatValue(block.numSpectralRegions, int))
+        if block.expMode in mappingModes:
+            lines += [formatValue(value, int) for value in (block.numAnalysisPositions, block.numDiscreteXCoordFullMap, block.numDiscreteYCoordFullMap)]
+        lines.append(formatValue(block.numExpVariables, int))
+        for label, unit in zip(block.expVariableLabels, block.expVariableUnits):
+            lines += [label, unit]
+        #All parameters are written in every block
+        lines.append("0")
+        lines.append(formatValue(block.numManuallyBlockItems, int))
+        lines += [formatValue(prefix, int) for prefix in block.numManuallyBlockItemsPrefix]
+        lines.append(formatValue(len(block.futureExpEntriesList), int))
+        lines.append(formatValue(block.numFutureBlockEntries, int))
+        lines += block.futureExpEntriesList
+        lines.append(formatValue(self.numBlocks, int))
+        self.writeLines(lines)
+
+    def checkBlock(self, block):
+        """Raise a ValueError if the block cannot be written with the header of the first block
+        """
+        header = self.header
+        for name in ("expMode", "scanMode", "numExpVariables", "numFutureBlockEntries"):
+            if getattr(block, name) != getattr(header, name):
+                raise ValueError("Block {0} has {1} {2}, the file {3}".format(self.blockCount + 1, name, getattr(block, name), getattr(header, name)))
+        if len(block.expVariablesList) != header.numExpVariables:
+            raise ValueError("Block {0} has {1} experimental variables, the file {2}".format(
+                self.blockCount + 1, len(block.expVariablesList), header.numExpVariables))
+
+    def writeBlock(self, block):
+        """Write the next block
+
+        Arguments:
+            block {VAMAS_File} -- VAMAS_File or VamasRow, the header is taken from the first block
+
+        Raises:
+            ValueError: if more blocks are written than given or the block does not fit the header
+        """
+        if self.blockCount >= self.numBlocks:
+            raise ValueError("{0} has only {1} blocks".format(self.fileName, self.numBlocks))
+        if self.header is None:
+            self.header = block
+            self.writeHeader(block)
+        self.checkBlock(block)
+        get = lambda name: getattr(block, name)
+        expMode, technique = block.expMode, block.technique
+        date = block.date
+        yValues = np.asarray(block.yAxisValuesList, dtype=float)
+        numVars = yValues.shape[0] if yValues.size else block.numYAxisVars
+        if yValues.size and (len(block.yAxisVarsLabelList) != numVars or len(block.yAxisVarsUnitList) != numVars):
+            raise ValueError("Block {0} has {1} corresponding variables and {2} labels".format(self.blockCount + 1, numVars, len(block.yAxisVarsLabelList)))
+
+        lines = [block.blockName, block.sampleName + ("." + block.posName if block.posName else "")]
+        lines += [str(value) for value in (date.year, date.month, date.day, date.hour, date.minute, date.second)]
+        lines.append(formatValue(block.timeZone, int))
+        comment = commentLines(block.blockComment, blockCommentExtractor, get)
+        lines += [str(len(comment))] + comment
+        lines.append(technique)
+        if expMode in mappingModes:
+            lines += [formatValue(block.xCoord, int), formatValue(block.yCoord, int)]
+        lines += [formatValue(value) for value in block.expVariablesList]
+        lines.append(block.AnalysisSourceLabel)
+        if expMode in sputteringModes or technique in sputteringTechs:
+            lines += formatFields(get, "sputteringIonAtomicNum", "numAtomsSputteringIon", "sputteringIonCharge")
+        lines += formatFields(get, "analysisSourceEnergy", "analyisSourceStrength", "analysisSourceBeamWidthX", "analysisSourceBeamWidthY")
+        if expMode in ('MAP', 'MAPDP', 'MAPSV', 'MAPSVDP', 'SEM'):
+            lines += formatFields(get, "fieldOfViewX", "fieldOfViewY")
+        if expMode in ('MAPSV', 'MAPSVDP', 'SEM'):
+            lines += formatFields(get, "firstLineScanStartXCoord", "firstLineScanStartYCoord", "firstLineScanFinishXCoord",
+                                  "firstLineScanFinishYCoord", "lastLineScanFinishXCoord", "lastLineScanFinishYCoord")
+        lines += formatFields(get, "analysisSourceAngleOfIncidence", "analysisSourceAzimuth", "analyserMode", "analyzerPEorRR")
+        if technique == 'AES diff':
+            lines += formatFields(get, "diffWidth")
+        lines += formatFields(get, "analyzerMagnification", "analyzerWorkFunction")
+        #Target bias is not a field, kept as attribute of parsed blocks only
+        lines.append(formatValue(getattr(block, 'targetBias', 0)))
+        lines += formatFields(get, "analysisWidthX", "analysisWidthY", "analysisTakeOffAngle", "analysisTakeoffAzimuth",
+                              "speciesLabel", "transitionLabel", "detectedParticleCharge")
+        if block.scanMode == 'REGULAR':
+            lines += formatFields(get, "xAxisLabel", "xAxisUnit", "xAxisStart", "xAxisIncrement")
+        lines.append(formatValue(numVars, int))
+        for label, unit in zip(block.yAxisVarsLabelList, block.yAxisVarsUnitList):
+            lines += [label, unit]
+        lines += formatFields(get, "signalMode", "dwellTime", "numSweeps", "signalTimeCorr")
+        if technique in sputteringCoTechs and expMode in sputteringModes:
+            lines += formatFields(get, "sputteringSourceEnergy", "sputteringSourceBeamCurrent", "sputteringSourceWidthX", "sputteringSourceWidthY",
+                                  "sputteringSourceAngleOfIncidence", "sputteringSourceAzimuth", "sputteringMode")
+        lines += formatFields(get, "sampleNormalTiltAngle", "sampleNormalTiltAzimuth", "sampleRotationAngle")
+        lines.append(formatValue(len(block.addParamValueList), int))
+        for label, unit, value in zip(block.addParamsLabelList, block.addParamUnitList, block.addParamValueList):
+            lines += [label, unit, formatValue(value)]
+        lines += list(block.futureBlockEntriesList)
+        lines.append(formatValue(yValues.size, int))
+        if yValues.size:
+            for values in yValues:
+                lines += [formatValue(values.min()), formatValue(values.max())]
+        else:
+            lines += ["0", "0"]*numVars
+        self.writeLines(lines)
+        self.writeOrdinates(yValues)
+        self.blockCount += 1
+
+    def writeOrdinates(self, yValues):
+        """Write the ordinate values interleaved point by point in chunks, one value per line
+           Each chunk is formatted by one % operation. Chunks of whole numbers, e.g. counts, are written
+           as integers, which is twice as fast and also parsed faster, other values with %r, the shortest
+           text of a float which is read back to the same value.
+        """
+        values = yValues.T.ravel()
+        for start in range(0, len(values), chunkSize):
+            chunk = values[start:start + chunkSize]
+            if wholeNumbers(chunk):
+                text = ("%d\r\n"*len(chunk)) % tuple(chunk.astype(np.int64).tolist())
+            else:
+                text = ("%r\r\n"*len(chunk)) % tuple(chunk.tolist())
+            self.file.write(text.encode('ascii'))
+
+    def close(self):
+        """Finish the file and replace the file by it
+
+        Raises:
+            ValueError: if less blocks were written than given
+        """
+        if self.blockCount != self.numBlocks:
+            self.discard()
+            raise ValueError("{0} blocks written to {1}, expected {2}".format(self.blockCount, self.fileName, self.numBlocks))
+        self.file.write(b"end of experiment\r\n")
+        self.file.close()
+        os.replace(self.temporary, self.fileName)
+
+    def discard(self):
+        """Remove the incomplete file
+        """
+        self.file.close()
+        try:
+            os.remove(self.temporary)
+        except OSError:
+            pass
+
+
+def wholeNumbers(values):
+    """Check if values are read back unchanged when written as integers
+       Not for values beyond the integers exactly represented by a float and not for -0.0.
+    """
+    return (np.array_equal(values, np.trunc(values)) and bool(np.all(np.abs(values) < 2**53))
+            and not np.any(np.signbit(values) & (values == 0)))
+
+
+def formatFields(getValue, *names):
+    """Return the text of fields in the order of the names
+    """
+    return [formatValue(getValue(name), int if name in integerFields else fieldTypes[name]) for name in names]
+
+
+def commentLines(comment, extractor, getValue):
+    """Return the lines of a comment with the parameters extracted by the parser written back into it
+
+    Arguments:
+        comment {str} -- residual comment of the block or file
+        extractor {CommentExtractor} -- extractor of the parser
+        getValue {function} -- returns the value of a field name
+
+    Returns:
+        {list} -- the lines
+    """
+    residual = "" if comment == VAMAS_File.comment else comment
+    return extractor.compose(getValue, residual) + (residual.split("\n") if residual else [])
+
+
+def writeVamasBlocks(fileName, blocks, numBlocks=None):
+    """Write blocks into a VAMAS file, the counterpart of readVamasBlocks()
+
+    Arguments:
+        fileName {str} -- path of the VAMAS file
+        blocks {iterable} -- VAMAS_File or VamasRow of the blocks, the header is taken from the first one
+
+    Keyword Arguments:
+        numBlocks {int} -- number of blocks, needed if the blocks are given by a generator (default: {None})
+    """
+    if numBlocks is None:
+        numBlocks = len(blocks)
+    with VamasWriter(fileName, numBlocks) as writer:
+        for block in blocks:
+            writer.writeBlock(block)
+
+
+def compareBlocks(expected, actual):
+    """Return the fields which differ between two blocks, except those describing the layout of the file
+
+    Arguments:
+        expected {VAMAS_File} -- VAMAS_File or VamasRow
+        actual {VAMAS_File} -- VAMAS_File or VamasRow
+
+    Returns:
+        {list} -- names of the differing fields
+    """
+    differences = list()
+    for name in fieldTypes:
+        if name in layoutFields:
+            continue
+        if name in valueFields:
+            if not np.array_equal(np.asarray(getattr(expected, name), dtype=float), np.asarray(getattr(actual, name), dtype=float)):
+                differences.append(name)
+        elif getattr(expected, name) != getattr(actual, name):
+            differences.append(name)
+    return differences
@@ -1,15 +1,28 @@
-from PyQt5.QtWidgets import QApplication, QMainWindow,QFileDialog,QDialog
-from PyQt5.QtWidgets import QDataWidgetMapper
+from PyQt5.QtWidgets import QApplication, QMainWindow,QFileDialog,QDialog,QProgressBar,QPushButton,QActionGroup
 from PyQt5 import uic
 from PyQt5.QtGui import QIcon
-from PyQt5.QtCore import Qt, QSettings, QModelIndex, QAbstractTableModel, QTransposeProxyModel, QSortFilterProxyModel
+from PyQt5.QtCore import Qt, QSettings, QModelIndex, QAbstractTableModel, QThread, QTimer, pyqtSignal
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg, NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
 import sys
 import os
-import configparser
-from dataclasses import dataclass, fields, field, asdict, replace
+import multiprocessing
+from datetime import datetime, timedelta
+from collections import deque
+import numpy as np
 from vamasSimple import VAMAS_File
+from vamasCollection import VamasCollection
+from vamasLoader import VamasLoader
+from vamasCache import VamasCache
+from vamasDecimation import DecimatedPlot
+from vamasWatcher import FolderWatcher
+from vamasSession import saveSession, loadSession, sessionExtension
+from vamasSummary import SummaryIndex
+from vamasDepthProfile import stackDepthProfiles
+from vamasWriter import writeVamasBlocks
+from vamasProcessing import SpectrumPipeline
+from vamasAggregate import SpectrumAggregator, acquisitionWeights
+from vamasDuplicates import DuplicateIndex
 
 #VIEW <-> CONTROLLER <-> MODEL <-> DATA pattern with PyQt5
 #  ^                      ^
@@ -17,16 +30,37 @@ from vamasSimple import VAMAS_File
 
 
 class ParameterModel(QAbstractTableModel):
-    """2-Dim MODEL using a list of dataclasses to save the data
-
+    """2-Dim MODEL using a columnar VamasCollection to save the data
+       Each block is a column of the model, each dataclass field a row
     """
+    #Maximal number of cell texts kept in the display cache
+    maxDisplayCacheSize = 200000
+    #Number of pending files parsed in the background when the view asks for more data
+    fetchBatchSize = 20
+    blocksFetched = pyqtSignal(list) #VAMAS_File dataclasses appended by fetchMore
 
     def __init__(self, data, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.dataList = data
+        self.dataList = data if isinstance(data, VamasCollection) else VamasCollection(data)
         
-        self.selectedColumns = [False] * len(data)
-        self.selectedRows = [False] * len(fields(self.dataList[0]))
+        #Field names of the rows and row of each field, the fields are the same for all blocks
+        self.fieldNames = tuple(self.dataList.names)
+        self.fieldIndex = {name: row for row, name in enumerate(self.fieldNames)}
+        #Display strings of the cells by (row, column), dropped by dataChanged and when columns move
+        self.displayCache = dict()
+        self.dataChanged.connect(self.invalidateDisplayCache)
+        #Files not parsed yet, appended when the views scroll to the end of the data
+        self.pendingFiles = deque()
+        #Thread parsing the batch of pending files requested last and the blocks it parsed so far
+        self.fetchThread = None
+        self.fetchedBlocks = list()
+
+        self.selectedColumns = [False] * len(self.dataList)
+        self.selectedRows = [False] * len(self.fieldNames)
+        #Rows of the blocks to find duplicates of new blocks, which are skipped or only reported
+        self.duplicates = DuplicateIndex(self.dataList)
+        self.skipDuplicates = True
+        self.duplicateCount = 0
         print("Init {0} cols and {1} rows".format(len(self.selectedColumns), len(self.selectedRows)))
 
     # Implemented
@@ -35,11 +69,13 @@ class ParameterModel(QAbstractTableModel):
         """
         self.beginInsertColumns(QModelIndex(), pos, pos + cols - 1)
         for col in range(cols):
-            #Insert new Dataclass object into the list at the given pos
-            #Using type() create a new object of the dataclasses class at current pos
-            self.dataList.insert(pos + col,  type(self.dataList[pos-1])()) #replace(self.dataList[0])
+            #Insert new empty block into the collection at the given pos
+            self.dataList.insert(pos + col, VAMAS_File())
             #Insert new item in selectedColumns list
             self.selectedColumns.insert(pos, False)
+        #The following columns moved
+        self.displayCache.clear()
+        self.duplicates = DuplicateIndex(self.dataList)
         self.endInsertColumns()
         return True
 
@@ -47,14 +83,65 @@ class ParameterModel(QAbstractTableModel):
         """Append new column data to the model
         """
         self.beginInsertColumns(QModelIndex(), self.columnCount()-1, self.columnCount()- 1)
-        #Insert new Dataclass object into the list at the given pos
-        #Using type() create a new object of the dataclasses class at current pos
-        self.dataList.insert(self.columnCount(),  data) #replace(self.dataList[0])
+        #Append the dataclass to the collection
+        self.dataList.append(data)
         #Insert new item in selectedColumns list
         self.selectedColumns.insert(self.columnCount()-1, False)
         self.endInsertColumns()
+        self.duplicates.add(self.dataList[len(self.dataList)-1])
         return True        
 
+    def appendBlocks(self, blocks):
+        """Append blocks as new columns with a single insertion
+
+        ### Arguments:
+            blocks {list} -- dataclasses or VamasRows of the blocks
+        """
+        if not blocks:
+            return
+        first = len(self.dataList)
+        self.beginInsertColumns(QModelIndex(), self.columnCount(), self.columnCount() + len(blocks) - 1)
+        self.dataList.extend(blocks)
+        self.selectedColumns.extend([False] * len(blocks))
+        self.endInsertColumns()
+        #The rows, not the dataclasses, are kept by the index
+        self.duplicates.addAll(self.dataList[index] for index in range(first, len(self.dataList)))
+
+    def withoutDuplicates(self, blocks):
+        """Return the new blocks to append, without the duplicates of loaded blocks and of each other if skipDuplicates is set
+           The blocks are added to the index when they are appended.
+
+        ### Arguments:
+            blocks {list} -- dataclasses or VamasRows of the new blocks
+
+        ### Returns:
+            {list} -- the blocks to append
+        """
+        kept = list()
+        newBlocks = DuplicateIndex()
+        for block in blocks:
+            duplicate = self.duplicates.find(block) or newBlocks.add(block)
+            if duplicate is not None:
+                self.duplicateCount += 1
+                print("{0}{1}".format("Skipped: " if self.skipDuplicates else "", duplicate))
+                if self.skipDuplicates:
+                    continue
+            kept.append(block)
+        return kept
+
+    def replaceData(self, column, data):
+        """Replace the data of a column, only the cells of this column are signalled as changed
+
+        ### Arguments:
+            column {int} -- model column
+            data {VAMAS_File} -- dataclass of the block
+        """
+        self.duplicates.remove(self.dataList[column-1])
+        self.dataList.replace(column-1, data)
+        self.duplicates.add(self.dataList[column-1])
+        #The checkbox row is kept
+        self.dataChanged.emit(self.index(1, column), self.index(self.rowCount()-1, column))
+
     # # Implemented
     # def removeColumns(self, pos, cols=1, parent=QModelIndex()):
     #     """Delete columns from the model
@@ -118,7 +205,38 @@ class ParameterModel(QAbstractTableModel):
                 # use only the row to get the data from our todo list
                 #print ("data ", index.row(),  index.column(), "role: ", role)
                 #print ("data ", index.row(),  index.column(), getattr(self.dataList[index.column()], fields(self.dataList[index.column()])[index.row()].name))
-                return str(getattr(self.dataList[index.column()-1], fields(self.dataList[index.column()-1])[index.row()-1].name))
+                return self.displayText(index.row(), index.column())
+
+    def displayText(self, row, column):
+        """Return the text of a cell, converted once and then taken from the display cache
+           The cache is limited to maxDisplayCacheSize cells, it is emptied when full
+
+        ### Arguments:
+            row {int} -- model row = field index + 1
+            column {int} -- model column = block index + 1
+
+        ### Returns:
+            {str} -- The text
+        """
+        key = (row, column)
+        text = self.displayCache.get(key)
+        if text is None:
+            if len(self.displayCache) >= self.maxDisplayCacheSize:
+                self.displayCache.clear()
+            text = str(self.dataList.getValue(column-1, self.fieldNames[row-1]))
+            self.displayCache[key] = text
+        return text
+
+    def invalidateDisplayCache(self, topLeft, bottomRight, roles=[]):
+        """Drop the cached text of changed cells, connected to dataChanged
+
+        ### Arguments:
+            topLeft {QModelIndex} -- first changed cell
+            bottomRight {QModelIndex} -- last changed cell
+        """
+        for row in range(topLeft.row(), bottomRight.row()+1):
+            for column in range(topLeft.column(), bottomRight.column()+1):
+                self.displayCache.pop((row, column), None)
 
     # Implemented
     def headerData(self, section: int, orientation: Qt.Orientation, role: int):
@@ -135,7 +253,7 @@ class ParameterModel(QAbstractTableModel):
         if role == Qt.DisplayRole or role == Qt.ToolTipRole:
             if orientation == Qt.Vertical and section>0:
                 #Use the dataclass field=variable name for the header
-                return fields(self.dataList[0])[section-1].name
+                return self.fieldNames[section-1]
 
     # Implemented
     def setData(self, index, value, role=Qt.EditRole):
@@ -157,11 +275,16 @@ class ParameterModel(QAbstractTableModel):
             self.dataChanged.emit(index, index)                               
         else:
             newValue = value
-            oldValue = getattr(self.dataList[index.column()-1], fields(self.dataList[index.column()-1])[index.row()-1].name) 
+            name = self.fieldNames[index.row()-1]
+            oldValue = self.dataList.getValue(index.column()-1, name)
             if newValue != oldValue:
                 #print ("setData ", index.row(),  index.column(), newValue)
-
-                setattr(self.dataList[index.column()-1], fields(self.dataList[index.column()-1])[index.row()-1].name, newValue)
+                try:
+                    #Converted to the type of the field
+                    self.dataList.setValue(index.column()-1, name, newValue)
+                except ValueError as e:
+                    print("Invalid value: {0}".format(e))
+                    return False
                 self.dataChanged.emit(index, index)
         return True
 
@@ -175,7 +298,7 @@ class ParameterModel(QAbstractTableModel):
         ### Returns:
             {int} -- total number of rows
         """
-        return len(fields(self.dataList[0]))+1 #+1
+        return len(self.fieldNames)+1 #+1
 
     # Implemented
     def columnCount(self, parent=QModelIndex()):
@@ -190,54 +313,120 @@ class ParameterModel(QAbstractTableModel):
         return len(self.dataList)+1
 
     def loadData(self, newData):
-        #Replace the datalist with newData
+        #Replace the datalist with newData, a VamasCollection or list of dataclasses
         self.layoutAboutToBeChanged.emit()
-        self.dataList = newData
-        self.selectedColumns = [False] * len(newData)
+        self.dataList = newData if isinstance(newData, VamasCollection) else VamasCollection(newData)
+        self.selectedColumns = [False] * len(self.dataList)
+        self.duplicates = DuplicateIndex(self.dataList)
+        self.displayCache.clear()
+        self.pendingFiles.clear()
+        self.cancelFetching()
         #self.selectedRows = [False] * len(fields(newData[0]))     
         #print("LoadData Reinit {0} cols and {1} rows".format(len(self.selectedColumns), len(self.selectedRows)))   
         self.layoutChanged.emit()
 
-    def loadFromConfigFile(self, fileName):
-        #Load new data from config file
-        #Create new empty data list (List of dataclass objects)
-        data = list()
-        with open(fileName, 'r') as f:
-            config = configparser.ConfigParser()
-            #Make it case-sensitive
-            config.optionxform = str            
-            config.read_file(f)
-            #Iterate through config sections
-            for section in config.sections():
-                #Check if section name starts with "Parameters1"
-                if section.startswith('VAMAS_File'):
-                    #Create new dataclass object unpacking the dict made out of the config
-                    dat = VAMAS_File(**dict(config[section]))
-                    #Append to data list
-                    data.append(dat)
-
-        self.loadData(data)
+    def setPendingFiles(self, fileNames):
+        """Append files to the model which are parsed only when the views fetch more data by scrolling to the end
 
+        ### Arguments:
+            fileNames {list} -- paths of the VAMAS files
+        """
+        self.pendingFiles.extend(fileNames)
 
-            
+    # Implemented
+    def canFetchMore(self, parent=QModelIndex()):
+        """Return if there are pending files, called by the views and proxy models
 
-    def saveModelToConfigFile(self, fileName):
-        """Saves the model as .ini type file using ConfigParser
+        ### Keyword Arguments:
+            parent {QModelIndex} -- only used for trees (default: {QModelIndex()})
+
+        ### Returns:
+            {bool} -- True if files are not parsed yet or still being parsed
+        """
+        return len(self.pendingFiles) > 0 or self.fetchThread is not None
+
+    # Implemented
+    def fetchMore(self, parent=QModelIndex()):
+        """Parse the next fetchBatchSize pending files header-only in a background thread, their blocks are appended
+           as new columns when the batch is parsed. Does nothing while a batch is parsed.
+           The persistent cache is not used, reading only the header is as fast as reading the cache entry.
+           The files are parsed one after another without worker processes, reading the headers waits for the disk.
+
+        ### Keyword Arguments:
+            parent {QModelIndex} -- only used for trees (default: {QModelIndex()})
+        """
+        if self.fetchThread is not None or not self.pendingFiles:
+            return
+        fileNames = [self.pendingFiles.popleft() for i in range(min(self.fetchBatchSize, len(self.pendingFiles)))]
+        self.fetchedBlocks = list()
+        self.fetchThread = LoaderThread(fileNames, workers=1, parent=self)
+        self.fetchThread.fileLoaded.connect(self.fileFetched)
+        self.fetchThread.finished.connect(self.fetchFinished)
+        self.fetchThread.start()
+
+    def fileFetched(self, result):
+        """Collect the blocks of a file parsed by the fetch thread
+        """
+        if self.sender() is not self.fetchThread:
+            #Fetched before the data was replaced
+            return
+        if result.error:
+            print("Failed loading {0}: {1}".format(result.fileName, result.error))
+            return
+        self.fetchedBlocks.extend(result.blocks)
+
+    def fetchFinished(self):
+        """Append the blocks of the fetched batch, the next batch is fetched at once if no block was appended
+        """
+        if self.sender() is not self.fetchThread:
+            return
+        self.fetchThread = None
+        blocks = self.withoutDuplicates(self.fetchedBlocks)
+        self.fetchedBlocks = list()
+        if blocks:
+            self.appendBlocks(blocks)
+            self.blocksFetched.emit(blocks)
+        else:
+            #Skip files which could not be parsed or contained only duplicates
+            self.fetchMore()
+
+    def cancelFetching(self):
+        """Stop the fetch thread and drop the blocks it parsed
+        """
+        if self.fetchThread is not None:
+            self.fetchThread.cancel()
+            self.fetchThread = None
+        self.fetchedBlocks = list()
+
+    def loadFromSession(self, fileName):
+        """Replace the model data with a session saved by saveToSession, the spectra are memory-mapped
 
         ### Arguments:
-            fileName {str} -- full filepath
-        """
-        #Create Configparser obect
-        config = configparser.ConfigParser()
-        #Make it case-sensitive
-        config.optionxform = str
-        #Iterate through dict of dicts
-        for key, value in self.dataAsDict().items():
-            #Write all key-value pairs of one column as config 
-            config[key] = value #Value is a dict
-        #Write the configparser to the selected file
-        with open(fileName, 'w') as f:
-            config.write(f)
+            fileName {str} -- full filepath of the .vmss file
+
+        ### Returns:
+            {VamasCollection} -- the loaded blocks
+        """
+        collection, state = loadSession(fileName)
+        self.loadData(collection)
+        selectedColumns = state.get('selectedColumns', [])
+        if len(selectedColumns) == len(self.selectedColumns):
+            self.selectedColumns = selectedColumns
+        #Rows by field name, fields may have been added since saving
+        if 'selectedFields' in state:
+            selectedFields = set(state['selectedFields'])
+            self.selectedRows = [name in selectedFields for name in self.fieldNames]
+        return collection
+
+    def saveToSession(self, fileName):
+        """Save the model data with the spectra and the checked rows and columns as binary session file
+
+        ### Arguments:
+            fileName {str} -- full filepath of the .vmss file
+        """
+        state = {'selectedColumns': self.selectedColumns,
+                 'selectedFields': [name for name, selected in zip(self.fieldNames, self.selectedRows) if selected]}
+        saveSession(fileName, self.dataList, state)
 
     def getFieldIndex(self, name):
         """Return the index of named dataclass field in the model
@@ -249,35 +438,236 @@ class ParameterModel(QAbstractTableModel):
             {int} -- model index (row) for parameter
         """
         #return the index of name in list of parameters
-        return list(f.name for f in fields(self.dataList[0])).index(name)    
-
-    def dataAsDict(self):
-        """Create a dict of dicts from the datalist using the classname of the dataclass + index as key values
-
-        ### Returns:
-            {dict} -- Dict of dicts of the model data
-        """
-        return {str(d.__class__.__name__) + "_" + str(i+1) : asdict(d) for i, d in enumerate(self.dataList)}
+        return self.fieldIndex[name]
 
     def getObject(self, index):
-        """Return the indexed dataclass
+        """Return the indexed block
 
         ### Arguments:
             index {int} -- Column index for the model
 
         ### Returns:
-            {type of dataclass} -- returns the dataclass object
+            {VamasRow} -- view on the block with the attributes of the dataclass
         """
         return self.dataList[index-1]
 
     def getData(self):
-        """Return the whole list of dataclass objects
+        """Return the whole collection of blocks
 
         ### Returns:
-            {list} -- List of dataclas objects
+            {VamasCollection} -- the columnar collection
         """
         return self.dataList
 
+class SummaryModel(QAbstractTableModel):
+    """Summary MODEL for the paramTable: one row per block, one column per dataclass field
+       Shows the cells of the ParameterModel transposed, sorted by typed keys and filtered with the
+       indexes of a SummaryIndex instead of comparing the cell texts through proxy models.
+       The first column holds the checkboxes selecting the blocks to plot.
+    """
+
+    def __init__(self, source, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.source = source
+        self.summaryIndex = SummaryIndex(source.dataList)
+        #Block index of each row
+        self.rows = np.arange(len(source.dataList))
+        #Row of each block, -1 if filtered out
+        self.rowOfBlocks = np.arange(len(source.dataList))
+        #Sorted field and order, None for the order of the blocks
+        self.sortName = None
+        self.sortOrder = Qt.AscendingOrder
+        #Keyword arguments of SummaryIndex.filterMask
+        self.filters = dict()
+        self.refreshPending = False
+
+        source.dataChanged.connect(self.sourceDataChanged)
+        source.columnsInserted.connect(self.sourceColumnsInserted)
+        source.layoutChanged.connect(self.sourceReset)
+        source.modelReset.connect(self.sourceReset)
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        """Return number of columns = checkbox column + number of dataclass fields
+        """
+        return len(self.source.fieldNames) + 1
+
+    def blockOfRow(self, row):
+        """Return the ParameterModel column of a row
+
+        ### Arguments:
+            row {int} -- row of this model
+
+        ### Returns:
+            {int} -- model column = block index + 1
+        """
+        return int(self.rows[row]) + 1
+
+    def rowOfBlock(self, column):
+        """Return the row of a ParameterModel column, -1 if it is filtered out
+
+        ### Arguments:
+            column {int} -- model column = block index + 1
+
+        ### Returns:
+            {int} -- row of this model
+        """
+        if not 0 < column <= len(self.rowOfBlocks):
+            return -1
+        return int(self.rowOfBlocks[column-1])
+
+    def sourceIndex(self, index):
+        """Return the ParameterModel index of a cell, the first column maps to the checkbox row
+        """
+        return self.source.index(index.column(), self.blockOfRow(index.row()))
+
+    def flags(self, index):
+        if index.column() == 0:
+            return Qt.ItemIsEnabled | Qt.ItemIsUserCheckable
+        return super().flags(index)
+
+    def data(self, index, role):
+        if not index.isValid() or index.row() >= len(self.rows):
+            return None
+        return self.source.data(self.sourceIndex(index), role)
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or index.row() >= len(self.rows):
+            return False
+        return self.source.setData(self.sourceIndex(index), value, role)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int):
+        if role == Qt.DisplayRole or role == Qt.ToolTipRole:
+            if orientation == Qt.Horizontal and section > 0:
+                return self.source.fieldNames[section-1]
+            if orientation == Qt.Vertical and section < len(self.rows):
+                return str(self.blockOfRow(section))
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return self.source.canFetchMore()
+
+    def fetchMore(self, parent=QModelIndex()):
+        self.source.fetchMore()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """Sort the rows by the typed keys of a field, called by the view when a header is clicked
+
+        ### Arguments:
+            column {int} -- column of the field, 0 or -1 for the order of the blocks
+            order {Qt.SortOrder} -- ascending or descending
+        """
+        self.sortName = self.source.fieldNames[column-1] if column > 0 else None
+        self.sortOrder = order
+        self.refreshRows()
+
+    def setFilters(self, **filters):
+        """Show only the blocks passing the filters
+
+        ### Keyword Arguments:
+            see SummaryIndex.filterMask
+        """
+        self.filters = filters
+        self.refreshRows()
+
+    def orderedBlocks(self):
+        """Return the block indices of the rows for the current sorting and filters
+        """
+        self.summaryIndex.update()
+        if self.sortName is None:
+            order = np.arange(self.summaryIndex.numBlocks)
+        else:
+            order = self.summaryIndex.sortOrder(self.sortName, self.sortOrder == Qt.DescendingOrder)
+        if self.filtering():
+            order = order[self.summaryIndex.filterMask(**self.filters)[order]]
+        return order
+
+    def filtering(self):
+        """Return if a filter is set
+        """
+        return any(value not in ("", (None, None)) for value in self.filters.values())
+
+    def setRows(self, rows):
+        """Set the block index of each row and the row of each block
+        """
+        self.rows = rows
+        self.rowOfBlocks = np.full(self.summaryIndex.numBlocks, -1)
+        self.rowOfBlocks[self.rows] = np.arange(len(self.rows))
+
+    def refreshRows(self):
+        """Sort and filter the rows again
+           When only the order changed the selection of the views moves with the blocks,
+           when rows were added or removed by a filter the model is reset.
+        """
+        self.refreshPending = False
+        rows = self.orderedBlocks()
+        if len(rows) != len(self.rows):
+            self.beginResetModel()
+            self.setRows(rows)
+            self.endResetModel()
+            return
+        self.layoutAboutToBeChanged.emit()
+        oldIndexes = self.persistentIndexList()
+        oldBlocks = [self.rows[index.row()] if index.row() < len(self.rows) else -1 for index in oldIndexes]
+        self.setRows(rows)
+        newIndexes = list()
+        for index, block in zip(oldIndexes, oldBlocks):
+            row = self.rowOfBlocks[block] if 0 <= block < len(self.rowOfBlocks) else -1
+            newIndexes.append(self.index(int(row), index.column()) if row >= 0 else QModelIndex())
+        self.changePersistentIndexList(oldIndexes, newIndexes)
+        self.layoutChanged.emit()
+
+    def scheduleRefresh(self):
+        """Refresh the rows once after all changes of the current event
+        """
+        if not self.refreshPending:
+            self.refreshPending = True
+            QTimer.singleShot(0, lambda: self.refreshPending and self.refreshRows())
+
+    def sourceDataChanged(self, topLeft, bottomRight, roles=[]):
+        """Update the keys of changed blocks and the changed cells
+        """
+        blocks = range(max(topLeft.column(), 1) - 1, bottomRight.column())
+        names = self.source.fieldNames[max(topLeft.row(), 1) - 1:bottomRight.row()]
+        if names:
+            self.summaryIndex.updateBlocks(blocks, names)
+        if self.sortName in names or any(name in names for name in ('sampleName', 'technique', 'date', 'analyzerPEorRR')):
+            self.scheduleRefresh()
+            return
+        for block in blocks:
+            row = self.rowOfBlock(block + 1)
+            if row >= 0:
+                self.dataChanged.emit(self.index(row, topLeft.row()), self.index(row, bottomRight.row()))
+
+    def sourceColumnsInserted(self, parent, first, last):
+        """Add rows for the blocks appended to the ParameterModel
+           Without sorting and filters they are appended, otherwise the rows are refreshed after the current event
+        """
+        if self.sortName is not None or self.filtering():
+            self.scheduleRefresh()
+            return
+        numBlocks = len(self.source.dataList)
+        if numBlocks <= len(self.rows) or last < len(self.rows):
+            #Inserted before the end
+            self.scheduleRefresh()
+            return
+        self.beginInsertRows(QModelIndex(), len(self.rows), numBlocks - 1)
+        self.summaryIndex.update()
+        self.rowOfBlocks = np.concatenate((self.rowOfBlocks, np.arange(len(self.rows), numBlocks)))
+        self.rows = np.arange(numBlocks)
+        self.endInsertRows()
+
+    def sourceReset(self):
+        """Index the new data of the ParameterModel
+        """
+        self.beginResetModel()
+        self.summaryIndex = SummaryIndex(self.source.dataList)
+        self.setRows(self.orderedBlocks())
+        self.refreshPending = False
+        self.endResetModel()
+
+
 class MplCanvas(FigureCanvasQTAgg):
     """Matplotlib plot in a a qt canvas
 
@@ -289,7 +679,55 @@ class MplCanvas(FigureCanvasQTAgg):
         self.fig = Figure(figsize=(width, height), dpi=dpi, constrained_layout=True)
         self.axes = self.fig.add_subplot(111)
         super(MplCanvas, self).__init__(self.fig)
+        #Spectra are plotted decimated to the resolution of the axes, again when zoomed or resized
+        self.decimatedPlot = DecimatedPlot(self.axes)
+        self.mpl_connect('resize_event', lambda event: self.decimatedPlot.update())
+
+
+
+class LoaderThread(QThread):
+    """Parses VAMAS files in the background using a VamasLoader with a worker process per core
+       Each parsed file is sent to the GUI thread in the order of the file list
 
+    ### Arguments:
+        QThread {[class]} -- Prototype
+    """
+    fileLoaded = pyqtSignal(object) #LoadResult of one file
+
+    def __init__(self, fileNames, headerOnly=True, cache=None, workers=None, parent=None):
+        super(LoaderThread, self).__init__(parent)
+        self.loader = VamasLoader(fileNames, headerOnly=headerOnly, workers=workers, cache=cache)
+
+    def run(self):
+        for result in self.loader:
+            self.fileLoaded.emit(result)
+
+    def cancel(self):
+        """Stop loading after the current file
+        """
+        self.loader.cancel()
+
+
+class ScanThread(QThread):
+    """Scans the watched folder in the background, walking it and reading the state of each file can take long
+
+    ### Arguments:
+        QThread {[class]} -- Prototype
+    """
+    scanned = pyqtSignal(object, object, object) #FolderWatcher, list of new files, list of changed files
+
+    def __init__(self, folderWatcher, parent=None):
+        super(ScanThread, self).__init__(parent)
+        self.folderWatcher = folderWatcher
+
+    def run(self):
+        newFiles, changedFiles = self.folderWatcher.scan()
+        self.scanned.emit(self.folderWatcher, newFiles, changedFiles)
+
+    def cancel(self):
+        """Stop the scan after the current folder or file
+        """
+        self.folderWatcher.cancel()
 
 
 class MainWindow(QMainWindow):
@@ -298,6 +736,12 @@ class MainWindow(QMainWindow):
     ### Args:
         QMainWindow ([class]): Create the controller class
     """
+    #More files are parsed only when the user scrolls to them
+    lazyLoadThreshold = 500
+    #Milliseconds between two scans of the watched folder
+    watchInterval = 2000
+    #Milliseconds files loaded in the background are collected to insert them into the model at once
+    insertInterval = 200
 
     def __init__(self, *args, **kwargs):
         super(MainWindow, self).__init__(*args, **kwargs)
@@ -306,12 +750,44 @@ class MainWindow(QMainWindow):
 
 
         #Create first data for the model
-        self.data = [VAMAS_File()]
+        self.data = VamasCollection([VAMAS_File()])
         #Create the MODEL
         self.model = ParameterModel(self.data)
 
         #Selected first model column
         self.selectedModelColumn = 1
+
+        #Background thread loading files
+        self.loaderThread = None
+        #Loaded files waiting to be inserted into the model
+        self.loadedResults = list()
+        #Column selected when the first batch of files parsed on scrolling arrives
+        self.firstFetchedColumn = None
+        self.insertTimer = QTimer(self)
+        self.insertTimer.setSingleShot(True)
+        self.insertTimer.setInterval(self.insertInterval)
+        self.insertTimer.timeout.connect(self.insertLoadedFiles)
+        #Persistent cache of parsed files
+        try:
+            self.cache = VamasCache()
+        except OSError as e:
+            print("Parse cache disabled: {0}".format(e))
+            self.cache = None
+        #Folder watched for new files, the threads scanning it and parsing them
+        self.folderWatcher = None
+        self.scanThread = None
+        self.watchThread = None
+        #Files to parse after the running watch thread, e.g. files changed since their header was read
+        self.watchQueue = list()
+        self.watchTimer = QTimer(self)
+        self.watchTimer.setInterval(self.watchInterval)
+        self.watchTimer.timeout.connect(self.scanWatchedFolder)
+        #The plot shows the depth profile instead of spectra
+        self.depthProfileShown = False
+        #Converts the plotted spectra to binding energies, cached per file and block
+        self.pipeline = SpectrumPipeline(energy={'scale': 'binding'})
+        #Resamples the checked spectra for their sum, mean or median, keeps the interpolation weights
+        self.aggregator = SpectrumAggregator()
      
 
         #Create the maptlotlib FigureCanvas object, 
@@ -333,31 +809,44 @@ class MainWindow(QMainWindow):
         #Hide the first row with model-column selector checkbox
         self.vmsTable.hideRow(0)
         self.model.dataChanged.connect(lambda index: (self.modelEditedEvent(index)))
+        self.model.blocksFetched.connect(self.blocksFetched)
         
-        #Proxy model with swapped rows/columns for paramTabel
-        self.proxy = QTransposeProxyModel()
-        self.proxy.setSourceModel(self.model)
-
-        #Sorting model
-        self.proxy2 = QSortFilterProxyModel()
-        self.proxy2.setSourceModel(self.proxy)
-
-        #Display sorted proxy model for param table
-        self.paramTable.setModel(self.proxy2)
+        #Summary model with one row per block, sorted and filtered, for the param table
+        self.summaryModel = SummaryModel(self.model)
+        self.paramTable.setModel(self.summaryModel)
         #Show only selected columns
         self.initSelectedFields()  
         #Movable columns
         self.paramTable.horizontalHeader().setSectionsMovable(True)
         self.paramTable.setColumnWidth(0, 30)
         #Double click event selects row from model and updates view
-        self.paramTable.doubleClicked.connect(lambda index: (self.selectModelColumn(self.proxy2.mapToSource(index).row())))
-        #Hide first row with model-row selector checkboxes
-        self.paramTable.hideRow(0)
+        self.paramTable.doubleClicked.connect(lambda index: (self.selectModelColumn(self.summaryModel.blockOfRow(index.row()))))
+
+        #Filter events, the techniques are updated when blocks are added
+        self.sampleFilter.textChanged.connect(self.applyFilters)
+        self.techniqueFilter.currentIndexChanged.connect(self.applyFilters)
+        self.dateFromFilter.textChanged.connect(self.applyFilters)
+        self.dateToFilter.textChanged.connect(self.applyFilters)
+        self.passEnergyFilter.textChanged.connect(self.applyFilters)
+        self.summaryModel.rowsInserted.connect(self.updateTechniqueFilter)
+        self.summaryModel.modelReset.connect(self.updateTechniqueFilter)
 
         #Menu Bar events
         self.actionSave.triggered.connect(self.saveModel)
+        self.actionExport_VAMAS.triggered.connect(self.exportVamas)
         self.actionLoad.triggered.connect(self.loadModel)  
         self.actionAppend_Files.triggered.connect(self.appendData)                
+        self.actionWatch_Folder.triggered.connect(self.watchFolder)
+        self.actionSkip_Duplicates.toggled.connect(self.setSkipDuplicates)
+        self.actionDepth_Profile.triggered.connect(lambda checked: self.updatePlot())
+        self.actionSwitch_Eb_Ek.triggered.connect(lambda checked: self.updatePlot())
+        #At most one aggregate of the checked spectra is plotted
+        self.aggregationActions = {self.actionSum_Checked: 'sum', self.actionMean_Checked: 'mean', self.actionMedian_Checked: 'median'}
+        self.aggregationGroup = QActionGroup(self)
+        self.aggregationGroup.setExclusionPolicy(QActionGroup.ExclusionPolicy.ExclusiveOptional)
+        for action in self.aggregationActions:
+            self.aggregationGroup.addAction(action)
+            action.triggered.connect(lambda checked: self.updatePlot())
         self.actionQuit.triggered.connect(self.close)
     
         #Button events
@@ -367,6 +856,16 @@ class MainWindow(QMainWindow):
 
         self.colNumber.setText("0/0")
 
+        #Progress of loading in the status bar, the window can be used while files are loaded
+        self.loadProgress = QProgressBar()
+        self.loadProgress.setMaximumWidth(200)
+        self.cancelButton = QPushButton("Cancel")
+        self.cancelButton.clicked.connect(self.cancelLoading)
+        self.statusbar.addPermanentWidget(self.loadProgress)
+        self.statusbar.addPermanentWidget(self.cancelButton)
+        self.loadProgress.hide()
+        self.cancelButton.hide()
+
         self.show()
 
     def modelEditedEvent(self, index):
@@ -386,6 +885,9 @@ class MainWindow(QMainWindow):
         #First row changes data columns to be plotted
         if index.row() == 0:
             self.updatePlot()
+        elif index.column() > 0:
+            #Converted spectra of the edited block are outdated
+            self.pipeline.invalidate(self.model.getObject(index.column()).fileName)
 
 
     def initSelectedFields(self):
@@ -393,16 +895,65 @@ class MainWindow(QMainWindow):
         """
         #Show only selected columns
         visibleColumns = ["sampleName", "blockName", "posName", "date", "technique", "analyserSettingStr", "analyzerPEorRR", "dwellTime"]
-        for r in range(self.proxy.columnCount()):
-            if not self.proxy.headerData(r, Qt.Horizontal) in visibleColumns:
+        for r in range(self.summaryModel.columnCount()):
+            if not self.summaryModel.headerData(r, Qt.Horizontal, Qt.DisplayRole) in visibleColumns:
                 self.paramTable.hideColumn(r)
             else:
                 self.model.selectedRows[r-1] = True
         self.paramTable.showColumn(0)  
     
+    def applyFilters(self):
+        """Filter the paramTable by the texts of the filter fields, invalid dates and pass energies are ignored
+        """
+        dateRange = [None, None]
+        for i, text in enumerate((self.dateFromFilter.text().strip(), self.dateToFilter.text().strip())):
+            try:
+                dateRange[i] = datetime.fromisoformat(text) if text else None
+            except ValueError:
+                continue
+            if i == 1 and text and len(text) <= 10:
+                #Include the whole last day
+                dateRange[i] += timedelta(days=1, microseconds=-1)
+        passEnergyRange = (None, None)
+        text = self.passEnergyFilter.text().strip()
+        try:
+            if text:
+                #Single value or range like 10-50
+                limits = [float(limit) for limit in text.split("-", 1)] if "-" in text[1:] else [float(text)]*2
+                passEnergyRange = (min(limits), max(limits))
+        except ValueError:
+            pass
+        technique = self.techniqueFilter.currentText() if self.techniqueFilter.currentIndex() > 0 else ""
+        self.summaryModel.setFilters(sampleText=self.sampleFilter.text().strip(), technique=technique,
+                                     dateRange=tuple(dateRange), passEnergyRange=passEnergyRange)
+        #Rows added or removed by the filters reset the selection
+        row = self.summaryModel.rowOfBlock(self.selectedModelColumn)
+        if row >= 0:
+            self.paramTable.selectRow(row)
+
+    def updateTechniqueFilter(self):
+        """Offer the techniques of the loaded blocks in the technique filter
+        """
+        techniques = self.summaryModel.summaryIndex.distinctTechniques()
+        items = [self.techniqueFilter.itemText(i) for i in range(1, self.techniqueFilter.count())]
+        if techniques == items:
+            return
+        current = self.techniqueFilter.currentText()
+        self.techniqueFilter.blockSignals(True)
+        while self.techniqueFilter.count() > 1:
+            self.techniqueFilter.removeItem(1)
+        self.techniqueFilter.addItems(techniques)
+        self.techniqueFilter.setCurrentIndex(max(self.techniqueFilter.findText(current), 0))
+        self.techniqueFilter.blockSignals(False)
+        if self.techniqueFilter.currentText() != current:
+            #The filtered technique is gone
+            self.applyFilters()
+
     def goToNextColumn(self):
         """Select next column from model
         """
+        if self.selectedModelColumn >= self.model.columnCount()-1 and self.model.canFetchMore():
+            self.model.fetchMore()
         if self.selectedModelColumn < self.model.columnCount()-1:
             self.selectedModelColumn+=1
             self.updateSelectedData()
@@ -444,12 +995,12 @@ class MainWindow(QMainWindow):
                 self.vmsTable.hideColumn(column)
         
         #print ("Combobox currentIndex", self.dataSelector.currentIndex(), " from ", self.dataSelector.count())
-        #Select line in inverse paramTable
-        index = self.proxy.index(self.selectedModelColumn, 0) #Get column = row index from Transpose Proxy model
-        print("Param table selecting row {0}".format(self.proxy2.mapFromSource(index).row()))
+        #Select line in summary paramTable
+        row = self.summaryModel.rowOfBlock(self.selectedModelColumn) #-1 if filtered out
         #Deselect all
         self.paramTable.clearSelection()
-        self.paramTable.selectRow(self.proxy2.mapFromSource(index).row()) #Convert to row index in sorted Proxy model
+        if row >= 0:
+            self.paramTable.selectRow(row)
 
         #Plot data
         #Get current data class object
@@ -457,31 +1008,101 @@ class MainWindow(QMainWindow):
 
     def updatePlot(self):
         """update the plot with the selected data
+           The lines of the plotted columns are kept and only blitted if the axes did not change
         """
-        #Get current data class object
-        data = self.model.getObject(self.selectedModelColumn)
-        #print("plotting column " + str(self.selectedModelColumn))
-        if len(data.yAxisValuesList) > 0:
-            self.spectralPlot.axes.cla()
-            self.spectralPlot.axes.plot(data.xAxisValuesList, data.yAxisValuesList[0])
+        if self.model.columnCount() < 2:
+            return
+        plot = self.spectralPlot.decimatedPlot
+        if self.actionDepth_Profile.isChecked():
+            self.plotDepthProfile()
+            return
+        if self.depthProfileShown:
+            #Remove the profile, the spectra are plotted again
+            plot.clear()
+            self.depthProfileShown = False
+        #Plot the selected column and also the checked data columns, model columns start from 1
+        columns = [self.selectedModelColumn] + [colIndex+1 for colIndex, checked in enumerate(self.model.selectedColumns) if checked and colIndex+1 != self.selectedModelColumn]
+        blocks = {column: data for column, data in self.loadSpectra(columns).items() if len(data.yAxisValuesList) > 0}
+        data = blocks.get(self.selectedModelColumn)
+        if data is not None:
             #Create axis labels from data
             self.spectralPlot.axes.set_xlabel("{0} [{1}]".format(data.xAxisLabel, data.xAxisUnit))
             self.spectralPlot.axes.set_ylabel("{0} [{1}]".format(data.yAxisVarsLabelList[0], data.yAxisVarsUnitList[0]))
 
+        bindingEnergy = self.actionSwitch_Eb_Ek.isChecked()
+        if bindingEnergy:
+            #Converted by the pipeline, which keeps the converted spectra
+            processed = self.pipeline.process(list(blocks.values()))
+            spectra = {column: (spectrum.x, spectrum.y) for column, spectrum in zip(blocks, processed) if spectrum is not None}
+            if processed and processed[0] is not None:
+                self.spectralPlot.axes.set_xlabel("{0} [{1}]".format(processed[0].xAxisLabel, list(blocks.values())[0].xAxisUnit))
+        else:
+            spectra = {column: (data.xAxisValuesList, data.yAxisValuesList[0]) for column, data in blocks.items()}
+        #Aggregate of the checked spectra on a common grid
+        method = next((method for action, method in self.aggregationActions.items() if action.isChecked()), None)
+        checkedColumns = [column for column in spectra if self.model.selectedColumns[column-1]]
+        if method is not None and checkedColumns:
+            try:
+                aggregate = self.aggregator.aggregate([spectra[column] for column in checkedColumns],
+                                                      acquisitionWeights([blocks[column] for column in checkedColumns]), method)
+                spectra['aggregate'] = (aggregate.x, aggregate.y)
+            except ValueError as e:
+                self.statusbar.showMessage("No {0} of the checked spectra: {1}".format(method, e))
+        #Binding energies are shown decreasing from left to right
+        if bindingEnergy != self.spectralPlot.axes.xaxis_inverted():
+            self.spectralPlot.axes.invert_xaxis()
+
+        #Update the lines, scale to the visible ones and redraw
+        plot.setLines(spectra)
+        plot.autoscale()
+        plot.redraw()
+
+    def plotDepthProfile(self):
+        """Plot the area of each region over the etch cycles for all blocks of the file of the selected block
+        """
+        fileName = self.model.getObject(self.selectedModelColumn).fileName
+        collection = self.model.getData()
+        blocks = list(self.loadSpectra([index+1 for index in range(len(collection)) if collection.getValue(index, 'fileName') == fileName]).values())
+        self.spectralPlot.decimatedPlot.clear()
+        self.depthProfileShown = True
+        axes = self.spectralPlot.axes
+        profiles = stackDepthProfiles(blocks)
+        for profile in profiles:
+            axes.plot(profile.depths, profile.integrate(background='linear'), marker='.', label=profile.regionName)
+        if profiles:
+            axes.set_xlabel(profiles[0].depthLabel)
+            axes.set_ylabel("Area")
+            axes.legend()
+        self.spectralPlot.draw()
+
+    def loadSpectra(self, columns):
+        """Return the blocks of model columns with their spectra loaded
+           The spectra of header-only blocks are read from their file on first access, blocks of files changed
+           since their header was read, e.g. by the instrument writing into a watched folder, are left out.
+           These files are shown in the status bar and parsed again, which updates their columns.
 
-        #Plot also selected data columns
-        for colIndex, checked in enumerate(self.model.selectedColumns):
-            if checked and colIndex+1 != self.selectedModelColumn: #Starts from 0
-                #print("plotting also column " + str(colIndex+1))
-                #Get current data class object
-                data = self.model.getObject(colIndex+1) #Starts from 0
-                self.spectralPlot.axes.plot(data.xAxisValuesList, data.yAxisValuesList[0])
-
-        #redraw
-        self.spectralPlot.draw()            
-            
-            
+        ### Arguments:
+            columns {list} -- model columns
 
+        ### Returns:
+            {dict} -- model column: block with loaded spectra
+        """
+        blocks = dict()
+        changedFiles = list()
+        for column in columns:
+            data = self.model.getObject(column)
+            try:
+                data.yAxisValuesList
+            except OSError as e:
+                print("Failed loading the spectra of {0} block {1}: {2}".format(data.fileName, data.blockNumber, e))
+                if data.fileName not in changedFiles:
+                    changedFiles.append(data.fileName)
+                continue
+            blocks[column] = data
+        if changedFiles:
+            self.statusbar.showMessage("Failed loading the spectra of {0}, parsing again".format(", ".join(os.path.basename(fileName) for fileName in changedFiles)))
+            self.loadWatchedFiles(changedFiles)
+        return blocks
 
     def resourcePath(self, relPath):
         """To access resources when bundled as an executable using PyInstaller relative paths are redirected to temporary _MEIPASS folder
@@ -498,23 +1119,67 @@ class MainWindow(QMainWindow):
 
 
     def saveModel(self):
-        """Present file dialog to save model data to config (.ini) file
+        """Present file dialog to save model data to a session (.vmss) file
         """
         #Present file dialog using last saved folder
         lastFolder = self.getLastSaveFolder()
         dialog = QFileDialog(self)
-        dialog.setWindowTitle("Save settings")
-        dialog.setNameFilter("Ini files (*.ini)")
+        dialog.setWindowTitle("Save session")
+        dialog.setNameFilter("Session files (*{0})".format(sessionExtension))
+        dialog.setDefaultSuffix(sessionExtension[1:])
         dialog.setFileMode(QFileDialog.AnyFile)
         dialog.setDirectory(lastFolder)
         dialog.setAcceptMode(QFileDialog.AcceptSave)
         if dialog.exec_() == QDialog.Accepted:
             fileName = dialog.selectedFiles()[0]
             self.saveLastFolder(fileName)
-            #Save the model to config file
-            self.model.saveModelToConfigFile(fileName)
+            overwrite = os.path.exists(fileName)
+            if overwrite:
+                #Release the plotted and processed spectra, which may be mapped from the session file
+                self.spectralPlot.decimatedPlot.clear()
+                self.pipeline.invalidate()
+            #Save the model to session file
+            try:
+                self.model.saveToSession(fileName)
+            except OSError as e:
+                print("Failed saving {0}: {1}".format(fileName, e))
+                self.statusbar.showMessage("Failed saving {0}: {1}".format(os.path.basename(fileName), e))
+                return
+            finally:
+                if overwrite:
+                    self.updatePlot()
             print ("Saved to " + fileName)
-        
+
+    def exportVamas(self):
+        """Present file dialog to write the checked blocks, or the selected one if none is checked, to a VAMAS file
+        """
+        columns = [index+1 for index, checked in enumerate(self.model.selectedColumns) if checked] or [self.selectedModelColumn]
+        dialog = QFileDialog(self)
+        dialog.setWindowTitle("Export VAMAS file")
+        dialog.setNameFilter("VAMAS files (*.vms)")
+        dialog.setDefaultSuffix("vms")
+        dialog.setFileMode(QFileDialog.AnyFile)
+        dialog.setDirectory(self.getLastSaveFolder())
+        dialog.setAcceptMode(QFileDialog.AcceptSave)
+        if dialog.exec_() == QDialog.Accepted:
+            fileName = dialog.selectedFiles()[0]
+            self.saveLastFolder(fileName)
+            #Loaded before writing, so a changed source file does not leave a partly written file
+            blocks = list(self.loadSpectra(columns).values())
+            if not blocks:
+                return
+            try:
+                writeVamasBlocks(fileName, blocks)
+            except (OSError, ValueError) as e:
+                print("Failed exporting {0}: {1}".format(fileName, e))
+                self.statusbar.showMessage("Failed exporting {0}: {1}".format(os.path.basename(fileName), e))
+                return
+            message = "Exported {0} blocks to {1}".format(len(blocks), os.path.basename(fileName))
+            if len(blocks) < len(columns):
+                message += ", {0} blocks of changed files left out".format(len(columns) - len(blocks))
+            print("Exported {0} blocks to {1}".format(len(blocks), fileName))
+            self.statusbar.showMessage(message)
+
 
 
     def getLastSaveFolder(self):
@@ -551,19 +1216,38 @@ class MainWindow(QMainWindow):
         #Present file dialog using last saved folder
         fileNames = self.vmsFileSelectorDialog()
         if fileNames: #Continue if files selected
-            #Clear popup menu before loading new data
-            self.dataSelector.clear()
-            dataList = self.loadfilesIntoList(fileNames)
-            #Supply the new datalist to the model to replace its data
-            self.model.loadData(dataList)
-            #Select first model column
-            self.selectedModelColumn = 1
-            #Update the column number
-            self.colNumber.setText("1/" + str(self.model.columnCount()-1))
-            #Refill popup menu with filenames
-            for data in self.model.getData():
-                self.dataSelector.addItem(os.path.basename(data.fileName))
-            self.vmsTable.resizeRowsToContents() #Resize rows in table view to make space for multiline comments
+            sessions = [fileName for fileName in fileNames if fileName.endswith(sessionExtension)]
+            if sessions:
+                self.loadSessionFile(sessions[0])
+                return
+            #The model data is replaced when the first file arrives
+            self.loadFiles(fileNames, replaceData=True)
+
+    def loadSessionFile(self, fileName):
+        """Replace the model data with a saved session and restore the checked rows and columns
+
+        ### Arguments:
+            fileName {str} -- full filepath of the .vmss file
+        """
+        try:
+            collection = self.model.loadFromSession(fileName)
+        except (OSError, ValueError, KeyError) as e:
+            print("Failed loading {0}: {1}".format(fileName, e))
+            self.statusbar.showMessage("Failed loading {0}: {1}".format(os.path.basename(fileName), e))
+            return
+        self.pipeline.invalidate()
+        self.dataSelector.clear()
+        for data in collection:
+            self.dataSelector.addItem(self.dataLabel(data))
+        #Show the checked fields in the paramTable
+        for row, selected in enumerate(self.model.selectedRows):
+            if selected:
+                self.paramTable.showColumn(row+1)
+            else:
+                self.paramTable.hideColumn(row+1)
+        if len(collection) > 0:
+            self.selectModelColumn(1)
+        self.statusbar.showMessage("Loaded session {0}".format(os.path.basename(fileName)))
     
     def appendData(self):
         """Present file dialog to append files
@@ -578,28 +1262,326 @@ class MainWindow(QMainWindow):
             if fileNames: #Continue if files selected
                 #Deselect all
                 self.paramTable.clearSelection()
-                dataList = self.loadfilesIntoList(fileNames)
-                #Get the number of columns before insert
-                oldColumnNum = self.model.columnCount()
-                for data in dataList:
-                    self.dataSelector.addItem(os.path.basename(data.fileName))
-                    self.model.appendData(data)
-                self.selectModelColumn(oldColumnNum)
-                self.vmsTable.resizeRowsToContents() #Resize rows in table view to make space for multiline comments
-            
-    def loadfilesIntoList(self, fileNames):
-        """Load a list of vamas files into list of dataclasses to use as new model data
+                for fileName in [fileName for fileName in fileNames if fileName.endswith(sessionExtension)]:
+                    fileNames.remove(fileName)
+                    self.appendSessionFile(fileName)
+                if fileNames:
+                    self.loadFiles(fileNames, replaceData=False)
+
+    def appendSessionFile(self, fileName):
+        """Append the blocks of a saved session to the model
+
+        ### Arguments:
+            fileName {str} -- full filepath of the .vmss file
+        """
+        try:
+            collection, state = loadSession(fileName)
+        except (OSError, ValueError, KeyError) as e:
+            print("Failed loading {0}: {1}".format(fileName, e))
+            self.statusbar.showMessage("Failed loading {0}: {1}".format(os.path.basename(fileName), e))
+            return
+        blocks = self.model.withoutDuplicates(list(collection))
+        for blockFileName in {data.fileName for data in blocks}:
+            self.pipeline.invalidate(blockFileName)
+        self.dataSelector.addItems([self.dataLabel(data) for data in blocks])
+        self.model.appendBlocks(blocks)
+        self.colNumber.setText(str(self.selectedModelColumn) + "/" + str(self.model.columnCount()-1))
+
+    def loadFiles(self, fileNames, replaceData):
+        """Parse vamas files in a background thread on all cores, the model is filled as the files arrive
+           Only the parameters are parsed, the spectra are loaded when they are plotted.
+           The first file is shown as soon as it is parsed, the following ones are inserted in batches.
 
         ### Arguments:
             fileNames {list} -- List of filenames
+            replaceData {bool} -- replace the model data instead of appending to it
         """
-        data = list()   
-        for filename in fileNames:
-            vms = VAMAS_File(fileName=filename)
-            vms.readVamasFile()
-            data.append(vms)
-        return data
-    
+        if self.loaderThread is not None and self.loaderThread.isRunning():
+            self.statusbar.showMessage("Still loading files, cancel loading first")
+            return
+        if len(fileNames) > self.lazyLoadThreshold or self.model.canFetchMore():
+            self.fetchFiles(fileNames, replaceData)
+            return
+        self.replaceModelData = replaceData
+        self.model.duplicateCount = 0
+        #Column to select when the first file arrives
+        self.firstLoadedColumn = 1 if replaceData else self.model.columnCount()
+        self.firstColumnShown = False
+        self.loaderThread = LoaderThread(fileNames, cache=self.cache, parent=self)
+        self.loaderThread.fileLoaded.connect(self.fileLoaded)
+        self.loaderThread.finished.connect(self.loadingFinished)
+        self.loadProgress.setRange(0, len(fileNames))
+        self.loadProgress.setValue(0)
+        self.loadProgress.show()
+        self.cancelButton.show()
+        self.statusbar.showMessage("Loading {0} files...".format(len(fileNames)))
+        self.loaderThread.start()
+
+    def cancelLoading(self):
+        """Stop loading files after the current one, the files loaded so far are kept
+        """
+        if self.loaderThread is not None and self.loaderThread.isRunning():
+            self.loaderThread.cancel()
+            self.statusbar.showMessage("Cancelling...")
+
+    def fetchFiles(self, fileNames, replaceData):
+        """Add files to the model which are parsed when the views scroll to them, for large numbers of files
+           The first batch is parsed in the background at once and shown when it arrives
+
+        ### Arguments:
+            fileNames {list} -- List of filenames
+            replaceData {bool} -- replace the model data instead of appending to it
+        """
+        #Column to select when the first batch arrives, None if no batch is waited for
+        self.firstFetchedColumn = 1 if replaceData else self.model.columnCount()
+        if replaceData:
+            self.dataSelector.clear()
+            self.model.loadData(VamasCollection())
+            self.pipeline.invalidate()
+        self.model.setPendingFiles(fileNames)
+        self.model.fetchMore()
+        self.statusbar.showMessage("{0} files are loaded when scrolled to".format(len(fileNames)))
+
+    def blocksFetched(self, blocks):
+        """Add popup menu entries for the blocks appended to the model by scrolling, select the first fetched block
+
+        ### Arguments:
+            blocks {list} -- dataclasses of the blocks
+        """
+        for data in blocks:
+            self.dataSelector.addItem(self.dataLabel(data))
+        #The files may have changed since their spectra were processed
+        for fileName in {data.fileName for data in blocks}:
+            self.pipeline.invalidate(fileName)
+        self.colNumber.setText(str(self.selectedModelColumn) + "/" + str(self.model.columnCount()-1))
+        if self.firstFetchedColumn is not None and self.firstFetchedColumn < self.model.columnCount():
+            column, self.firstFetchedColumn = self.firstFetchedColumn, None
+            self.selectModelColumn(column)
+
+    def fileLoaded(self, result):
+        """Collect the blocks of a loaded file, the first file is inserted into the model at once,
+           the following ones by the insert timer
+
+        ### Arguments:
+            result {LoadResult} -- dataclasses of the blocks of the file or error message
+        """
+        self.loadProgress.setValue(result.index + 1)
+        if result.error:
+            print("Failed loading {0}: {1}".format(result.fileName, result.error))
+            self.statusbar.showMessage("Failed loading {0}: {1}".format(os.path.basename(result.fileName), result.error))
+            return
+        self.loadedResults.append(result)
+        if not self.firstColumnShown:
+            self.insertLoadedFiles()
+        elif not self.insertTimer.isActive():
+            self.insertTimer.start()
+
+    def insertLoadedFiles(self):
+        """Insert the blocks of the files loaded since the last call into the model with a single insertion
+           and show the first loaded column
+        """
+        blocks = [data for result in self.loadedResults for data in result.blocks]
+        #The files may have changed since their spectra were processed
+        if self.replaceModelData:
+            self.pipeline.invalidate()
+        else:
+            for result in self.loadedResults:
+                self.pipeline.invalidate(result.fileName)
+        self.loadedResults = list()
+        if self.replaceModelData:
+            #Duplicates of the replaced data are not skipped
+            self.model.duplicates.clear()
+        blocks = self.model.withoutDuplicates(blocks)
+        if not blocks:
+            return
+        if self.replaceModelData:
+            self.replaceModelData = False
+            #Clear popup menu before loading new data
+            self.dataSelector.clear()
+            #Supply the new datalist to the model to replace its data
+            self.model.loadData(blocks)
+        else:
+            firstNewColumn = self.model.columnCount()
+            self.model.appendBlocks(blocks)
+            #Only the selected column is shown in the vmsTable
+            for column in range(firstNewColumn, self.model.columnCount()):
+                self.vmsTable.hideColumn(column)
+        #Without selecting the first entry, the first loaded column is selected below
+        self.dataSelector.blockSignals(True)
+        self.dataSelector.addItems([self.dataLabel(data) for data in blocks])
+        self.dataSelector.blockSignals(False)
+        if not self.firstColumnShown and self.firstLoadedColumn < self.model.columnCount():
+            self.firstColumnShown = True
+            self.selectModelColumn(self.firstLoadedColumn)
+        else:
+            self.colNumber.setText(str(self.selectedModelColumn) + "/" + str(self.model.columnCount()-1))
+
+    def loadingFinished(self):
+        """Insert the remaining files after all files are loaded or loading was cancelled
+        """
+        self.insertTimer.stop()
+        self.insertLoadedFiles()
+        self.loadProgress.hide()
+        self.cancelButton.hide()
+        message = "Loaded {0} blocks".format(self.model.columnCount() - self.firstLoadedColumn)
+        if self.model.duplicateCount:
+            message += ", {0} {1} duplicate blocks".format("skipped" if self.model.skipDuplicates else "found", self.model.duplicateCount)
+        self.statusbar.showMessage(message)
+        #Collected if the environment variable VAMAS_PARSE_STATS is set
+        stats = self.loaderThread.loader.stats
+        if stats is not None:
+            print(stats.summary())
+            self.statusbar.showMessage(stats.summary(oneLine=True))
+        #Make space for multiline comments, only their rows need resizing
+        for name in ('comment', 'blockComment'):
+            self.vmsTable.resizeRowToContents(self.model.getFieldIndex(name)+1)
+
+    def setSkipDuplicates(self, checked):
+        """Skip blocks with the fingerprint of a loaded block when loading or only report them
+
+        ### Arguments:
+            checked {bool} -- state of the menu entry
+        """
+        self.model.skipDuplicates = checked
+
+    def watchFolder(self, checked):
+        """Start or stop watching a folder, its new and changed files are added to the model when fully written
+           Files already in the model are added again only when they change
+
+        ### Arguments:
+            checked {bool} -- state of the menu entry, True to select a folder and start watching
+        """
+        self.watchTimer.stop()
+        if self.scanThread is not None and self.scanThread.isRunning():
+            #The results of the previous folder are dropped
+            self.scanThread.cancel()
+        self.folderWatcher = None
+        if not checked:
+            self.statusbar.showMessage("Stopped watching folder")
+            return
+        folder = QFileDialog.getExistingDirectory(self, "Watch folder", self.getLastSaveFolder())
+        if not folder:
+            self.actionWatch_Folder.setChecked(False)
+            return
+        self.folderWatcher = FolderWatcher(folder, knownFiles=self.model.dataList.column('fileName'))
+        self.watchTimer.start()
+        #Reads the states of the files already loaded
+        self.scanWatchedFolder()
+        self.statusbar.showMessage("Watching {0}".format(folder))
+
+    def scanWatchedFolder(self):
+        """Scan the watched folder in a background thread, called by the timer
+        """
+        #Files changing meanwhile are reported by a later scan
+        if (self.folderWatcher is None or (self.scanThread is not None and self.scanThread.isRunning())
+                or (self.watchThread is not None and self.watchThread.isRunning())):
+            return
+        if self.scanThread is None:
+            self.scanThread = ScanThread(self.folderWatcher, parent=self)
+            self.scanThread.scanned.connect(self.watchedFolderScanned)
+        #The thread is started again for each scan, of the folder watched now
+        self.scanThread.folderWatcher = self.folderWatcher
+        self.scanThread.start()
+
+    def watchedFolderScanned(self, folderWatcher, newFiles, changedFiles):
+        """Parse the new and changed files found by the scan thread in a background thread
+
+        ### Arguments:
+            folderWatcher {FolderWatcher} -- watcher of the scan, the results are dropped if another folder is watched meanwhile
+            newFiles {list} -- paths of the new files
+            changedFiles {list} -- paths of the changed files
+        """
+        if folderWatcher is self.folderWatcher:
+            self.loadWatchedFiles(newFiles + changedFiles)
+
+    def loadWatchedFiles(self, fileNames=()):
+        """Parse files in the background thread of the watched folder, new files are added to the model and
+           the columns of loaded files are updated. Files are queued while the thread is running.
+
+        ### Keyword Arguments:
+            fileNames {list} -- paths of the VAMAS files (default: {()})
+        """
+        self.watchQueue.extend(fileName for fileName in fileNames if fileName not in self.watchQueue)
+        if not self.watchQueue or (self.watchThread is not None and self.watchThread.isRunning()):
+            return
+        fileNames, self.watchQueue = self.watchQueue, list()
+        self.watchThread = LoaderThread(fileNames, cache=self.cache, parent=self)
+        self.watchThread.fileLoaded.connect(self.watchedFileLoaded)
+        self.watchThread.finished.connect(self.watchThreadFinished)
+        self.watchThread.start()
+
+    def watchThreadFinished(self):
+        """Parse the files queued while the watch thread was running
+        """
+        #Emitted right before the thread ends
+        self.watchThread.wait()
+        self.loadWatchedFiles()
+
+    def watchedFileLoaded(self, result):
+        """Add the blocks of a new file of the watched folder to the model or update the columns of a changed file
+
+        ### Arguments:
+            result {LoadResult} -- dataclasses of the blocks of the file or error message
+        """
+        fileName = os.path.basename(result.fileName)
+        if result.error:
+            #Parsed again when the file changes
+            print("Failed loading {0}: {1}".format(result.fileName, result.error))
+            self.statusbar.showMessage("Failed loading {0}: {1}".format(fileName, result.error))
+            return
+        if self.dataSelector.count() == 0:
+            #Replace the empty data the window starts with
+            self.model.loadData(result.blocks)
+            for data in result.blocks:
+                self.dataSelector.addItem(self.dataLabel(data))
+            self.selectModelColumn(1)
+            self.statusbar.showMessage("Added {0}".format(fileName))
+            return
+        path = FolderWatcher.normalizePath(result.fileName)
+        self.pipeline.invalidate(result.fileName)
+        columns = [column+1 for column, name in enumerate(self.model.dataList.column('fileName')) if FolderWatcher.normalizePath(name) == path]
+        for column, data in zip(columns, result.blocks):
+            self.model.replaceData(column, data)
+            self.dataSelector.setItemText(column-1, self.dataLabel(data))
+        if len(columns) > len(result.blocks):
+            print("{0} has less blocks than before, the columns of the missing blocks are kept".format(result.fileName))
+        newBlocks = self.model.withoutDuplicates(result.blocks[len(columns):])
+        firstNewColumn = self.model.columnCount()
+        self.dataSelector.addItems([self.dataLabel(data) for data in newBlocks])
+        self.model.appendBlocks(newBlocks)
+        #Only the selected column is shown in the vmsTable
+        for column in range(firstNewColumn, self.model.columnCount()):
+            self.vmsTable.hideColumn(column)
+        #Plot the new spectra of changed columns
+        if any(column == self.selectedModelColumn or self.model.selectedColumns[column-1] for column in columns[:len(result.blocks)]):
+            self.updatePlot()
+        self.colNumber.setText(str(self.selectedModelColumn) + "/" + str(self.model.columnCount()-1))
+        self.statusbar.showMessage("{0} {1}".format("Updated" if columns else "Added", fileName))
+
+    def closeEvent(self, event):
+        """Stop loading files before the window closes
+        """
+        self.watchTimer.stop()
+        for thread in (self.loaderThread, self.scanThread, self.watchThread, self.model.fetchThread):
+            if thread is not None and thread.isRunning():
+                thread.cancel()
+                thread.wait()
+        super(MainWindow, self).closeEvent(event)
+
+    def dataLabel(self, data):
+        """Create the popup menu entry for a dataclass from the filename and the block for multi-block files
+
+        ### Arguments:
+            data {VAMAS_File} -- dataclass of one block
+
+        ### Returns:
+            {str} -- label text
+        """
+        label = os.path.basename(data.fileName)
+        if data.numBlocks > 1:
+            label += " [{0}/{1}] {2}".format(data.blockNumber, data.numBlocks, data.blockName)
+        return label
+
     def vmsFileSelectorDialog(self):
         """ Present file dialog to select one or more vamas files
             Starting with last used folder from App preferences
@@ -610,7 +1592,7 @@ class MainWindow(QMainWindow):
         lastFolder = self.getLastSaveFolder()
         dialog = QFileDialog(self)
         dialog.setWindowTitle("Open vms files")
-        dialog.setNameFilter("vms files (*.vms)")
+        dialog.setNameFilter("vms files and sessions (*.vms *{0})".format(sessionExtension))
         dialog.setFileMode(QFileDialog.ExistingFiles) #Select multiple existing files
         dialog.setDirectory(lastFolder)
         dialog.setAcceptMode(QFileDialog.AcceptOpen)
@@ -623,7 +1605,10 @@ class MainWindow(QMainWindow):
             return None
 
 
-app = QApplication(sys.argv)
-app.setWindowIcon(QIcon(MainWindow.resourcePath(None, 'icon_XPS.ico')))
-window = MainWindow()
-app.exec_()
+if __name__ == "__main__":
+    #The worker processes of the loader must not start the GUI, needed for the bundled executable
+    multiprocessing.freeze_support()
+    app = QApplication(sys.argv)
+    app.setWindowIcon(QIcon(MainWindow.resourcePath(None, 'icon_XPS.ico')))
+    window = MainWindow()
+    app.exec_()